@@ -7,16 +7,19 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.core.database import get_database
 from app.core.security import decode_token
-from app.services.user_service import UserService
+from app.services.user_service import (
+    UserService, USER_SESSION_FIELDS, USER_PUBLIC_FIELDS
+)
 from app.models.user import UserRole
 
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+async def _get_user_from_token(
+    credentials: HTTPAuthorizationCredentials,
+    projection: dict
 ):
-    """Obtiene el usuario actual desde el token JWT"""
+    """Valida el token JWT y obtiene el usuario con los campos indicados"""
     token = credentials.credentials
     payload = decode_token(token)
     
@@ -42,7 +45,7 @@ async def get_current_user(
     # Obtener usuario de la base de datos
     db = get_database()
     user_service = UserService(db)
-    user = await user_service.get_user_by_id(user_id)
+    user = await user_service.get_user_by_id(user_id, projection)
     
     if user is None:
         raise HTTPException(
@@ -59,6 +62,23 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Obtiene el usuario actual desde el token JWT.
+    Solo trae los campos de sesión (rol, estado y datos de contacto).
+    """
+    return await _get_user_from_token(credentials, USER_SESSION_FIELDS)
+
+
+async def get_current_user_profile(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Obtiene el perfil completo (sin contraseña) del usuario actual"""
+    return await _get_user_from_token(credentials, USER_PUBLIC_FIELDS)
+
+
 async def get_current_active_user(
     current_user: dict = Depends(get_current_user)
 ):
@@ -3,9 +3,10 @@ Endpoints de autenticación
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.core.database import get_database
+from app.core.rate_limit import LOGIN_RULE, rate_limit, rate_limiter
 from app.core.security import create_access_token, create_refresh_token
 from app.models.user import UserLogin, Token, UserCreate, UserResponse
-from app.services.user_service import UserService
+from app.services.user_service import UserService, EXISTS_FIELDS
 
 router = APIRouter()
 
@@ -19,7 +20,7 @@ async def register(user: UserCreate, db=Depends(get_database)):
     user_service = UserService(db)
     
     # Verificar si el email ya existe
-    existing_user = await user_service.get_user_by_email(user.email)
+    existing_user = await user_service.get_user_by_email(user.email, EXISTS_FIELDS)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,7 +28,7 @@ async def register(user: UserCreate, db=Depends(get_database)):
         )
     
     # Verificar si el RUT ya existe
-    existing_rut = await user_service.get_user_by_rut(user.rut)
+    existing_rut = await user_service.get_user_by_rut(user.rut, EXISTS_FIELDS)
     if existing_rut:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -63,11 +64,15 @@ async def register(user: UserCreate, db=Depends(get_database)):
     )
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit(LOGIN_RULE))])
 async def login(user_login: UserLogin, db=Depends(get_database)):
     """
     Autentica un usuario y retorna tokens de acceso y refresco.
+    Limitado por IP y por cuenta (429 al superar el límite).
     """
+    # Límite por cuenta antes de verificar la contraseña (bcrypt)
+    await rate_limiter.check(LOGIN_RULE, f"account:{user_login.email.lower()}")
+    
     user_service = UserService(db)
     
     # Autenticar usuario
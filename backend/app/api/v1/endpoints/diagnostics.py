@@ -0,0 +1,99 @@
+"""
+Endpoints de diagnóstico: bloqueos del event loop y profiler por muestreo
+"""
+import asyncio
+import threading
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.profiler import profiler
+from app.api.dependencies import get_administrativo_user
+
+router = APIRouter()
+
+
+@router.get("/loop")
+async def get_loop_status(current_user: dict = Depends(get_administrativo_user)):
+    """
+    Retraso actual del event loop y últimos bloqueos detectados, con la
+    pila del código que lo bloqueaba.
+    Requiere rol de administrativo.
+    """
+    return {
+        "retraso_segundos": round(loop_monitor.lag, 4),
+        "umbral_bloqueo_segundos": loop_monitor.block_threshold_seconds,
+        "bloqueos": list(reversed(loop_monitor.stalls)),
+    }
+
+
+@router.post("/profiler/start")
+async def start_profiler(
+    seconds: int = Query(30, ge=1, le=settings.PROFILER_MAX_SECONDS, description="Duración del muestreo"),
+    interval_ms: int = Query(5, ge=1, le=1000, description="Intervalo entre muestras"),
+    all_threads: bool = Query(False, description="Muestrear todos los hilos, no solo el del event loop"),
+    current_user: dict = Depends(get_administrativo_user)
+):
+    """
+    Inicia una sesión del profiler por muestreo durante `seconds`
+    segundos. El resultado se descarga con GET /profiler/result.
+    Requiere rol de administrativo.
+    """
+    # El endpoint corre en el hilo del event loop: no depende de que el
+    # monitor esté activo (LOOP_LAG_INTERVAL_SECONDS=0)
+    thread_id = None if all_threads else threading.get_ident()
+    try:
+        profiler.start(seconds, interval_ms / 1000, thread_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    return profiler.status()
+
+
+@router.post("/profiler/stop")
+async def stop_profiler(current_user: dict = Depends(get_administrativo_user)):
+    """
+    Detiene la sesión en curso antes de tiempo.
+    Requiere rol de administrativo.
+    """
+    # stop() espera al hilo del profiler: fuera del event loop
+    await asyncio.to_thread(profiler.stop)
+    return profiler.status()
+
+
+@router.get("/profiler")
+async def get_profiler_status(current_user: dict = Depends(get_administrativo_user)):
+    """
+    Estado de la sesión actual o de la última.
+    Requiere rol de administrativo.
+    """
+    return profiler.status()
+
+
+@router.get("/profiler/result")
+async def download_profile(current_user: dict = Depends(get_administrativo_user)):
+    """
+    Descarga la última sesión en formato folded (flamegraph.pl,
+    speedscope, inferno).
+    Requiere rol de administrativo.
+    """
+    if profiler.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="La sesión del profiler sigue en curso"
+        )
+    if profiler.started_at is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No hay resultados del profiler"
+        )
+
+    filename = f"perfil-{profiler.started_at:%Y%m%d-%H%M%S}.folded"
+    return Response(
+        profiler.folded(),
+        media_type="text/plain",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
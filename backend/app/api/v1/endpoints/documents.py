@@ -2,11 +2,21 @@
 Endpoints de gestión de documentos bibliográficos
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, UploadFile, File
 
 from app.core.database import get_database
-from app.models.document import DocumentCreate, DocumentUpdate, DocumentResponse
-from app.services.document_service import DocumentService
+from app.core.http_cache import conditional_get
+from app.core.pagination import set_next_cursor
+from app.core.rate_limit import CATALOG_LIMIT
+from app.core.serialization import json_response
+from app.models.catalog_import import ImportFormat, ImportReport
+from app.services.catalog_import_service import (
+    CatalogImportService, iter_records, iter_stream_lines
+)
+from app.models.document import (
+    DocumentCreate, DocumentUpdate, DocumentResponse, DocumentSuggestion, DocumentFacets
+)
+from app.services.document_service import DOCUMENT_ROWS, DocumentService, document_sort_field
 from app.api.dependencies import get_bibliotecario_user
 
 router = APIRouter()
@@ -47,49 +57,123 @@ async def create_document(
     )
 
 
-@router.get("/", response_model=List[DocumentResponse])
+@router.post("/import", response_model=ImportReport)
+async def import_documents(
+    file: UploadFile = File(...),
+    formato: Optional[ImportFormat] = Query(None, description="csv o jsonl (por defecto según la extensión)"),
+    db=Depends(get_database),
+    current_user: dict = Depends(get_bibliotecario_user)
+):
+    """
+    Importa documentos de forma masiva desde un archivo CSV o JSON Lines.
+    El archivo se procesa en lotes a medida que se lee y se retorna un
+    reporte con los errores por fila.
+    Los id_fisico duplicados se reportan como error de la fila.
+    Requiere rol de bibliotecario o administrativo.
+    """
+    if formato is None:
+        filename = (file.filename or "").lower()
+        formato = ImportFormat.JSONL if filename.endswith((".jsonl", ".ndjson")) else ImportFormat.CSV
+    
+    import_service = CatalogImportService(db)
+    records = iter_records(iter_stream_lines(file), formato)
+    
+    try:
+        return await import_service.import_documents(records)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Archivo inválido: {e}"
+        )
+
+
+@router.get("/", response_model=List[DocumentResponse], dependencies=[CATALOG_LIMIT])
 async def list_documents(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     titulo: Optional[str] = None,
     autor: Optional[str] = None,
     categoria: Optional[str] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (cabecera X-Next-Cursor)"),
     db=Depends(get_database)
 ):
     """
     Lista documentos del catálogo con filtros opcionales.
+    Los filtros ignoran mayúsculas y tildes y buscan cada palabra por prefijo;
+    con `search` los resultados se ordenan por relevancia.
     No requiere autenticación (acceso público al catálogo).
+    Si hay más resultados, la cabecera X-Next-Cursor trae el cursor de la página siguiente.
+    Soporta GET condicional con ETag (If-None-Match -> 304).
     """
+    not_modified = await conditional_get(request, response, db, "documents", "items")
+    if not_modified:
+        return not_modified
+
     doc_service = DocumentService(db)
-    documents = await doc_service.get_documents(
-        skip=skip,
-        limit=limit,
+    try:
+        documents = await doc_service.get_documents(
+            skip=skip,
+            limit=limit,
+            titulo=titulo,
+            autor=autor,
+            categoria=categoria,
+            search=search,
+            cursor=cursor,
+            versions=request.state.collection_versions
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    set_next_cursor(response, documents, limit, sort_field=document_sort_field(search))
+    
+    return json_response(DOCUMENT_ROWS.rows(documents), response)
+
+
+@router.get("/suggest", response_model=List[DocumentSuggestion], dependencies=[CATALOG_LIMIT])
+async def suggest_documents(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=20),
+    db=Depends(get_database)
+):
+    """
+    Autocompletado de títulos y autores para el buscador.
+    Ignora mayúsculas y tildes y se responde desde memoria.
+    No requiere autenticación.
+    """
+    doc_service = DocumentService(db)
+    return await doc_service.suggest(q, limit)
+
+
+@router.get("/facets", response_model=DocumentFacets, dependencies=[CATALOG_LIMIT])
+async def get_document_facets(
+    titulo: Optional[str] = None,
+    autor: Optional[str] = None,
+    categoria: Optional[str] = None,
+    search: Optional[str] = None,
+    db=Depends(get_database)
+):
+    """
+    Cantidad de documentos por categoría, tipo y año de edición para los
+    mismos filtros del listado. Los conteos se guardan en caché hasta la
+    próxima escritura de documentos.
+    No requiere autenticación.
+    """
+    doc_service = DocumentService(db)
+    return await doc_service.get_facets(
         titulo=titulo,
         autor=autor,
         categoria=categoria,
         search=search
     )
-    
-    return [
-        DocumentResponse(
-            _id=str(doc["_id"]),
-            id_fisico=doc["id_fisico"],
-            titulo=doc["titulo"],
-            autor=doc["autor"],
-            editorial=doc["editorial"],
-            edicion=doc["edicion"],
-            ano_edicion=doc["ano_edicion"],
-            tipo=doc["tipo"],
-            categoria=doc["categoria"],
-            tipo_medio=doc.get("tipo_medio"),
-            items_disponibles=doc.get("items_disponibles", 0)
-        )
-        for doc in documents
-    ]
 
 
-@router.get("/by-physical-id/{id_fisico}")
+@router.get("/by-physical-id/{id_fisico}", dependencies=[CATALOG_LIMIT])
 async def get_document_id_by_physical_id(id_fisico: str, db=Depends(get_database)):
     """
     Obtiene el ID de un documento por su ID físico.
@@ -110,12 +194,21 @@ async def get_document_id_by_physical_id(id_fisico: str, db=Depends(get_database
     }
 
 
-@router.get("/{document_id}", response_model=DocumentResponse)
-async def get_document(document_id: str, db=Depends(get_database)):
+@router.get("/{document_id}", response_model=DocumentResponse, dependencies=[CATALOG_LIMIT])
+async def get_document(
+    document_id: str,
+    request: Request,
+    response: Response,
+    db=Depends(get_database)
+):
     """
     Obtiene un documento específico por su ID.
-    No requiere autenticación.
+    No requiere autenticación. Soporta GET condicional con ETag.
     """
+    not_modified = await conditional_get(request, response, db, "documents", "items")
+    if not_modified:
+        return not_modified
+
     doc_service = DocumentService(db)
     document = await doc_service.get_document_by_id(document_id)
     
@@ -128,18 +221,9 @@ async def get_document(document_id: str, db=Depends(get_database)):
     # Obtener disponibilidad
     items_disponibles = await doc_service._count_available_items(document_id)
 
-    return DocumentResponse(
-        _id=str(document["_id"]),
-        id_fisico=document["id_fisico"],
-        titulo=document["titulo"],
-        autor=document["autor"],
-        editorial=document["editorial"],
-        edicion=document["edicion"],
-        ano_edicion=document["ano_edicion"],
-        tipo=document["tipo"],
-        categoria=document["categoria"],
-        tipo_medio=document.get("tipo_medio"),
-        items_disponibles=items_disponibles
+    return json_response(
+        DOCUMENT_ROWS.row(document, items_disponibles=items_disponibles),
+        response
     )
 
 
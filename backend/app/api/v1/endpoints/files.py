@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from app.core.storage import storage_manager
 from app.core.database import get_database
 from app.services.user_service import UserService
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_current_user_profile
 from app.models.user import UserResponse, UserUpdate
 
 router = APIRouter()
@@ -102,7 +102,7 @@ async def upload_fingerprint(
 
 @router.delete("/delete/photo", response_model=dict)
 async def delete_photo(
-    current_user: dict = Depends(get_current_user),
+    current_user: dict = Depends(get_current_user_profile),
     db=Depends(get_database)
 ):
     """
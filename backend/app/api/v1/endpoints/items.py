@@ -2,11 +2,19 @@
 Endpoints de gestión de ejemplares (items)
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, UploadFile, File
 
 from app.core.database import get_database
+from app.core.http_cache import conditional_get
+from app.core.pagination import set_next_cursor
+from app.core.rate_limit import CATALOG_LIMIT
+from app.core.serialization import json_response
+from app.models.catalog_import import ImportFormat, ImportReport
+from app.services.catalog_import_service import (
+    CatalogImportService, iter_records, iter_stream_lines
+)
 from app.models.item import ItemCreate, ItemUpdate, ItemResponse, ItemStatus
-from app.services.item_service import ItemService
+from app.services.item_service import ITEM_ROWS, ItemService
 from app.api.dependencies import get_bibliotecario_user, get_current_user
 
 router = APIRouter()
@@ -33,42 +41,91 @@ async def create_item(
     )
 
 
-@router.get("/", response_model=List[ItemResponse])
+@router.post("/import", response_model=ImportReport)
+async def import_items(
+    file: UploadFile = File(...),
+    formato: Optional[ImportFormat] = Query(None, description="csv o jsonl (por defecto según la extensión)"),
+    db=Depends(get_database),
+    current_user: dict = Depends(get_bibliotecario_user)
+):
+    """
+    Importa ejemplares de forma masiva desde un archivo CSV o JSON Lines.
+    El archivo se procesa en lotes a medida que se lee y se retorna un
+    reporte con los errores por fila.
+    Cada fila indica `document_id` o el `id_fisico` del documento.
+    Requiere rol de bibliotecario o administrativo.
+    """
+    if formato is None:
+        filename = (file.filename or "").lower()
+        formato = ImportFormat.JSONL if filename.endswith((".jsonl", ".ndjson")) else ImportFormat.CSV
+    
+    import_service = CatalogImportService(db)
+    records = iter_records(iter_stream_lines(file), formato)
+    
+    try:
+        return await import_service.import_items(records)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Archivo inválido: {e}"
+        )
+
+
+@router.get("/", response_model=List[ItemResponse], dependencies=[CATALOG_LIMIT])
 async def list_items(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     document_id: Optional[str] = None,
     estado: Optional[ItemStatus] = None,
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (cabecera X-Next-Cursor)"),
     db=Depends(get_database)
 ):
     """
     Lista ejemplares con filtros opcionales.
     Acceso público para consultar disponibilidad.
+    Soporta GET condicional con ETag (If-None-Match -> 304).
     """
+    not_modified = await conditional_get(request, response, db, "items")
+    if not_modified:
+        return not_modified
+
     item_service = ItemService(db)
-    items = await item_service.get_items(
-        skip=skip,
-        limit=limit,
-        document_id=document_id,
-        estado=estado
-    )
-    
-    return [
-        ItemResponse(
-            _id=str(item["_id"]),
-            document_id=item["document_id"],
-            ubicacion=item["ubicacion"],
-            estado=item["estado"]
+    try:
+        items = await item_service.get_items(
+            skip=skip,
+            limit=limit,
+            document_id=document_id,
+            estado=estado,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        for item in items
-    ]
+
+    set_next_cursor(response, items, limit)
+    
+    return json_response(ITEM_ROWS.rows(items), response)
 
 
-@router.get("/{item_id}", response_model=ItemResponse)
-async def get_item(item_id: str, db=Depends(get_database)):
+@router.get("/{item_id}", response_model=ItemResponse, dependencies=[CATALOG_LIMIT])
+async def get_item(
+    item_id: str,
+    request: Request,
+    response: Response,
+    db=Depends(get_database)
+):
     """
     Obtiene un ejemplar específico por su ID.
+    Soporta GET condicional con ETag.
     """
+    not_modified = await conditional_get(request, response, db, "items")
+    if not_modified:
+        return not_modified
+
     item_service = ItemService(db)
     item = await item_service.get_item_by_id(item_id)
     
@@ -78,12 +135,7 @@ async def get_item(item_id: str, db=Depends(get_database)):
             detail="Ejemplar no encontrado"
         )
     
-    return ItemResponse(
-        _id=str(item["_id"]),
-        document_id=item["document_id"],
-        ubicacion=item["ubicacion"],
-        estado=item["estado"]
-    )
+    return json_response(ITEM_ROWS.row(item), response)
 
 
 @router.put("/{item_id}", response_model=ItemResponse)
@@ -2,11 +2,18 @@
 Endpoints de gestión de préstamos
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 
 from app.core.database import get_database
-from app.models.loan import LoanCreate, LoanResponse, LoanStatus, LoanReturn
-from app.services.loan_service import LoanService
+from app.core.pagination import set_next_cursor
+from app.core.serialization import json_response
+from app.models.loan import (
+    LoanCreate, LoanResponse, LoanStatus, LoanReturn,
+    LoanBulkCreate, LoanBulkReturn, LoanBulkItemResult, LoanBulkResponse
+)
+from app.services.loan_service import LOAN_ROWS, LoanService
+from app.services.item_service import ITEM_DOCUMENT_FIELDS
+from app.services.document_service import DOCUMENT_SUMMARY_FIELDS
 from app.api.dependencies import get_current_user, get_bibliotecario_user
 
 router = APIRouter()
@@ -43,12 +50,83 @@ async def create_loan(
     )
 
 
+def _bulk_response(results: List[dict]) -> LoanBulkResponse:
+    """Construye la respuesta de una operación masiva a partir de los resultados del servicio"""
+    resultados = []
+    for result in results:
+        loan = result["loan"]
+        resultados.append(
+            LoanBulkItemResult(
+                id=result["id"],
+                success=loan is not None,
+                error=result["error"],
+                loan=LoanResponse(
+                    _id=str(loan["_id"]),
+                    item_id=loan["item_id"],
+                    user_id=loan["user_id"],
+                    tipo_prestamo=loan["tipo_prestamo"],
+                    fecha_prestamo=loan["fecha_prestamo"],
+                    fecha_devolucion_pactada=loan["fecha_devolucion_pactada"],
+                    fecha_devolucion_real=loan.get("fecha_devolucion_real"),
+                    estado=loan["estado"]
+                ) if loan else None
+            )
+        )
+    
+    return LoanBulkResponse(
+        total=len(resultados),
+        exitosos=sum(1 for r in resultados if r.success),
+        resultados=resultados
+    )
+
+
+@router.post("/bulk", response_model=LoanBulkResponse, status_code=status.HTTP_201_CREATED)
+async def create_loans_bulk(
+    bulk: LoanBulkCreate,
+    db=Depends(get_database),
+    current_user: dict = Depends(get_bibliotecario_user)
+):
+    """
+    Registra varios préstamos para un mismo usuario (pila de ejemplares en mesón).
+    Retorna un resultado por ejemplar; los no disponibles no impiden los demás.
+    Requiere rol de bibliotecario o administrativo.
+    """
+    loan_service = LoanService(db)
+    results = await loan_service.create_loans_bulk(bulk)
+    
+    if results is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No se pueden crear los préstamos. Verifique que el usuario sea válido y no esté sancionado."
+        )
+    
+    return _bulk_response(results)
+
+
+@router.post("/bulk-return", response_model=LoanBulkResponse)
+async def return_loans_bulk(
+    bulk: LoanBulkReturn,
+    db=Depends(get_database),
+    current_user: dict = Depends(get_bibliotecario_user)
+):
+    """
+    Procesa la devolución de varios préstamos.
+    Retorna un resultado por préstamo.
+    Requiere rol de bibliotecario o administrativo.
+    """
+    loan_service = LoanService(db)
+    results = await loan_service.return_loans_bulk(bulk.loan_ids)
+    return _bulk_response(results)
+
+
 @router.get("/", response_model=List[LoanResponse])
 async def list_loans(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     user_id: Optional[str] = None,
     estado: Optional[LoanStatus] = None,
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (cabecera X-Next-Cursor)"),
     db=Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
@@ -65,18 +143,29 @@ async def list_loans(
         user_id = str(current_user["_id"])
     
     loan_service = LoanService(db)
-    loans = await loan_service.get_loans(
-        skip=skip,
-        limit=limit,
-        user_id=user_id,
-        estado=estado
-    )
+    try:
+        loans = await loan_service.get_loans(
+            skip=skip,
+            limit=limit,
+            user_id=user_id,
+            estado=estado,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    set_next_cursor(response, loans, limit)
     
     # Enriquecer con información del documento
     enriched_loans = []
     for loan in loans:
         # Obtener el item para luego obtener el documento
-        item = await db.items.find_one({"_id": ObjectId(loan["item_id"])})
+        item = await db.items.find_one(
+            {"_id": ObjectId(loan["item_id"])}, ITEM_DOCUMENT_FIELDS
+        )
         document_titulo = None
         document_id_fisico = None
         
@@ -84,30 +173,27 @@ async def list_loans(
             document_id = item["document_id"]
             # El document_id puede ser un ObjectId o un ID físico (string)
             try:
-                document = await db.documents.find_one({"_id": ObjectId(document_id)})
+                document = await db.documents.find_one(
+                    {"_id": ObjectId(document_id)}, DOCUMENT_SUMMARY_FIELDS
+                )
             except:
-                document = await db.documents.find_one({"id_fisico": document_id})
+                document = await db.documents.find_one(
+                    {"id_fisico": document_id}, DOCUMENT_SUMMARY_FIELDS
+                )
             
             if document:
                 document_titulo = document["titulo"]
                 document_id_fisico = document["id_fisico"]
         
         enriched_loans.append(
-            LoanResponse(
-                _id=str(loan["_id"]),
-                item_id=loan["item_id"],
-                user_id=loan["user_id"],
-                tipo_prestamo=loan["tipo_prestamo"],
-                fecha_prestamo=loan["fecha_prestamo"],
-                fecha_devolucion_pactada=loan["fecha_devolucion_pactada"],
-                fecha_devolucion_real=loan.get("fecha_devolucion_real"),
-                estado=loan["estado"],
+            LOAN_ROWS.row(
+                loan,
                 document_titulo=document_titulo,
                 document_id_fisico=document_id_fisico
             )
         )
     
-    return enriched_loans
+    return json_response(enriched_loans, response)
 
 
 @router.get("/overdue", response_model=List[LoanResponse])
@@ -122,19 +208,7 @@ async def list_overdue_loans(
     loan_service = LoanService(db)
     loans = await loan_service.get_overdue_loans()
     
-    return [
-        LoanResponse(
-            _id=str(loan["_id"]),
-            item_id=loan["item_id"],
-            user_id=loan["user_id"],
-            tipo_prestamo=loan["tipo_prestamo"],
-            fecha_prestamo=loan["fecha_prestamo"],
-            fecha_devolucion_pactada=loan["fecha_devolucion_pactada"],
-            fecha_devolucion_real=loan.get("fecha_devolucion_real"),
-            estado=loan["estado"]
-        )
-        for loan in loans
-    ]
+    return json_response(LOAN_ROWS.rows(loans))
 
 
 @router.get("/{loan_id}", response_model=LoanResponse)
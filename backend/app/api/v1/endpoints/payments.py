@@ -1,8 +1,22 @@
-from fastapi import APIRouter, HTTPException
-from app.services.payment_service import PaymentService
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from app.core.cache import cache_key
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.pagination import set_next_cursor
+from app.core.serialization import json_response
+from app.models.fine import FinePaymentResponse, FineResponse, FineStatus
+from app.models.user import UserRole
+from app.services.fine_service import FINE_ROWS, FineService
+from app.services.payment_service import PaymentService, PaymentProviderError
+from app.api.dependencies import get_current_user
 from pydantic import BaseModel, EmailStr
-from typing import List
-import traceback
+from typing import List, Optional
+import hashlib
+import hmac
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -17,22 +31,163 @@ class PaymentRequest(BaseModel):
     email: EmailStr
 
 @router.post("/create_preference")
-async def create_payment_preference(payment_data: PaymentRequest):
+async def create_payment_preference(
+    payment_data: PaymentRequest,
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias="Idempotency-Key",
+        max_length=64,
+        description="Clave para reintentar sin crear una preferencia duplicada"
+    )
+):
+    """
+    Crea una preferencia de pago en Mercado Pago. Si el cliente reintenta
+    con la misma cabecera Idempotency-Key (y el mismo pagador e items),
+    Mercado Pago retorna la misma preferencia.
+    """
+    # Convertir items Pydantic a dicts
+    items_list = [item.model_dump() for item in payment_data.items]
+
+    if idempotency_key:
+        # El endpoint no requiere autenticación: la clave enviada a Mercado
+        # Pago depende del pagador y los items, así que repetir (o adivinar)
+        # la cabecera de otro cliente no retorna su preferencia
+        idempotency_key = str(uuid.uuid5(
+            uuid.NAMESPACE_URL,
+            f"preferencia:{payment_data.email.lower()}:{idempotency_key}:{cache_key(items_list)}"
+        ))
+
+    try:
+        result = await PaymentService.create_preference(
+            items_list, payment_data.email, idempotency_key=idempotency_key
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    except PaymentProviderError as e:
+        logger.error(f"✗ Error al crear preferencia de pago para {payment_data.email}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Error al comunicarse con Mercado Pago"
+        )
+
+    return {
+        "preferenceId": result["id"],
+        "init_point": result["init_point"],
+        "sandbox_init_point": result["sandbox_init_point"]
+    }
+
+
+@router.get("/fines", response_model=List[FineResponse])
+async def list_fines(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    user_id: Optional[str] = None,
+    estado: Optional[FineStatus] = None,
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (cabecera X-Next-Cursor)"),
+    db=Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Lista multas.
+    Los usuarios ven sus propias multas; el personal puede ver todas.
+    """
+    if current_user["rol"] not in [UserRole.BIBLIOTECARIO, UserRole.ADMINISTRATIVO]:
+        user_id = str(current_user["_id"])
+
+    try:
+        fines = await FineService(db).get_fines(
+            skip=skip, limit=limit, user_id=user_id, estado=estado, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    set_next_cursor(response, fines, limit)
+    return json_response(FINE_ROWS.rows(fines), response)
+
+
+@router.post("/fines/checkout", response_model=FinePaymentResponse)
+async def create_fines_checkout(
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias="Idempotency-Key",
+        max_length=64,
+        description="Clave para reintentar sin crear una preferencia duplicada"
+    ),
+    db=Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Crea la preferencia de pago de todas las multas pendientes del
+    usuario. Al confirmarse el pago se levanta la sanción.
+    """
+    try:
+        return await FineService(db).create_checkout(current_user, idempotency_key)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except PaymentProviderError as e:
+        logger.error(f"✗ Error al crear preferencia de multas para {current_user['email']}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Error al comunicarse con Mercado Pago"
+        )
+
+
+def _valid_signature(request: Request, data_id: str) -> bool:
+    """
+    Valida la cabecera x-signature de Mercado Pago (ts=...,v1=...) con la
+    clave secreta del webhook
+    """
+    parts = dict(
+        part.strip().split("=", 1)
+        for part in request.headers.get("x-signature", "").split(",")
+        if "=" in part
+    )
+    if "ts" not in parts or "v1" not in parts:
+        return False
+    manifest = f"id:{data_id.lower()};request-id:{request.headers.get('x-request-id', '')};ts:{parts['ts']};"
+    expected = hmac.new(
+        settings.MERCADOPAGO_WEBHOOK_SECRET.encode(), manifest.encode(), hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, parts["v1"])
+
+
+@router.post("/webhook")
+async def payment_webhook(request: Request, db=Depends(get_database)):
+    """
+    Notificaciones de Mercado Pago. Solo encola el pago y responde; el
+    estado se concilia en segundo plano consultando la API, así que una
+    notificación falsificada no puede marcar multas como pagadas.
+    """
     try:
-        # Convertir items Pydantic a dicts
-        items_list = [item.model_dump() for item in payment_data.items]
-        
-        print(f"DEBUG: Intentando crear pago para {payment_data.email}")
-        
-        result = PaymentService.create_preference(items_list, payment_data.email)
-        
-        return {
-            "preferenceId": result["id"], 
-            "init_point": result["init_point"],
-            "sandbox_init_point": result["sandbox_init_point"]
-        }
-    except Exception as e:
-        print("ERROR CRÍTICO EN MERCADO PAGO:")
-        print(e)
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+        body = await request.json()
+    except ValueError:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+    params = request.query_params
+    topic = body.get("type") or body.get("topic") or params.get("type") or params.get("topic")
+    data_id = (body.get("data") or {}).get("id") or params.get("data.id") or params.get("id")
+
+    if topic != "payment" or not data_id:
+        # Otros eventos (merchant_order, etc.) se aceptan sin procesar
+        return {"recibido": True}
+
+    data_id = str(data_id)
+    if settings.MERCADOPAGO_WEBHOOK_SECRET and not _valid_signature(request, data_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Firma inválida"
+        )
+
+    await FineService(db).enqueue_notification(data_id)
+    return {"recibido": True}
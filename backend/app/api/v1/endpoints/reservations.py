@@ -2,11 +2,14 @@
 Endpoints de gestión de reservas
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 
 from app.core.database import get_database
+from app.core.pagination import set_next_cursor
+from app.core.serialization import json_response
 from app.models.reservation import ReservationCreate, ReservationResponse, ReservationStatus
-from app.services.reservation_service import ReservationService
+from app.services.reservation_service import RESERVATION_ROWS, ReservationService
+from app.services.document_service import DOCUMENT_SUMMARY_FIELDS
 from app.api.dependencies import get_current_user, get_bibliotecario_user
 
 router = APIRouter()
@@ -49,11 +52,13 @@ async def create_reservation(
 
 @router.get("/", response_model=List[ReservationResponse])
 async def list_reservations(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     user_id: Optional[str] = None,
     document_id: Optional[str] = None,
     estado: Optional[ReservationStatus] = None,
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (cabecera X-Next-Cursor)"),
     db=Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
@@ -70,34 +75,40 @@ async def list_reservations(
         user_id = str(current_user["_id"])
     
     reservation_service = ReservationService(db)
-    reservations = await reservation_service.get_reservations(
-        skip=skip,
-        limit=limit,
-        user_id=user_id,
-        document_id=document_id,
-        estado=estado
-    )
+    try:
+        reservations = await reservation_service.get_reservations(
+            skip=skip,
+            limit=limit,
+            user_id=user_id,
+            document_id=document_id,
+            estado=estado,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    set_next_cursor(response, reservations, limit)
     
     # Enriquecer con información del documento
     enriched_reservations = []
     for res in reservations:
         # Obtener información del documento
-        document = await db.documents.find_one({"_id": ObjectId(res["document_id"])})
+        document = await db.documents.find_one(
+            {"_id": ObjectId(res["document_id"])}, DOCUMENT_SUMMARY_FIELDS
+        )
         
         enriched_reservations.append(
-            ReservationResponse(
-                _id=str(res["_id"]),
-                document_id=res["document_id"],
-                user_id=res["user_id"],
-                fecha_reserva=res["fecha_reserva"],
-                fecha_creacion=res["fecha_creacion"],
-                estado=res["estado"],
+            RESERVATION_ROWS.row(
+                res,
                 document_titulo=document["titulo"] if document else None,
                 document_id_fisico=document["id_fisico"] if document else None
             )
         )
     
-    return enriched_reservations
+    return json_response(enriched_reservations, response)
 
 
 @router.get("/{reservation_id}", response_model=ReservationResponse)
@@ -1,12 +1,19 @@
 """
 Endpoints de estadísticas y reportes
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pymongo import DESCENDING
 from bson import ObjectId
 
-from app.core.database import get_database
+from app.core.database import get_database, get_service_database
+from app.core.pagination import paginate, set_next_cursor
+from app.core.projections import fields
+from app.services.base import BaseService
+from app.services.item_service import ITEM_DOCUMENT_FIELDS
+from app.services.loan_service import LoanService
+from app.services.user_service import USER_CONTACT_FIELDS
 from app.api.dependencies import get_bibliotecario_user, get_current_user
 from app.models.user import UserRole
 
@@ -15,34 +22,60 @@ router = APIRouter()
 
 @router.get("/loans/history", response_model=List[Dict[str, Any]])
 async def get_loan_history(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (cabecera X-Next-Cursor)"),
     current_user: dict = Depends(get_current_user),
     db=Depends(get_database)
 ):
     """
     Obtiene el historial de préstamos del usuario actual
     """
-    # Obtener préstamos del usuario
-    loans_cursor = db.loans.find({
-        "user_id": str(current_user["_id"])
-    }).sort("fecha_prestamo", -1).skip(skip).limit(limit)
-    
+    # Obtener préstamos del usuario (más recientes primero)
+    try:
+        loans_cursor = paginate(
+            db.loans,
+            {"user_id": str(current_user["_id"])},
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            sort_field="fecha_prestamo",
+            direction=DESCENDING,
+            projection=fields(
+                "item_id", "tipo_prestamo", "fecha_prestamo",
+                "fecha_devolucion_pactada", "fecha_devolucion_real", "estado"
+            )
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
     loans = await loans_cursor.to_list(length=limit)
+    set_next_cursor(response, loans, limit, sort_field="fecha_prestamo")
     
     # Enriquecer con información de documentos
+    document_fields = fields("titulo", "autor", "tipo")
     result = []
     for loan in loans:
-        item = await db.items.find_one({"_id": ObjectId(loan["item_id"])})
+        item = await db.items.find_one(
+            {"_id": ObjectId(loan["item_id"])}, ITEM_DOCUMENT_FIELDS
+        )
         if item:
             # El document_id puede ser un ObjectId o un ID físico (string)
             document_id = item["document_id"]
             # Intentar buscar por ObjectId primero
             try:
-                document = await db.documents.find_one({"_id": ObjectId(document_id)})
+                document = await db.documents.find_one(
+                    {"_id": ObjectId(document_id)}, document_fields
+                )
             except:
                 # Si falla, buscar por ID físico
-                document = await db.documents.find_one({"id_fisico": document_id})
+                document = await db.documents.find_one(
+                    {"id_fisico": document_id}, document_fields
+                )
             if document:
                 result.append({
                     "loan_id": str(loan["_id"]),
@@ -65,7 +98,7 @@ async def get_loan_history(
 async def get_popular_documents(
     limit: int = Query(10, ge=1, le=50),
     days: int = Query(30, ge=1, le=365),
-    db=Depends(get_database),
+    db=Depends(get_service_database("statistics")),
     current_user: dict = Depends(get_bibliotecario_user)
 ):
     """
@@ -107,12 +140,16 @@ async def get_popular_documents(
         }
     ]
     
-    results = await db.loans.aggregate(pipeline).to_list(length=limit)
+    reads = BaseService(db)
+    results = await reads.shared_aggregate(db.loans, pipeline, length=limit)
     
     # Enriquecer con información de documentos
     popular_docs = []
+    document_fields = fields("titulo", "autor", "categoria", "tipo")
     for result in results:
-        document = await db.documents.find_one({"_id": ObjectId(result["_id"])})
+        document = await reads.shared_find_one(
+            db.documents, {"_id": ObjectId(result["_id"])}, document_fields
+        )
         if document:
             popular_docs.append({
                 "document_id": str(document["_id"]),
@@ -130,7 +167,7 @@ async def get_popular_documents(
 async def get_active_users(
     limit: int = Query(10, ge=1, le=50),
     days: int = Query(30, ge=1, le=365),
-    db=Depends(get_database),
+    db=Depends(get_service_database("statistics")),
     current_user: dict = Depends(get_bibliotecario_user)
 ):
     """
@@ -159,12 +196,15 @@ async def get_active_users(
         }
     ]
     
-    results = await db.loans.aggregate(pipeline).to_list(length=limit)
+    reads = BaseService(db)
+    results = await reads.shared_aggregate(db.loans, pipeline, length=limit)
     
     # Enriquecer con información de usuarios
     active_users = []
     for result in results:
-        user = await db.users.find_one({"_id": ObjectId(result["_id"])})
+        user = await reads.shared_find_one(
+            db.users, {"_id": ObjectId(result["_id"])}, USER_CONTACT_FIELDS
+        )
         if user:
             active_users.append({
                 "user_id": str(user["_id"]),
@@ -178,36 +218,41 @@ async def get_active_users(
 
 @router.get("/dashboard", response_model=Dict[str, Any])
 async def get_dashboard_stats(
-    db=Depends(get_database),
+    db=Depends(get_service_database("statistics")),
     current_user: dict = Depends(get_bibliotecario_user)
 ):
     """
     Obtiene estadísticas generales para el dashboard
     Requiere rol de bibliotecario o administrativo
     """
+    # Los conteos idénticos de paneles abiertos a la vez se comparten
+    reads = BaseService(db)
+    # Truncar al segundo para que las consultas por fecha también coincidan
+    now = datetime.utcnow().replace(microsecond=0)
+    
     # Contar totales
-    total_users = await db.users.count_documents({"rol": "lector"})
-    total_documents = await db.documents.count_documents({})
-    total_items = await db.items.count_documents({})
-    items_disponibles = await db.items.count_documents({"estado": "disponible"})
-    items_prestados = await db.items.count_documents({"estado": "prestado"})
+    total_users = await reads.shared_count(db.users, {"rol": "lector"})
+    total_documents = await reads.shared_count(db.documents, {})
+    total_items = await reads.shared_count(db.items, {})
+    items_disponibles = await reads.shared_count(db.items, {"estado": "disponible"})
+    items_prestados = await reads.shared_count(db.items, {"estado": "prestado"})
     
     # Préstamos activos
-    active_loans = await db.loans.count_documents({"estado": "activo"})
-    overdue_loans = await db.loans.count_documents({"estado": "vencido"})
+    active_loans = await reads.shared_count(db.loans, {"estado": "activo"})
+    overdue_loans = await reads.shared_count(db.loans, {"estado": "vencido"})
     
     # Reservas activas
-    active_reservations = await db.reservations.count_documents({"estado": "activa"})
+    active_reservations = await reads.shared_count(db.reservations, {"estado": "activa"})
     
     # Préstamos del último mes
-    date_limit = datetime.utcnow() - timedelta(days=30)
-    loans_last_month = await db.loans.count_documents({
+    date_limit = now - timedelta(days=30)
+    loans_last_month = await reads.shared_count(db.loans, {
         "fecha_prestamo": {"$gte": date_limit}
     })
     
     # Usuarios sancionados
-    sanctioned_users = await db.users.count_documents({
-        "sancion_hasta": {"$gte": datetime.utcnow()}
+    sanctioned_users = await reads.shared_count(db.users, {
+        "sancion_hasta": {"$gte": now}
     })
     
     return {
@@ -236,7 +281,7 @@ async def get_dashboard_stats(
 async def export_loans_csv(
     start_date: datetime = Query(None),
     end_date: datetime = Query(None),
-    db=Depends(get_database),
+    db=Depends(get_service_database("statistics")),
     current_user: dict = Depends(get_bibliotecario_user)
 ):
     """
@@ -256,48 +301,43 @@ async def export_loans_csv(
         if end_date:
             query["fecha_prestamo"]["$lte"] = end_date
     
-    # Obtener préstamos
-    loans = await db.loans.find(query).to_list(length=None)
+    loan_service = LoanService(db)
     
-    # Crear CSV en memoria
-    output = io.StringIO()
-    writer = csv.writer(output)
+    def csv_lines(rows: List[list]) -> str:
+        output = io.StringIO()
+        csv.writer(output).writerows(rows)
+        return output.getvalue()
     
-    # Escribir encabezados
-    writer.writerow([
-        'ID Préstamo', 'Usuario', 'Documento', 'Tipo Préstamo',
-        'Fecha Préstamo', 'Fecha Devolución Pactada', 'Fecha Devolución Real',
-        'Estado'
-    ])
-    
-    # Escribir datos
-    for loan in loans:
-        user = await db.users.find_one({"_id": ObjectId(loan["user_id"])})
-        item = await db.items.find_one({"_id": ObjectId(loan["item_id"])})
-        document = None
-        if item:
-            # El document_id puede ser un ObjectId o un ID físico (string)
-            document_id = item["document_id"]
-            try:
-                document = await db.documents.find_one({"_id": ObjectId(document_id)})
-            except:
-                document = await db.documents.find_one({"id_fisico": document_id})
+    async def generate():
+        # Escribir encabezados
+        yield csv_lines([[
+            'ID Préstamo', 'Usuario', 'Documento', 'Tipo Préstamo',
+            'Fecha Préstamo', 'Fecha Devolución Pactada', 'Fecha Devolución Real',
+            'Estado'
+        ]])
         
-        writer.writerow([
-            str(loan["_id"]),
-            f"{user['nombres']} {user['apellidos']}" if user else "N/A",
-            document["titulo"] if document else "N/A",
-            loan["tipo_prestamo"],
-            loan["fecha_prestamo"].strftime("%Y-%m-%d %H:%M"),
-            loan["fecha_devolucion_pactada"].strftime("%Y-%m-%d %H:%M"),
-            loan["fecha_devolucion_real"].strftime("%Y-%m-%d %H:%M") if loan.get("fecha_devolucion_real") else "N/A",
-            loan["estado"]
-        ])
+        # Escribir datos por lotes: usuarios y documentos con una consulta por lote
+        async for loans in loan_service.iter_loans_for_export(query):
+            references = await loan_service.resolve_references(loans)
+            rows = []
+            for loan in loans:
+                user = references.users.get(loan.user_id)
+                document = references.documents.get(loan.item_id)
+                rows.append([
+                    str(loan.id),
+                    f"{user.nombres} {user.apellidos}" if user else "N/A",
+                    document.titulo if document else "N/A",
+                    loan.tipo_prestamo,
+                    loan.fecha_prestamo.strftime("%Y-%m-%d %H:%M"),
+                    loan.fecha_devolucion_pactada.strftime("%Y-%m-%d %H:%M"),
+                    loan.fecha_devolucion_real.strftime("%Y-%m-%d %H:%M") if loan.fecha_devolucion_real else "N/A",
+                    loan.estado
+                ])
+            yield csv_lines(rows)
     
     # Preparar respuesta
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        generate(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=prestamos.csv"}
     )
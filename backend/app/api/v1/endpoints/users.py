@@ -2,18 +2,22 @@
 Endpoints de gestión de usuarios
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 
 from app.core.database import get_database
+from app.core.pagination import set_next_cursor
+from app.core.serialization import json_response
 from app.models.user import UserResponse, UserUpdate, UserRole
-from app.services.user_service import UserService
-from app.api.dependencies import get_current_user, get_bibliotecario_user
+from app.services.user_service import USER_ROWS, UserService
+from app.api.dependencies import (
+    get_current_user, get_current_user_profile, get_bibliotecario_user
+)
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: dict = Depends(get_current_user)):
+async def get_current_user_info(current_user: dict = Depends(get_current_user_profile)):
     """
     Obtiene la información del usuario autenticado actual.
     """
@@ -36,9 +40,11 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 
 @router.get("/", response_model=List[UserResponse])
 async def list_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     rol: Optional[UserRole] = None,
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (cabecera X-Next-Cursor)"),
     db=Depends(get_database),
     current_user: dict = Depends(get_bibliotecario_user)
 ):
@@ -46,26 +52,17 @@ async def list_users(
     Lista todos los usuarios (requiere rol de bibliotecario o administrativo).
     """
     user_service = UserService(db)
-    users = await user_service.get_users(skip=skip, limit=limit, rol=rol)
-    
-    return [
-        UserResponse(
-            _id=str(user["_id"]),
-            rut=user["rut"],
-            nombres=user["nombres"],
-            apellidos=user["apellidos"],
-            direccion=user["direccion"],
-            telefono=user["telefono"],
-            email=user["email"],
-            rol=user["rol"],
-            activo=user["activo"],
-            fecha_creacion=user["fecha_creacion"],
-            foto_url=user.get("foto_url"),
-            huella_ref=user.get("huella_ref"),
-            sancion_hasta=user.get("sancion_hasta")
+    try:
+        users = await user_service.get_users(skip=skip, limit=limit, rol=rol, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        for user in users
-    ]
+
+    set_next_cursor(response, users, limit)
+    
+    return json_response(USER_ROWS.rows(users), response)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -4,7 +4,7 @@ Router principal de la API v1
 from fastapi import APIRouter
 
 from app.api.v1.endpoints import (
-    auth, users, documents, items, loans, reservations, files, statistics, payments
+    auth, users, documents, items, loans, reservations, files, statistics, payments, diagnostics
 )
 
 api_router = APIRouter()
@@ -18,4 +18,5 @@ api_router.include_router(reservations.router, prefix="/reservations", tags=["Re
 api_router.include_router(files.router, prefix="/files", tags=["Archivos"])
 api_router.include_router(statistics.router, prefix="/statistics", tags=["Estadísticas y Reportes"])
 api_router.include_router(payments.router, prefix="/payments", tags=["Pagos"])
+api_router.include_router(diagnostics.router, prefix="/diagnostics", tags=["Diagnóstico"])
 
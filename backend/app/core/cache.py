@@ -0,0 +1,200 @@
+"""
+Cachés para resultados de consultas del catálogo
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+# Valor centinela para distinguir "no está en caché" de un resultado None
+MISS = object()
+
+
+class QueryCache:
+    """
+    Caché LRU con expiración. `invalidate` incrementa la generación y
+    descarta todas las entradas; se llama después de cada escritura que
+    puede cambiar los resultados.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        """Retorna el valor guardado o MISS si no existe o expiró"""
+        if self.ttl_seconds <= 0:
+            return MISS
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISS
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISS
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """
+        Guarda un valor. Si se indica la generación con que se calculó y
+        hubo una invalidación entretanto, el valor se descarta.
+        """
+        if self.ttl_seconds <= 0:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Descarta todas las entradas"""
+        self.generation += 1
+        self._entries.clear()
+
+
+class MemoryCacheBackend:
+    """Almacenamiento local del proceso (cada worker tiene el suyo)"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        self._cache = QueryCache(ttl_seconds, max_entries)
+
+    async def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any):
+        self._cache.set(key, value)
+
+
+class RedisCacheBackend:
+    """
+    Almacenamiento compartido entre workers en Redis. Los valores se
+    serializan con bson.json_util para conservar ObjectId y fechas.
+    """
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "bec:cache:"):
+        import redis.asyncio as redis  # Dependencia opcional
+
+        self._client = redis.from_url(url)
+        self._ttl_ms = int(ttl_seconds * 1000)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Any:
+        raw = await self._client.get(self._prefix + key)
+        return MISS if raw is None else json_util.loads(raw)
+
+    async def set(self, key: str, value: Any):
+        await self._client.set(self._prefix + key, json_util.dumps(value), px=self._ttl_ms)
+
+
+def cache_key(*parts: Any) -> str:
+    """Clave estable a partir de parámetros ya normalizados"""
+    raw = json.dumps(parts, default=str, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """Cálculo en curso de una clave y cuántas llamadas lo esperan"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave: la primera ejecuta la
+    función y las demás esperan y comparten su resultado (o su error).
+
+    La función corre en una tarea propia, así que cancelar una de las
+    llamadas (por ejemplo, porque su cliente se desconectó) no afecta a
+    las demás. La tarea solo se cancela cuando ya nadie la espera.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._inflight.get(key)
+        if call is None:
+            async def run():
+                return await compute()
+
+            call = _Call(asyncio.create_task(run()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1:
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+
+class ResponseCache:
+    """
+    Caché de resultados con cálculo único por clave: si varias peticiones
+    piden la misma clave ausente o vencida, solo una consulta MongoDB y
+    las demás esperan su resultado (evita estampidas al expirar).
+
+    Cada llamada recibe su propia copia del resultado: el valor guardado
+    en memoria y el compartido entre peticiones no se modifican.
+
+    La invalidación la dan las claves: incluyen la versión de las
+    colecciones de las que depende el resultado (ver http_cache), por lo
+    que una escritura hace que las claves anteriores dejen de usarse.
+    """
+
+    def __init__(self, ttl_seconds: float, redis_url: str = "", max_entries: int = 1024):
+        self.enabled = ttl_seconds > 0
+        self._backend = MemoryCacheBackend(ttl_seconds, max_entries)
+        self._single_flight = SingleFlight()
+
+        if self.enabled and redis_url:
+            try:
+                self._backend = RedisCacheBackend(redis_url, ttl_seconds)
+            except ImportError:
+                logger.warning("⚠ Paquete redis no instalado, se usa caché en memoria")
+
+    async def get_or_set(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Retorna el valor en caché o lo calcula una sola vez por worker"""
+        if not self.enabled:
+            return await compute()
+
+        try:
+            cached = await self._backend.get(key)
+        except Exception as e:
+            logger.warning(f"⚠ Error al leer la caché: {e}")
+            cached = MISS
+        if cached is not MISS:
+            return copy.deepcopy(cached)
+
+        async def compute_and_store():
+            value = await compute()
+            try:
+                await self._backend.set(key, value)
+            except Exception as e:
+                logger.warning(f"⚠ Error al escribir la caché: {e}")
+            return value
+
+        return copy.deepcopy(await self._single_flight.do(key, compute_and_store))
@@ -2,7 +2,7 @@
 Configuración de la aplicación
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -16,6 +16,56 @@ class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "bec_biblioteca"
+    # Pool de conexiones (por worker). Sin valor se usa lo indicado en la URL o el default del driver
+    MONGODB_MAX_POOL_SIZE: Optional[int] = None  # Driver: 100
+    MONGODB_MIN_POOL_SIZE: Optional[int] = None  # Driver: 0
+    MONGODB_MAX_IDLE_TIME_MS: Optional[int] = None  # Driver: sin límite
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None  # Driver: sin límite
+    MONGODB_COMPRESSORS: str = ""  # p. ej. "zstd,snappy,zlib" (zstd y snappy requieren zstandard / python-snappy)
+    MONGODB_READ_PREFERENCE: Optional[str] = None  # p. ej. "primaryPreferred"
+    # Preferencia de lectura por servicio (préstamos y reservas siempre leen del primario)
+    MONGODB_SERVICE_READ_PREFERENCES: Dict[str, str] = {
+        "statistics": "secondaryPreferred",
+        "batch_jobs": "secondaryPreferred",
+    }
+    MONGODB_MAX_STALENESS_SECONDS: Optional[int] = 90  # Mínimo 90; None = sin límite
+    # Presupuesto por petición: sobre él se registra la petición con sus consultas (0 = sin límite)
+    QUERY_BUDGET_COUNT: int = 25
+    QUERY_BUDGET_MS: int = 1000
+    
+    # Métricas Prometheus (GET /metrics)
+    METRICS_ENABLED: bool = True
+    LOOP_LAG_INTERVAL_SECONDS: float = 0.5  # 0 desactiva la medición del retraso del event loop
+    LOOP_BLOCK_THRESHOLD_SECONDS: float = 0.25  # Bloqueo mínimo para registrar la pila (0 = desactivado)
+    PROFILER_MAX_SECONDS: int = 120  # Duración máxima de una sesión del profiler
+    
+    # Límite de peticiones (token bucket por IP o usuario; 0 por minuto = sin límite)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_URL: str = ""  # p. ej. redis://redis:6379/1 para compartir los límites entre workers
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # Usar X-Forwarded-For (solo detrás de un proxy propio)
+    RATE_LIMIT_CATALOG_PER_MINUTE: int = 120
+    RATE_LIMIT_CATALOG_BURST: int = 40
+    RATE_LIMIT_LOGIN_PER_MINUTE: int = 10  # Por IP y por cuenta
+    RATE_LIMIT_LOGIN_BURST: int = 5
+    
+    # Descarte por sobrecarga (503) en rutas no críticas (0 desactiva cada umbral)
+    LOAD_SHED_LOOP_LAG_SECONDS: float = 0.5
+    LOAD_SHED_POOL_WAIT_MS: float = 250
+    LOAD_SHED_PATHS: List[str] = ["/api/v1/documents", "/api/v1/auth", "/api/v1/statistics"]
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = 2
+    
+    # Logging (cola asíncrona y salida JSON para Loki)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "text" para leer en consola durante el desarrollo
+    LOG_QUEUE_SIZE: int = 10000  # Con la cola llena se descartan registros en vez de bloquear
+    LOG_LEVELS: Dict[str, str] = {"aiokafka": "WARNING", "pymongo": "WARNING", "httpx": "WARNING"}
+    # Loggers frecuentes: se registra 1 de cada N mensajes INFO/DEBUG (por línea de código)
+    LOG_SAMPLING: Dict[str, int] = {"app.core.kafka_producer": 100}
+    
+    # Trazas distribuidas (OpenTelemetry, exportadas por OTLP/HTTP)
+    TRACING_ENABLED: bool = False
+    OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_SAMPLE_RATIO: float = 1.0  # Fracción de trazas nuevas que se registran
     
     # Seguridad
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
@@ -26,6 +76,22 @@ class Settings(BaseSettings):
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
     
+    # Índices del catálogo en memoria (búsqueda BM25 opcional y autocompletado)
+    SEARCH_INDEX_ENABLED: bool = False
+    SUGGEST_INDEX_ENABLED: bool = True  # false: /documents/suggest consulta MongoDB
+    SEARCH_INDEX_REFRESH_SECONDS: int = 300  # 0 desactiva la reconstrucción periódica
+    FACET_CACHE_SECONDS: int = 60  # 0 desactiva la caché de facetas
+    
+    # Caché de resultados del catálogo en el servidor
+    CATALOG_CACHE_SECONDS: int = 30  # 0 desactiva la caché
+    CACHE_REDIS_URL: str = ""  # p. ej. redis://redis:6379/0 para compartirla entre workers
+    
+    # Caché HTTP de lecturas públicas del catálogo (ETag + Cache-Control)
+    HTTP_CACHE_CONTROL: str = "public, no-cache"  # p. ej. "public, max-age=30" detrás de un CDN
+    
+    # Servicios cuyos listados leen BSON sin decodificar (RawBSONDocument), p. ej. ["items", "users"]
+    RAW_BSON_SERVICES: List[str] = []
+    
     # Kafka (para notificaciones asíncronas)
     KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
     KAFKA_EMAIL_TOPIC: str = "email-notifications"
@@ -49,6 +115,25 @@ class Settings(BaseSettings):
     
     # Mercado Pago
     MERCADOPAGO_ACCESS_TOKEN: str = ""
+    MERCADOPAGO_API_URL: str = "https://api.mercadopago.com"  # p. ej. http://localhost:8001 con scripts/mercadopago_stub.py
+    MERCADOPAGO_BACK_URL_BASE: str = "http://localhost:3000"  # Frontend al que vuelve el checkout
+    MERCADOPAGO_TIMEOUT_SECONDS: float = 10.0
+    MERCADOPAGO_MAX_CONCURRENCY: int = 10  # Llamadas simultáneas (y conexiones) por worker
+    MERCADOPAGO_MAX_RETRIES: int = 2  # Reintentos ante errores de red, 429 y 5xx
+    MERCADOPAGO_RETRY_BACKOFF_SECONDS: float = 0.5
+    MERCADOPAGO_WEBHOOK_URL: str = ""  # URL pública de POST /api/v1/payments/webhook
+    MERCADOPAGO_WEBHOOK_SECRET: str = ""  # Clave secreta del webhook para validar x-signature
+    
+    # Multas por atraso y conciliación de pagos
+    FINE_PER_DAY_CLP: int = 500  # Monto por día de atraso (0 = sin multas)
+    PAYMENT_RECONCILE_INTERVAL_SECONDS: float = 5.0  # 0 desactiva el procesamiento de notificaciones
+    PAYMENT_RECONCILE_BATCH_SIZE: int = 50
+    PAYMENT_NOTIFICATION_MAX_ATTEMPTS: int = 5
+    PAYMENT_CLAIM_TIMEOUT_SECONDS: int = 300  # Tras este tiempo otra instancia retoma una notificación
+    PAYMENT_RETRY_BACKOFF_SECONDS: float = 30.0  # Espera tras el primer fallo; se duplica en cada intento
+    PAYMENT_RETRY_MAX_BACKOFF_SECONDS: float = 900.0
+    PAYMENT_SWEEP_INTERVAL_SECONDS: float = 300.0  # Barrido de preferencias con multas pendientes (0 = desactivado)
+    PAYMENT_SWEEP_MAX_AGE_DAYS: int = 3  # Antigüedad máxima de las preferencias que revisa el barrido
 
     model_config = SettingsConfigDict(
         env_file=".env",
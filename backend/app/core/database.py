@@ -1,11 +1,21 @@
 """
 Configuración y gestión de la conexión a MongoDB
 """
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
+from fastapi import Depends
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred, _ServerMode
+)
+from pymongo.errors import ConnectionFailure, OperationFailure
 import logging
+from typing import Dict, Optional
 
 from app.core.config import settings
+from app.core.mongo_metrics import mongo_metrics
+from app.core.query_tracker import query_tracker
+from app.core.tracing import mongo_tracing
+from app.core.search import SEARCH_FIELDS, SEARCH_TOKENS_FIELD, normalized_field, search_fields
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +29,98 @@ class Database:
 db_instance = Database()
 
 
+def mongo_client_options() -> dict:
+    """Opciones del cliente definidas en la configuración (las demás quedan según la URL)"""
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "compressors": settings.MONGODB_COMPRESSORS or None,
+        "readPreference": settings.MONGODB_READ_PREFERENCE,
+    }
+    return {name: value for name, value in options.items() if value is not None}
+
+
+# Servicios con lecturas dentro de flujos transaccionales: nunca leen de un secundario
+PRIMARY_SERVICES = {"loans", "reservations"}
+
+_READ_MODES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+# Preferencias por servicio, validadas una vez al crear el cliente
+_service_read_preferences: Optional[Dict[str, _ServerMode]] = None
+
+
+def _parse_read_preference(service: str, mode: str) -> _ServerMode:
+    if mode == "primary":
+        return Primary()
+    if service in PRIMARY_SERVICES:
+        logger.warning(f"⚠ El servicio '{service}' siempre lee del primario; se ignora '{mode}'")
+        return Primary()
+    if mode not in _READ_MODES:
+        raise ValueError(f"Preferencia de lectura inválida para '{service}': {mode}")
+    max_staleness = settings.MONGODB_MAX_STALENESS_SECONDS
+    return _READ_MODES[mode](max_staleness=max_staleness if max_staleness is not None else -1)
+
+
+def load_service_read_preferences() -> Dict[str, _ServerMode]:
+    """
+    Valida MONGODB_SERVICE_READ_PREFERENCES. Se llama al iniciar: un modo
+    inválido detiene el inicio en vez de fallar en cada petición.
+    """
+    global _service_read_preferences
+    _service_read_preferences = {
+        service: _parse_read_preference(service, mode)
+        for service, mode in settings.MONGODB_SERVICE_READ_PREFERENCES.items()
+    }
+    return _service_read_preferences
+
+
+def service_read_preference(service: str) -> _ServerMode:
+    """Preferencia de lectura configurada para un servicio (primario por defecto)"""
+    preferences = _service_read_preferences
+    if preferences is None:
+        preferences = load_service_read_preferences()
+    return preferences.get(service, Primary())
+
+
+def service_database(db: AsyncIOMotorDatabase, service: str) -> AsyncIOMotorDatabase:
+    """Base de datos con la preferencia de lectura del servicio; las escrituras van siempre al primario"""
+    read_preference = service_read_preference(service)
+    if db.read_preference == read_preference:
+        return db
+    return db.with_options(read_preference=read_preference)
+
+
+def get_service_database(service: str):
+    """Dependencia: base de datos con la preferencia de lectura de `service`"""
+    def dependency(db: AsyncIOMotorDatabase = Depends(get_database)) -> AsyncIOMotorDatabase:
+        return service_database(db, service)
+    return dependency
+
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    """Cliente con las opciones de pool configuradas y los listeners de métricas, consultas y trazas"""
+    load_service_read_preferences()
+    return AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        event_listeners=[mongo_metrics, query_tracker, mongo_tracing],
+        **mongo_client_options()
+    )
+
+
 async def connect_to_mongo():
     """Conecta a MongoDB al inicio de la aplicación"""
     try:
         logger.info(f"Conectando a MongoDB: {settings.MONGODB_URL}")
-        db_instance.client = AsyncIOMotorClient(settings.MONGODB_URL)
+        db_instance.client = create_mongo_client()
+        logger.info(f"Opciones del cliente MongoDB: {mongo_client_options() or 'por defecto'}")
         db_instance.db = db_instance.client[settings.MONGODB_DB_NAME]
         
         # Verificar la conexión
@@ -32,6 +129,7 @@ async def connect_to_mongo():
         
         # Crear índices
         await create_indexes()
+        await backfill_search_fields()
         
     except ConnectionFailure as e:
         logger.error(f"✗ Error al conectar a MongoDB: {e}")
@@ -48,11 +146,23 @@ async def close_mongo_connection():
 
 async def create_indexes():
     """Crea índices en las colecciones para optimizar consultas"""
+    # Va aparte: si una base existente ya tiene id_fisico repetidos la
+    # creación falla, y eso no debe impedir crear el resto de los índices
+    try:
+        await db_instance.db.documents.create_index("id_fisico", unique=True)
+    except OperationFailure as e:
+        logger.warning(
+            f"⚠ No se pudo crear el índice único de documents.id_fisico ({e}). "
+            "Hay documentos con id_fisico repetido: mientras no se corrijan, "
+            "la unicidad no se valida al crear o actualizar documentos"
+        )
+
     try:
         # Índices para users
         await db_instance.db.users.create_index("email", unique=True)
         await db_instance.db.users.create_index("rut", unique=True)
         await db_instance.db.users.create_index("rol")
+        await db_instance.db.users.create_index([("rol", 1), ("_id", 1)])
         
         # Índices para documents
         await db_instance.db.documents.create_index("titulo")
@@ -63,27 +173,77 @@ async def create_indexes():
             ("autor", "text"),
             ("categoria", "text")
         ])
+        # Campos normalizados (sin tildes) para búsquedas por prefijo
+        await db_instance.db.documents.create_index(SEARCH_TOKENS_FIELD)
+        for field in SEARCH_FIELDS:
+            await db_instance.db.documents.create_index(normalized_field(field))
         
         # Índices para items
         await db_instance.db.items.create_index("document_id")
         await db_instance.db.items.create_index("estado")
+        await db_instance.db.items.create_index([("document_id", 1), ("_id", 1)])
         
         # Índices para loans
         await db_instance.db.loans.create_index("user_id")
         await db_instance.db.loans.create_index("item_id")
         await db_instance.db.loans.create_index("estado")
         await db_instance.db.loans.create_index("fecha_devolucion_pactada")
+        # Índices compuestos para paginación keyset (filtro + orden estable)
+        await db_instance.db.loans.create_index([("user_id", 1), ("_id", 1)])
+        await db_instance.db.loans.create_index([("estado", 1), ("_id", 1)])
+        await db_instance.db.loans.create_index([
+            ("user_id", 1), ("fecha_prestamo", -1), ("_id", -1)
+        ])
         
         # Índices para reservations
         await db_instance.db.reservations.create_index("user_id")
         await db_instance.db.reservations.create_index("document_id")
         await db_instance.db.reservations.create_index("estado")
+        await db_instance.db.reservations.create_index([("user_id", 1), ("_id", 1)])
+        
+        # Índices para multas y la cola de notificaciones de pago
+        await db_instance.db.fines.create_index("loan_id", unique=True)
+        await db_instance.db.fines.create_index([("user_id", 1), ("estado", 1)])
+        await db_instance.db.fines.create_index([("user_id", 1), ("_id", 1)])
+        await db_instance.db.fines.create_index([("estado", 1), ("_id", 1)])
+        await db_instance.db.fine_payments.create_index("fecha_creacion")
+        await db_instance.db.payment_notifications.create_index([("estado", 1), ("proximo_intento", 1)])
+        await db_instance.db.payment_notifications.create_index("reclamo")
         
         logger.info("✓ Índices creados exitosamente")
     except Exception as e:
         logger.error(f"Error al crear índices: {e}")
 
 
+async def backfill_search_fields(batch_size: int = 1000):
+    """
+    Completa los campos de búsqueda normalizados de documentos creados
+    antes de que existieran (o insertados directamente en la base)
+    """
+    try:
+        projection = {field: 1 for field in SEARCH_FIELDS}
+        cursor = db_instance.db.documents.find(
+            {SEARCH_TOKENS_FIELD: {"$exists": False}}, projection
+        ).batch_size(batch_size)
+
+        operations = []
+        updated = 0
+        async for doc in cursor:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(doc)}))
+            if len(operations) >= batch_size:
+                await db_instance.db.documents.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            await db_instance.db.documents.bulk_write(operations, ordered=False)
+            updated += len(operations)
+
+        if updated:
+            logger.info(f"✓ Campos de búsqueda completados en {updated} documentos")
+    except Exception as e:
+        logger.error(f"Error al completar campos de búsqueda: {e}")
+
+
 def get_database():
     """Retorna la instancia de la base de datos"""
     return db_instance.db
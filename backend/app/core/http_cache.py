@@ -0,0 +1,90 @@
+"""
+Caché HTTP para lecturas públicas del catálogo (ETag y Cache-Control)
+
+Cada colección tiene un contador de versión en MongoDB que se incrementa
+con cada escritura. El ETag de una respuesta se calcula a partir de la
+ruta, los parámetros y las versiones de las colecciones de las que
+depende, por lo que validar un If-None-Match cuesta una sola lectura
+por _id en lugar de la consulta completa.
+"""
+import hashlib
+import json
+import logging
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_COLLECTION = "collection_versions"
+
+
+async def bump_version(db, *collections: str):
+    """
+    Incrementa la versión de las colecciones modificadas. Un fallo aquí
+    no revierte la escritura ya hecha, solo se registra.
+    """
+    try:
+        for name in collections:
+            await db[VERSIONS_COLLECTION].update_one(
+                {"_id": name}, {"$inc": {"version": 1}}, upsert=True
+            )
+    except PyMongoError as e:
+        logger.warning(f"⚠ No se pudo actualizar la versión de {collections}: {e}")
+
+
+async def get_versions(db, *collections: str) -> Dict[str, int]:
+    """Retorna la versión actual de cada colección (0 si nunca se escribió)"""
+    versions = {name: 0 for name in collections}
+    cursor = db[VERSIONS_COLLECTION].find({"_id": {"$in": list(collections)}})
+    async for doc in cursor:
+        versions[doc["_id"]] = doc.get("version", 0)
+    return versions
+
+
+def make_etag(request: Request, versions: Dict[str, int]) -> str:
+    """ETag débil para una ruta, sus parámetros y las versiones de sus colecciones"""
+    key = json.dumps(
+        [request.url.path, sorted(request.query_params.multi_items()), sorted(versions.items())],
+        separators=(",", ":")
+    )
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Compara un If-None-Match con el ETag (comparación débil)"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db,
+    *collections: str
+) -> Optional[Response]:
+    """
+    Agrega ETag y Cache-Control a la respuesta. Si el cliente ya tiene la
+    versión vigente (If-None-Match) retorna una respuesta 304 que el
+    endpoint debe devolver sin ejecutar la consulta.
+    """
+    versions = await get_versions(db, *collections)
+    # Quedan en la petición para que la caché de resultados no las vuelva a leer
+    request.state.collection_versions = versions
+    etag = make_etag(request, versions)
+    headers = {"ETag": etag, "Cache-Control": settings.HTTP_CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -3,11 +3,14 @@ Productor de eventos Kafka para notificaciones asíncronas
 """
 import json
 import logging
+import time
 from typing import Dict, Any, Optional
 from aiokafka import AIOKafkaProducer
 from aiokafka.errors import KafkaError
 
 from app.core.config import settings
+from app.core.metrics import KAFKA_SEND_DURATION, KAFKA_SENDS_IN_FLIGHT
+from app.core.tracing import inject_headers, span
 
 logger = logging.getLogger(__name__)
 
@@ -61,13 +64,22 @@ class KafkaProducerManager:
             logger.warning(f"Productor Kafka no disponible. Evento no enviado: {event}")
             return False
         
+        KAFKA_SENDS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        result = "error"
         try:
-            await self.producer.send_and_wait(topic, event)
+            # El contexto de la traza viaja en las cabeceras hasta el consumidor
+            with span(f"kafka send {topic}", "producer", {"messaging.system": "kafka", "messaging.destination": topic}):
+                await self.producer.send_and_wait(topic, event, headers=inject_headers() or None)
+            result = "ok"
             logger.info(f"✓ Evento enviado a Kafka: {topic}")
             return True
         except Exception as e:
             logger.error(f"✗ Error al enviar evento a Kafka: {e}")
             return False
+        finally:
+            KAFKA_SENDS_IN_FLIGHT.dec()
+            KAFKA_SEND_DURATION.labels(topic, result).observe(time.perf_counter() - started)
     
     async def send_email_notification(
         self,
@@ -0,0 +1,198 @@
+"""
+Configuración de logging de los procesos (API, worker de notificaciones y
+trabajos batch)
+
+- Los registros se encolan (QueueHandler) y un hilo aparte los formatea y
+  escribe (QueueListener): el event loop no espera a stdout. Si la cola
+  se llena se descartan registros en lugar de bloquear.
+- Salida JSON de una línea por registro (LOG_FORMAT=json) que promtail
+  interpreta sin expresiones regulares; LOG_FORMAT=text para desarrollo.
+- Nivel por módulo (LOG_LEVELS) y muestreo de 1 de cada N registros
+  INFO/DEBUG en loggers muy frecuentes (LOG_SAMPLING).
+- Cada registro incluye el ID de la petición y de la traza en curso.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.query_tracker import current_request
+
+try:
+    from opentelemetry import trace  # Dependencia opcional (ver app.core.tracing)
+except ImportError:
+    trace = None
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Loggers de uvicorn: se redirigen al handler de la aplicación
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Atributos estándar de LogRecord; los demás (extra=...) se agregan al JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def _current_trace_ids() -> Dict[str, str]:
+    if trace is None:
+        return {}
+    context = trace.get_current_span().get_span_context()
+    if not context.is_valid:
+        return {}
+    return {"trace_id": f"{context.trace_id:032x}", "span_id": f"{context.span_id:016x}"}
+
+
+class ContextFilter(logging.Filter):
+    """
+    Agrega el servicio, el ID de petición y el de la traza. Se ejecuta en
+    el hilo que registra (las variables de contexto no llegan al listener).
+    """
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.service = self.service
+        request = current_request.get()
+        if request is not None:
+            record.request_id = request.request_id
+        for key, value in _current_trace_ids().items():
+            setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar 1 de cada N registros INFO/DEBUG de los loggers configurados.
+    Se cuenta por línea de código, así que los mensajes poco frecuentes
+    del mismo logger (inicio, parada) no se pierden.
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate > 1}
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def _rate(self, name: str) -> int:
+        # El prefijo más largo configurado (app.core cubre app.core.kafka_producer)
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate == 1:
+            return True
+        site = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(site, 0)
+            self._counts[site] = count + 1
+        # Permite estimar el total en Loki: cada registro representa `rate`
+        record.sample_rate = rate
+        return count % rate == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que descarta registros con la cola llena en vez de bloquear"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A diferencia de QueueHandler.prepare, no formatea aquí: el
+        # formateo (JSON o texto) ocurre en el hilo del listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con los campos que indexa Loki"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_")
+        )
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(service: str):
+    """
+    Configura el logging del proceso. Se llama una vez al inicio; las
+    llamadas siguientes no hacen nada.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    _handler = handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter(settings.LOG_SAMPLING))
+    handler.addFilter(ContextFilter(service))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    for name in _UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Escribe los registros pendientes y detiene el hilo del listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None and _handler.dropped:
+        print(f"⚠ {_handler.dropped} registros de log descartados con la cola llena", file=sys.stderr)
@@ -0,0 +1,128 @@
+"""
+Medición del retraso del event loop y detección de bloqueos
+
+Una tarea duerme un intervalo fijo y mide cuánto tarda de más en volver a
+ejecutarse: ese exceso es el tiempo en que el loop estuvo ocupado con
+código que no cede el control (CPU o llamadas bloqueantes).
+
+Mientras el loop está bloqueado esa tarea no puede ejecutarse, así que un
+hilo vigilante revisa cuándo fue su última ejecución; si pasa más de
+LOOP_BLOCK_THRESHOLD_SECONDS captura la pila del hilo del loop (la del
+código que lo bloquea) y la registra en el log.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG, EVENT_LOOP_LAG_HISTOGRAM
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Mide periódicamente el retraso del event loop y detecta bloqueos"""
+
+    def __init__(self, interval_seconds: float, block_threshold_seconds: float = 0.0, max_stalls: int = 20):
+        self.interval_seconds = interval_seconds
+        self.block_threshold_seconds = block_threshold_seconds
+        self.lag = 0.0
+        # Últimos bloqueos detectados (los más recientes al final)
+        self.stalls = deque(maxlen=max_stalls)
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_watchdog = threading.Event()
+
+    @property
+    def loop_thread_id(self) -> Optional[int]:
+        """Identificador del hilo donde corre el event loop"""
+        return self._loop_thread_id
+
+    def start(self):
+        """Inicia la medición en segundo plano (desde el hilo del loop)"""
+        if self.interval_seconds <= 0 or self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+        if self.block_threshold_seconds > 0:
+            self._stop_watchdog.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval_seconds)
+            self.lag = max(loop.time() - started - self.interval_seconds, 0.0)
+            EVENT_LOOP_LAG.set(self.lag)
+            EVENT_LOOP_LAG_HISTOGRAM.observe(self.lag)
+
+    def _watch(self):
+        """Hilo vigilante: captura la pila del loop una vez por bloqueo"""
+        check_every = min(self.block_threshold_seconds, self.interval_seconds) / 2
+        reported_beat = None
+        while not self._stop_watchdog.wait(check_every):
+            beat = self._last_beat
+            # Tiempo sin volver a ejecutarse, descontando la espera normal
+            blocked_for = time.monotonic() - beat - self.interval_seconds
+            if blocked_for <= self.block_threshold_seconds or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self._report_stall(blocked_for)
+
+    def _report_stall(self, blocked_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame))
+        task = asyncio.current_task(self._loop)
+        task_name = task.get_name() if task else "-"
+        coroutine = getattr(task.get_coro(), "__qualname__", "-") if task else "-"
+
+        EVENT_LOOP_BLOCKS.inc()
+        self.stalls.append({
+            "fecha": datetime.utcnow(),
+            "bloqueado_segundos": round(blocked_for, 3),
+            "tarea": task_name,
+            "corrutina": coroutine,
+            "pila": stack,
+        })
+        logger.warning(
+            f"⚠ Event loop bloqueado más de {blocked_for:.3f} s "
+            f"(tarea {task_name}, {coroutine}). Pila:\n{stack}"
+        )
+
+    async def stop(self):
+        """Detiene la medición y el hilo vigilante"""
+        self._stop_watchdog.set()
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Instancia global
+loop_monitor = LoopLagMonitor(
+    settings.LOOP_LAG_INTERVAL_SECONDS,
+    settings.LOOP_BLOCK_THRESHOLD_SECONDS
+)
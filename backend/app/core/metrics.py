@@ -0,0 +1,186 @@
+"""
+Métricas Prometheus de la API (GET /metrics)
+
+- Latencia de las peticiones por método, ruta y estado, y peticiones en curso
+- Retraso del event loop
+- Pool y comandos de MongoDB (desde mongo_metrics)
+- Envíos a Kafka en curso y su latencia
+- Duración de las operaciones de MinIO (también como spans, ver tracing)
+- Peticiones rechazadas por el limitador (429) y por sobrecarga (503)
+
+Las métricas son por proceso: con varios workers, Prometheus debe
+consultar cada uno (o usarse un solo worker por contenedor).
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+from app.core.mongo_metrics import mongo_metrics
+from app.core.tracing import span
+
+# Ruta para las peticiones que no coinciden con ningún endpoint (evita una serie por URL)
+UNMATCHED_ROUTE = "<sin_ruta>"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "bec_http_request_duration_seconds",
+    "Duración de las peticiones HTTP",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "bec_http_requests_in_flight",
+    "Peticiones HTTP en curso",
+)
+EVENT_LOOP_LAG = Gauge(
+    "bec_event_loop_lag_seconds",
+    "Último retraso medido del event loop",
+)
+EVENT_LOOP_LAG_HISTOGRAM = Histogram(
+    "bec_event_loop_lag_distribution_seconds",
+    "Distribución del retraso del event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "bec_event_loop_blocks",
+    "Bloqueos del event loop sobre el umbral (con pila registrada en el log)",
+)
+KAFKA_SENDS_IN_FLIGHT = Gauge(
+    "bec_kafka_producer_pending_sends",
+    "Mensajes entregados al productor Kafka que esperan confirmación",
+)
+KAFKA_SEND_DURATION = Histogram(
+    "bec_kafka_send_duration_seconds",
+    "Duración de los envíos a Kafka hasta la confirmación",
+    ["topic", "result"],
+)
+RATE_LIMITED_REQUESTS = Counter(
+    "bec_rate_limited_requests",
+    "Peticiones rechazadas con 429 por el limitador",
+    ["rule"],
+)
+SHED_REQUESTS = Counter(
+    "bec_shed_requests",
+    "Peticiones rechazadas con 503 por sobrecarga",
+    ["reason"],
+)
+STORAGE_OPERATION_DURATION = Histogram(
+    "bec_storage_operation_duration_seconds",
+    "Duración de las operaciones de MinIO",
+    ["operation", "result"],
+)
+
+
+@contextmanager
+def observe_storage(operation: str):
+    """
+    Mide una operación de MinIO (y la registra como span de la traza en
+    curso); el resultado es 'error' si lanza una excepción
+    """
+    started = time.perf_counter()
+    result = "ok"
+    try:
+        with span(f"minio {operation}", "client", {"storage.operation": operation}):
+            yield
+    except Exception:
+        result = "error"
+        raise
+    finally:
+        STORAGE_OPERATION_DURATION.labels(operation, result).observe(time.perf_counter() - started)
+
+
+def _histogram_buckets(stats: dict) -> list:
+    return [(str(bound), count) for bound, count in stats["buckets"].items()] + [("+Inf", stats["count"])]
+
+
+class MongoCollector:
+    """Expone el estado acumulado por mongo_metrics en cada consulta de /metrics"""
+
+    def collect(self):
+        snapshot = mongo_metrics.snapshot()
+
+        open_connections = GaugeMetricFamily(
+            "bec_mongo_pool_connections", "Conexiones abiertas del pool", labels=["address"]
+        )
+        in_use = GaugeMetricFamily(
+            "bec_mongo_pool_connections_in_use", "Conexiones del pool en uso", labels=["address"]
+        )
+        in_use_max = GaugeMetricFamily(
+            "bec_mongo_pool_connections_in_use_max", "Máximo de conexiones en uso", labels=["address"]
+        )
+        max_size = GaugeMetricFamily(
+            "bec_mongo_pool_max_size", "Tamaño máximo del pool", labels=["address"]
+        )
+        checkout_wait = HistogramMetricFamily(
+            "bec_mongo_pool_checkout_wait_seconds", "Espera para obtener una conexión", labels=["address"]
+        )
+        checkout_failures = CounterMetricFamily(
+            "bec_mongo_pool_checkout_failures", "Fallos al obtener una conexión", labels=["address", "reason"]
+        )
+        for address, pool in snapshot["pools"].items():
+            open_connections.add_metric([address], pool["open"])
+            in_use.add_metric([address], pool["in_use"])
+            in_use_max.add_metric([address], pool["in_use_max"])
+            if pool["max_pool_size"] is not None:
+                max_size.add_metric([address], pool["max_pool_size"])
+            wait = pool["checkout_wait"]
+            checkout_wait.add_metric([address], _histogram_buckets(wait), wait["total_seconds"])
+            for reason, count in pool["checkout_failures"].items():
+                checkout_failures.add_metric([address, reason], count)
+
+        command_duration = HistogramMetricFamily(
+            "bec_mongo_command_duration_seconds", "Duración de los comandos de MongoDB", labels=["command"]
+        )
+        command_failures = CounterMetricFamily(
+            "bec_mongo_command_failures", "Comandos de MongoDB fallidos", labels=["command"]
+        )
+        for name, stats in snapshot["commands"].items():
+            command_duration.add_metric([name], _histogram_buckets(stats), stats["total_seconds"])
+            command_failures.add_metric([name], stats["failures"])
+
+        yield from (
+            open_connections, in_use, in_use_max, max_size, checkout_wait,
+            checkout_failures, command_duration, command_failures,
+        )
+
+
+REGISTRY.register(MongoCollector())
+
+
+def render_metrics() -> tuple:
+    """Cuerpo y content type de la respuesta de /metrics"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia por ruta y estado, y peticiones en curso"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                route.path_format if route is not None else UNMATCHED_ROUTE,
+                str(status_code),
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,212 @@
+"""
+Métricas del pool de conexiones y de los comandos de MongoDB
+
+Listeners de PyMongo (eventos CMAP y de comandos) que acumulan, por
+worker, el tiempo de espera para obtener una conexión del pool, las
+conexiones en uso y la latencia de cada comando. Sirven para dimensionar
+MONGODB_MAX_POOL_SIZE: esperas altas con el pool lleno indican que falta
+capacidad; un máximo en uso muy por debajo del tamaño, que sobra.
+
+Motor ejecuta PyMongo en hilos, por lo que los eventos llegan desde
+varios hilos y el acceso a los contadores se protege con un lock.
+"""
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from pymongo import monitoring
+
+# Límites superiores (segundos) de los intervalos del histograma
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Constante de tiempo (segundos) de la espera reciente de checkout
+RECENT_WAIT_DECAY_SECONDS = 5.0
+
+
+class LatencyStats:
+    """Histograma acumulado de duraciones"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def snapshot(self) -> dict:
+        cumulative, running = [], 0
+        for count in self.buckets:
+            running += count
+            cumulative.append(running)
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "total_seconds": self.total,
+            "buckets": dict(zip(LATENCY_BUCKETS, cumulative)),
+        }
+
+
+class _PoolStats:
+    """Estado del pool de un servidor"""
+
+    def __init__(self):
+        self.max_pool_size = None
+        self.open = 0
+        self.in_use = 0
+        self.in_use_max = 0
+        self.checkout_wait = LatencyStats()
+        self.checkout_failures: Dict[str, int] = defaultdict(int)
+        self.cleared = 0
+
+
+class _CommandStats:
+    def __init__(self):
+        self.latency = LatencyStats()
+        self.failures = 0
+
+
+def _address(address: Tuple[str, int]) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class MongoMetrics(monitoring.ConnectionPoolListener, monitoring.CommandListener):
+    """Listener de pool y comandos; se registra al crear el cliente"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pools: Dict[str, _PoolStats] = defaultdict(_PoolStats)
+        self._commands: Dict[str, _CommandStats] = defaultdict(_CommandStats)
+        # Media móvil de la espera de checkout (todas las direcciones) y su última actualización
+        self._recent_wait = 0.0
+        self._recent_wait_at = time.monotonic()
+
+    # Pool (CMAP)
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pools[_address(event.address)].max_pool_size = event.options.get("maxPoolSize")
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pools[_address(event.address)].cleared += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(_address(event.address), None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pools[_address(event.address)].open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pools[_address(event.address)]
+            pool.open = max(pool.open - 1, 0)
+
+    def connection_check_out_started(self, event):
+        # El checkout ocurre completo en el hilo que lo inicia
+        self._local.checkout_started = time.perf_counter()
+
+    def _checkout_wait(self) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def _decayed_wait(self, now: float) -> float:
+        return self._recent_wait * math.exp(-(now - self._recent_wait_at) / RECENT_WAIT_DECAY_SECONDS)
+
+    def _observe_recent_wait(self, wait: float):
+        # Media móvil exponencial en el tiempo: sin checkouts, vuelve a cero
+        now = time.monotonic()
+        self._recent_wait = self._decayed_wait(now) * 0.8 + wait * 0.2
+        self._recent_wait_at = now
+
+    def recent_checkout_wait(self) -> float:
+        """Espera reciente (segundos) para obtener una conexión del pool"""
+        with self._lock:
+            return self._decayed_wait(time.monotonic())
+
+    def connection_check_out_failed(self, event):
+        wait = self._checkout_wait()
+        with self._lock:
+            pool = self._pools[_address(event.address)]
+            pool.checkout_wait.observe(wait)
+            pool.checkout_failures[str(event.reason)] += 1
+            self._observe_recent_wait(wait)
+
+    def connection_checked_out(self, event):
+        wait = self._checkout_wait()
+        with self._lock:
+            pool = self._pools[_address(event.address)]
+            pool.checkout_wait.observe(wait)
+            self._observe_recent_wait(wait)
+            pool.in_use += 1
+            pool.in_use_max = max(pool.in_use_max, pool.in_use)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pools[_address(event.address)]
+            pool.in_use = max(pool.in_use - 1, 0)
+
+    # Comandos
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self._lock:
+            self._commands[event.command_name].latency.observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        with self._lock:
+            stats = self._commands[event.command_name]
+            stats.latency.observe(event.duration_micros / 1_000_000)
+            stats.failures += 1
+
+    def snapshot(self) -> dict:
+        """Copia de las métricas del worker actual"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "recent_checkout_wait_ms": round(self._decayed_wait(time.monotonic()) * 1000, 3),
+                "pools": {
+                    address: {
+                        "max_pool_size": pool.max_pool_size,
+                        "open": pool.open,
+                        "in_use": pool.in_use,
+                        "in_use_max": pool.in_use_max,
+                        "cleared": pool.cleared,
+                        "checkout_failures": dict(pool.checkout_failures),
+                        "checkout_wait": pool.checkout_wait.snapshot(),
+                    }
+                    for address, pool in self._pools.items()
+                },
+                "commands": {
+                    name: {**stats.latency.snapshot(), "failures": stats.failures}
+                    for name, stats in sorted(self._commands.items())
+                },
+            }
+
+
+# Instancia global, registrada en todos los clientes del proceso
+mongo_metrics = MongoMetrics()
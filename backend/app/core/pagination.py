@@ -0,0 +1,116 @@
+"""
+Paginación por cursor (keyset) para los listados de la API
+"""
+import base64
+from typing import Any, List, Optional
+
+from bson import ObjectId, json_util
+from bson.errors import BSONError
+from fastapi import Response
+from pymongo import ASCENDING
+
+# Cabecera con el cursor de la página siguiente
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(document: dict, sort_field: str = "_id") -> str:
+    """Genera un cursor opaco a partir del último documento de una página"""
+    if sort_field == "_id":
+        values = [document["_id"]]
+    else:
+        values = [document.get(sort_field), document["_id"]]
+
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str = "_id") -> List[Any]:
+    """
+    Decodifica un cursor generado por encode_cursor
+
+    Raises:
+        ValueError: si el cursor no es válido para el campo de orden
+    """
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError, BSONError):
+        raise ValueError("Cursor de paginación inválido")
+
+    expected = 1 if sort_field == "_id" else 2
+    if (
+        not isinstance(values, list)
+        or len(values) != expected
+        or not isinstance(values[-1], ObjectId)
+    ):
+        raise ValueError("Cursor de paginación inválido")
+    return values
+
+
+def keyset_filter(cursor: str, sort_field: str = "_id", direction: int = ASCENDING) -> dict:
+    """Construye el filtro que continúa la lectura después del cursor"""
+    values = decode_cursor(cursor, sort_field)
+    op = "$gt" if direction == ASCENDING else "$lt"
+
+    if sort_field == "_id":
+        return {"_id": {op: values[0]}}
+
+    sort_value, last_id = values
+    return {
+        "$or": [
+            {sort_field: {op: sort_value}},
+            {sort_field: sort_value, "_id": {op: last_id}}
+        ]
+    }
+
+
+def paginate(
+    collection,
+    query: dict,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort_field: str = "_id",
+    direction: int = ASCENDING,
+    projection: Optional[dict] = None
+):
+    """
+    Retorna un cursor de Motor con orden estable y paginación aplicada.
+
+    Si se recibe `cursor` se usa paginación keyset (costo constante sin
+    importar la profundidad) y `skip` se ignora; `skip` se mantiene solo
+    por compatibilidad con clientes existentes.
+    """
+    if cursor:
+        keyset = keyset_filter(cursor, sort_field, direction)
+        if keyset.keys() & query.keys():
+            query = {"$and": [query, keyset]}
+        else:
+            query = {**query, **keyset}
+        skip = 0
+
+    if sort_field == "_id":
+        sort = [("_id", direction)]
+    else:
+        sort = [(sort_field, direction), ("_id", direction)]
+
+    return collection.find(query, projection).sort(sort).skip(skip).limit(limit)
+
+
+def next_cursor(documents: List[dict], limit: int, sort_field: str = "_id") -> Optional[str]:
+    """Retorna el cursor de la página siguiente, o None si no hay más resultados"""
+    if not documents or len(documents) < limit:
+        return None
+    return encode_cursor(documents[-1], sort_field)
+
+
+def set_next_cursor(
+    response: Response,
+    documents: List[dict],
+    limit: int,
+    sort_field: str = "_id"
+) -> None:
+    """Agrega la cabecera X-Next-Cursor a la respuesta si hay más resultados"""
+    token = next_cursor(documents, limit, sort_field)
+    if token:
+        response.headers[NEXT_CURSOR_HEADER] = token
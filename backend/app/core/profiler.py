@@ -0,0 +1,106 @@
+"""
+Profiler por muestreo para diagnosticar bloqueos en producción
+
+Un hilo toma cada `interval` la pila del hilo del event loop (o de todos
+los hilos) durante N segundos y cuenta cuántas veces aparece cada pila.
+El resultado se entrega en formato "folded" (una línea por pila:
+`marco;marco;marco cantidad`), que aceptan flamegraph.pl, speedscope e
+inferno. No requiere reiniciar ni instrumentar la aplicación.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _folded_stack(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Sesión única de muestreo; una nueva sesión descarta el resultado anterior"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._samples: Counter = Counter()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.sample_count = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float, thread_id: Optional[int] = None):
+        """
+        Inicia el muestreo en segundo plano. Con `thread_id` solo se
+        muestrea ese hilo (el del event loop); sin él, todos excepto el
+        propio profiler.
+        """
+        with self._lock:
+            if self.running:
+                raise ValueError("Ya hay una sesión del profiler en curso")
+            self._samples = Counter()
+            self.sample_count = 0
+            self.started_at = datetime.utcnow()
+            self.finished_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds, interval, thread_id), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, seconds: float, interval: float, thread_id: Optional[int]):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline and not self._stop.wait(interval):
+            frames = sys._current_frames()
+            if thread_id is not None:
+                frames = {thread_id: frames[thread_id]} if thread_id in frames else {}
+            stacks = [_folded_stack(frame) for ident, frame in frames.items() if ident != own_id]
+            with self._lock:
+                self._samples.update(stacks)
+                self.sample_count += 1
+        self.finished_at = datetime.utcnow()
+
+    def stop(self):
+        """Detiene la sesión en curso (el resultado queda disponible)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def folded(self) -> str:
+        """Pilas en formato folded, de la más frecuente a la menos frecuente"""
+        with self._lock:
+            samples = self._samples.copy()
+        return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+    def status(self) -> dict:
+        """Estado de la sesión actual o de la última"""
+        with self._lock:
+            return {
+                "en_curso": self.running,
+                "inicio": self.started_at,
+                "fin": self.finished_at,
+                "muestras": self.sample_count,
+                "pilas_distintas": len(self._samples),
+            }
+
+
+# Instancia global
+profiler = SamplingProfiler()
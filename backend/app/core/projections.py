@@ -0,0 +1,27 @@
+"""
+Proyecciones de MongoDB: cada operación declara los campos que necesita
+"""
+from typing import Iterable, Type
+from pydantic import BaseModel
+
+
+def fields(*names: str) -> dict:
+    """Proyección que incluye solo los campos indicados (más _id)"""
+    # _id explícito: una proyección vacía haría que Mongo retorne todo el documento
+    return {"_id": 1, **{name: 1 for name in names}}
+
+
+def projection_for(model: Type[BaseModel], exclude: Iterable[str] = ()) -> dict:
+    """
+    Proyección con los campos que requiere un modelo de respuesta.
+
+    Los campos calculados (que no vienen de Mongo) se pasan en `exclude`.
+    """
+    excluded = set(exclude)
+    projection = {}
+    for name, field in model.model_fields.items():
+        key = field.alias or name
+        if name in excluded or key == "_id":
+            continue
+        projection[key] = 1
+    return projection
@@ -0,0 +1,177 @@
+"""
+Consultas a MongoDB por petición
+
+Un middleware asigna a cada petición un ID (cabecera X-Request-ID) y un
+registro en una variable de contexto; Motor copia el contexto a los hilos
+donde ejecuta PyMongo, así que el listener de comandos sabe a qué
+petición y ruta pertenece cada comando. Al terminar, las peticiones que
+superan el presupuesto de consultas o de latencia se registran en el log
+con sus comandos agrupados por operación, colección y forma del filtro
+(p. ej. 40 × find items {_id} delata un N+1).
+"""
+import logging
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# IDs recibidos del cliente o de un proxy que se aceptan tal cual
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Comandos cuyo valor es el nombre de la colección
+_COLLECTION_COMMANDS = {
+    "find", "aggregate", "count", "distinct", "insert", "update", "delete",
+    "findAndModify", "createIndexes",
+}
+
+
+class RequestQueries:
+    """Comandos ejecutados durante una petición"""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.route = path
+        self.count = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+        # (comando, colección, forma del filtro) -> [veces, ms totales, ms máximo]
+        self.commands: Dict[Tuple[str, str, str], list] = {}
+
+    def record(self, key: Tuple[str, str, str], duration_ms: float):
+        with self._lock:
+            self.count += 1
+            self.total_ms += duration_ms
+            entry = self.commands.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += duration_ms
+            entry[2] = max(entry[2], duration_ms)
+
+    def summary(self, limit: int = 10) -> str:
+        """Comandos más costosos, uno por línea"""
+        with self._lock:
+            ranked = sorted(self.commands.items(), key=lambda item: item[1][1], reverse=True)
+        return "\n".join(
+            f"    {count:>4} × {name} {collection} {shape}  {total:.1f} ms (máx {longest:.1f} ms)"
+            for (name, collection, shape), (count, total, longest) in ranked[:limit]
+        )
+
+
+current_request: ContextVar[Optional[RequestQueries]] = ContextVar("current_request", default=None)
+
+
+def command_collection(command_name: str, command: dict) -> str:
+    """Colección sobre la que opera un comando ('' si no aplica)"""
+    if command_name == "getMore":
+        return str(command.get("collection", ""))
+    if command_name in _COLLECTION_COMMANDS:
+        return str(command.get(command_name, ""))
+    return ""
+
+
+def _filter_shape(command: dict) -> str:
+    """Campos del filtro, sin valores, para agrupar consultas iguales"""
+    query = command.get("filter", command.get("query"))
+    if query is None and command.get("updates"):
+        query = command["updates"][0].get("q")
+    if query is None and command.get("deletes"):
+        query = command["deletes"][0].get("q")
+    if query is None and command.get("pipeline"):
+        query = next((stage["$match"] for stage in command["pipeline"] if "$match" in stage), None)
+    if not isinstance(query, dict):
+        return ""
+    return "{" + ", ".join(sorted(query)) + "}"
+
+
+class QueryTracker(monitoring.CommandListener):
+    """Asocia cada comando a la petición en curso"""
+
+    def __init__(self):
+        # request_id del protocolo -> clave del comando, mientras está en curso
+        self._started: Dict[int, Tuple[str, str, str]] = {}
+
+    def started(self, event):
+        if current_request.get() is None:
+            return
+        name = event.command_name
+        self._started[event.request_id] = (
+            name, command_collection(name, event.command), _filter_shape(event.command)
+        )
+
+    def _finish(self, event):
+        key = self._started.pop(event.request_id, None)
+        request = current_request.get()
+        if key is not None and request is not None:
+            request.record(key, event.duration_micros / 1000)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+
+query_tracker = QueryTracker()
+
+
+class QueryBudgetMiddleware:
+    """
+    Middleware ASGI: ID de petición y registro de las peticiones que
+    superan QUERY_BUDGET_COUNT consultas o QUERY_BUDGET_MS milisegundos
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        if not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request = RequestQueries(request_id, scope["method"], scope["path"])
+        token = current_request.set(request)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER.encode(), request_id.encode()),
+                ]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_request.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            if route is not None:
+                request.route = route.path_format
+            self._check_budget(request, elapsed_ms)
+
+    @staticmethod
+    def _check_budget(request: RequestQueries, elapsed_ms: float):
+        over_count = settings.QUERY_BUDGET_COUNT and request.count > settings.QUERY_BUDGET_COUNT
+        over_time = settings.QUERY_BUDGET_MS and elapsed_ms > settings.QUERY_BUDGET_MS
+        if not (over_count or over_time):
+            return
+        logger.warning(
+            f"⚠ Petición sobre el presupuesto [{request.request_id}] "
+            f"{request.method} {request.route}: {request.count} consultas "
+            f"({request.total_ms:.1f} ms en MongoDB), {elapsed_ms:.1f} ms en total\n"
+            f"{request.summary()}"
+        )
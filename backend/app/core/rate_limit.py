@@ -0,0 +1,220 @@
+"""
+Limitación de peticiones y descarte por sobrecarga
+
+- Limitador token bucket por IP y por usuario (o cuenta, en el login): cada
+  regla permite `burst` peticiones seguidas y recupera `per_minute` por
+  minuto. Al agotarse responde 429 con Retry-After. El estado vive en
+  memoria del worker o, con RATE_LIMIT_REDIS_URL, en Redis compartido por
+  todos los workers.
+- Descarte por sobrecarga: si el retraso del event loop o la espera por
+  una conexión de MongoDB superan su umbral, las rutas de LOAD_SHED_PATHS
+  (catálogo público, login, estadísticas) responden 503 antes de hacer
+  trabajo, y el resto (préstamos y devoluciones del personal) conserva
+  su latencia.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import RATE_LIMITED_REQUESTS, SHED_REQUESTS
+from app.core.mongo_metrics import mongo_metrics
+from app.core.security import decode_token
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitRule:
+    """Capacidad (`burst`) y recarga (`per_minute`) de un bucket"""
+
+    def __init__(self, name: str, per_minute: int, burst: int):
+        self.name = name
+        self.per_minute = per_minute
+        self.burst = max(burst, 1)
+
+    @property
+    def rate(self) -> float:
+        """Tokens recuperados por segundo"""
+        return self.per_minute / 60
+
+
+class MemoryRateLimitBackend:
+    """Buckets en memoria del worker (LRU acotado)"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+# Token bucket atómico en Redis: recarga según el tiempo del servidor, descuenta y fija la expiración
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitBackend:
+    """Buckets compartidos entre workers en Redis"""
+
+    def __init__(self, url: str, prefix: str = "bec:ratelimit:"):
+        import redis.asyncio as redis  # Dependencia opcional
+
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self._prefix = prefix
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        allowed, tokens = await self._take(keys=[self._prefix + key], args=[rate, burst])
+        allowed = bool(int(allowed))
+        return allowed, 0.0 if allowed else (1 - float(tokens)) / rate
+
+
+class RateLimiter:
+    """Aplica las reglas sobre el backend configurado"""
+
+    def __init__(self, enabled: bool, redis_url: str = ""):
+        self.enabled = enabled
+        self._backend = MemoryRateLimitBackend()
+        if enabled and redis_url:
+            try:
+                self._backend = RedisRateLimitBackend(redis_url)
+            except ImportError:
+                logger.warning("⚠ Paquete redis no instalado, se usa el limitador en memoria")
+
+    async def check(self, rule: RateLimitRule, identity: str):
+        """Consume un token de `identity`; lanza 429 si no quedan"""
+        if not self.enabled or rule.per_minute <= 0:
+            return
+        try:
+            allowed, retry_after = await self._backend.take(f"{rule.name}:{identity}", rule.rate, rule.burst)
+        except Exception as e:
+            # Sin el backend compartido no se bloquea el servicio
+            logger.warning(f"⚠ Error en el limitador de peticiones: {e}")
+            return
+        if not allowed:
+            RATE_LIMITED_REQUESTS.labels(rule.name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiadas solicitudes, intente más tarde",
+                headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+            )
+
+
+# Instancia global
+rate_limiter = RateLimiter(settings.RATE_LIMIT_ENABLED, settings.RATE_LIMIT_REDIS_URL)
+
+CATALOG_RULE = RateLimitRule(
+    "catalog", settings.RATE_LIMIT_CATALOG_PER_MINUTE, settings.RATE_LIMIT_CATALOG_BURST
+)
+LOGIN_RULE = RateLimitRule(
+    "login", settings.RATE_LIMIT_LOGIN_PER_MINUTE, settings.RATE_LIMIT_LOGIN_BURST
+)
+
+
+def client_ip(request: Request) -> str:
+    """IP del cliente (la primera de X-Forwarded-For si se confía en el proxy)"""
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "desconocida"
+
+
+def _token_user_id(request: Request) -> Optional[str]:
+    """Usuario del token Bearer, sin consultar la base de datos"""
+    authorization = request.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    payload = decode_token(authorization[7:])
+    return payload.get("user_id") if payload else None
+
+
+def rate_limit(rule: RateLimitRule):
+    """
+    Dependencia: limita siempre por IP y, con un token válido, también por
+    usuario. Registrar cuentas nuevas no da un límite nuevo a la misma IP.
+    """
+    async def dependency(request: Request):
+        await rate_limiter.check(rule, f"ip:{client_ip(request)}")
+        user_id = _token_user_id(request)
+        if user_id:
+            await rate_limiter.check(rule, f"user:{user_id}")
+    return dependency
+
+
+# Límite por IP y usuario de las lecturas públicas del catálogo (documentos y ejemplares)
+CATALOG_LIMIT = Depends(rate_limit(CATALOG_RULE))
+
+
+def overload_reason() -> Optional[str]:
+    """Motivo de sobrecarga del worker, o None si puede atender"""
+    if settings.LOAD_SHED_LOOP_LAG_SECONDS > 0 and loop_monitor.lag > settings.LOAD_SHED_LOOP_LAG_SECONDS:
+        return "event_loop"
+    if (
+        settings.LOAD_SHED_POOL_WAIT_MS > 0
+        and mongo_metrics.recent_checkout_wait() * 1000 > settings.LOAD_SHED_POOL_WAIT_MS
+    ):
+        return "mongo_pool"
+    return None
+
+
+class LoadSheddingMiddleware:
+    """Middleware ASGI: 503 inmediato en rutas descartables bajo sobrecarga"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(tuple(settings.LOAD_SHED_PATHS)):
+            await self.app(scope, receive, send)
+            return
+
+        reason = overload_reason()
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        SHED_REQUESTS.labels(reason).inc()
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(settings.LOAD_SHED_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": b'{"detail":"Servicio sobrecargado, intente nuevamente en unos segundos"}',
+        })
@@ -0,0 +1,73 @@
+"""
+Filas compactas para recorrer muchos documentos en procesos batch
+
+Las filas son NamedTuple (sin diccionario por instancia) construidas desde
+cursores proyectados. El campo `id` de una fila corresponde a `_id`.
+"""
+from typing import AsyncIterator, Dict, Iterable, List, Type, TypeVar
+
+from bson import ObjectId
+
+from app.core.projections import fields
+
+Row = TypeVar("Row", bound=tuple)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _mongo_field(name: str) -> str:
+    return "_id" if name == "id" else name
+
+
+def row_projection(row_type: Type[Row]) -> dict:
+    """Proyección con los campos de la fila"""
+    return fields(*(_mongo_field(name) for name in row_type._fields if name != "id"))
+
+
+def to_row(row_type: Type[Row], document: dict) -> Row:
+    """Construye una fila desde un documento proyectado"""
+    return row_type(*(document.get(_mongo_field(name)) for name in row_type._fields))
+
+
+def object_ids(values: Iterable) -> List[ObjectId]:
+    """ObjectId de las referencias válidas (se guardan como string)"""
+    return [ObjectId(value) for value in set(values) if ObjectId.is_valid(value)]
+
+
+async def iter_row_chunks(
+    cursor,
+    row_type: Type[Row],
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AsyncIterator[List[Row]]:
+    """
+    Recorre un cursor en lotes de filas. Solo se mantiene en memoria el
+    lote actual, lo que permite además resolver referencias por lote.
+    """
+    chunk: List[Row] = []
+    async for document in cursor.batch_size(chunk_size):
+        chunk.append(to_row(row_type, document))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def rows_by_field(
+    collection,
+    field: str,
+    values: Iterable,
+    row_type: Type[Row]
+) -> Dict[object, Row]:
+    """Busca con una sola consulta $in y retorna las filas indexadas por `field`"""
+    values = list(set(values))
+    if not values:
+        return {}
+    projection = row_projection(row_type)
+    if field != "_id":
+        projection[field] = 1
+    cursor = collection.find({field: {"$in": values}}, projection)
+    return {
+        document[field]: to_row(row_type, document)
+        async for document in cursor
+    }
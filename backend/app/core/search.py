@@ -0,0 +1,59 @@
+"""
+Normalización de texto para búsquedas en el catálogo
+(minúsculas, sin tildes y separado en palabras)
+"""
+import re
+import unicodedata
+from typing import List
+
+# Campos del documento que se normalizan y su peso en la relevancia
+SEARCH_FIELDS = {"titulo": 3, "autor": 2, "categoria": 1}
+SEARCH_TOKENS_FIELD = "search_tokens"
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+# Letras que NFKD no descompone en letra base + tilde
+_TRANSLITERATIONS = str.maketrans({"ł": "l", "ø": "o", "đ": "d", "ß": "ss", "æ": "ae", "œ": "oe"})
+
+
+def normalize_text(text: str) -> str:
+    """Convierte 'García Márquez' en 'garcia marquez'"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text).lower().translate(_TRANSLITERATIONS))
+    without_marks = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", without_marks).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Separa un texto normalizado en palabras únicas, respetando el orden"""
+    return list(dict.fromkeys(normalize_text(text).split()))
+
+
+def normalized_field(field: str) -> str:
+    """Nombre del campo normalizado que acompaña a un campo de búsqueda"""
+    return f"{field}_norm"
+
+
+def search_fields(document: dict) -> dict:
+    """
+    Calcula los campos de búsqueda que se guardan junto al documento.
+    Se deben recalcular cada vez que cambia alguno de SEARCH_FIELDS.
+    """
+    values = {}
+    tokens = []
+    for field in SEARCH_FIELDS:
+        normalized = normalize_text(document.get(field, ""))
+        values[normalized_field(field)] = normalized
+        tokens.extend(normalized.split())
+    values[SEARCH_TOKENS_FIELD] = list(dict.fromkeys(tokens))
+    return values
+
+
+def prefix_regex(word: str) -> dict:
+    """Expresión anclada al inicio, que puede usar el índice de search_tokens"""
+    return {"$regex": f"^{re.escape(word)}"}
+
+
+def word_prefix_regex(word: str) -> str:
+    """Expresión que encuentra una palabra que empieza con `word` dentro de un texto normalizado"""
+    return f"(^| ){re.escape(word)}"
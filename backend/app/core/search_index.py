@@ -0,0 +1,365 @@
+"""
+Índice invertido en memoria para la búsqueda del catálogo (BM25)
+
+Es opcional (SEARCH_INDEX_ENABLED). Se construye al iniciar la API leyendo
+la colección de documentos una sola vez y se mantiene al día con las
+escrituras que pasan por DocumentService y la importación masiva. Las
+escrituras hechas por otros procesos se incorporan en la reconstrucción
+periódica (SEARCH_INDEX_REFRESH_SECONDS).
+"""
+import asyncio
+import bisect
+import logging
+import math
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.core.search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Campos indexados y su peso (BM25F simplificado)
+INDEX_FIELDS = {"titulo": 3.0, "autor": 2.0, "categoria": 1.0, "editorial": 1.0}
+# Campos sobre los que se cuentan facetas
+FACET_FIELDS = ("categoria", "tipo", "ano_edicion")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Factor aplicado a coincidencias que no son exactas
+PREFIX_FACTOR = 0.8
+TYPO_FACTOR = 0.5
+MAX_EXPANSIONS = 50
+# Largo mínimo de palabra para tolerar un error de tipeo
+MIN_TYPO_LENGTH = 4
+# Documentos indexados entre cada cesión del event loop al construir
+BUILD_SLICE = 250
+
+
+def _deletes(term: str) -> Set[str]:
+    """Variantes de un término con una letra menos"""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Indica si dos palabras difieren en a lo más una edición (incluye transposición)"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return (
+            len(diff) == 2 and diff[1] == diff[0] + 1
+            and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+        )
+    if la > lb:
+        a, b = b, a
+    # b tiene una letra más que a
+    return any(b[:i] + b[i + 1:] == a for i in range(len(b)))
+
+
+class _IndexState:
+    """Estructuras del índice; se reemplazan completas al reconstruir"""
+
+    def __init__(self):
+        self.documents: Dict[ObjectId, dict] = {}
+        self.doc_terms: Dict[ObjectId, Dict[str, float]] = {}
+        self.doc_length: Dict[ObjectId, float] = {}
+        self.total_length = 0.0
+        self.postings: Dict[str, Dict[ObjectId, float]] = defaultdict(dict)
+        self.vocabulary: List[str] = []
+        self.deletes: Dict[str, Set[str]] = defaultdict(set)
+
+    def add(self, document: dict, bulk: bool = False):
+        """
+        Agrega un documento. Con `bulk` (carga inicial) los términos nuevos
+        van al final del vocabulario y `finish` lo ordena una sola vez.
+        """
+        doc_id = document["_id"]
+        terms: Dict[str, float] = Counter()
+        for field, weight in INDEX_FIELDS.items():
+            for token in tokenize(document.get(field) or ""):
+                terms[token] += weight
+
+        self.documents[doc_id] = document
+        self.doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self.doc_length[doc_id] = length
+        self.total_length += length
+
+        for term, frequency in terms.items():
+            if term not in self.postings:
+                if bulk:
+                    self.vocabulary.append(term)
+                else:
+                    bisect.insort(self.vocabulary, term)
+                if len(term) >= MIN_TYPO_LENGTH:
+                    for variant in _deletes(term):
+                        self.deletes[variant].add(term)
+            self.postings[term][doc_id] = frequency
+
+    def add_many(self, documents: List[dict]):
+        """Carga inicial de un lote de documentos"""
+        for document in documents:
+            self.add(document, bulk=True)
+
+    def finish(self) -> Iterator[None]:
+        """Ordena el vocabulario al terminar la carga inicial"""
+        self.vocabulary.sort()
+        yield
+
+    def remove(self, doc_id: ObjectId):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.documents.pop(doc_id, None)
+        self.total_length -= self.doc_length.pop(doc_id, 0.0)
+
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+                position = bisect.bisect_left(self.vocabulary, term)
+                if position < len(self.vocabulary) and self.vocabulary[position] == term:
+                    self.vocabulary.pop(position)
+                if len(term) >= MIN_TYPO_LENGTH:
+                    for variant in _deletes(term):
+                        self.deletes[variant].discard(term)
+                        if not self.deletes[variant]:
+                            del self.deletes[variant]
+
+    def expand(self, word: str) -> Dict[str, float]:
+        """Términos del vocabulario que coinciden con una palabra de la consulta"""
+        matches: Dict[str, float] = {}
+        if word in self.postings:
+            matches[word] = 1.0
+
+        # Prefijo: búsqueda binaria sobre el vocabulario ordenado
+        position = bisect.bisect_left(self.vocabulary, word)
+        while position < len(self.vocabulary) and len(matches) < MAX_EXPANSIONS:
+            term = self.vocabulary[position]
+            if not term.startswith(word):
+                break
+            matches.setdefault(term, PREFIX_FACTOR)
+            position += 1
+
+        # Tolerancia a un error de tipeo solo si no hubo coincidencias
+        if not matches and len(word) >= MIN_TYPO_LENGTH:
+            candidates = set(self.deletes.get(word, ()))
+            for variant in _deletes(word):
+                candidates |= self.deletes.get(variant, set())
+                if variant in self.postings:
+                    candidates.add(variant)
+            for term in candidates:
+                if _within_one_edit(word, term):
+                    matches[term] = TYPO_FACTOR
+        return matches
+
+
+class MemoryIndex(ABC):
+    """
+    Base de los índices en memoria del catálogo: construcción desde un
+    cursor, actualización incremental y reconstrucción periódica.
+    Las subclases definen la estructura en `_new_state`, que debe
+    implementar add(document) y remove(_id) para las escrituras, y
+    add_many(documents) y finish() para la construcción: add_many carga un
+    lote sin mantener el orden y finish (un generador) lo completa por
+    pasos, cediendo el event loop entre ellos.
+    """
+
+    description = "Índice"
+
+    def __init__(self):
+        self.enabled = False
+        self._state = self._new_state()
+        self._projection: Optional[dict] = None
+        self._building = False
+        self._pending: List[Tuple[str, object]] = []
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    def _new_state(self):
+        """Estructura vacía del índice"""
+
+    @property
+    def ready(self) -> bool:
+        """Indica si el índice puede responder consultas"""
+        return self.enabled and self._projection is not None
+
+    async def build(self, collection, projection: dict, batch_size: int = 1000):
+        """
+        Construye el índice leyendo la colección con un solo cursor. Se
+        indexa por lotes y se cede el event loop entre uno y otro, así que
+        la construcción no bloquea las peticiones en curso.
+        """
+        self.enabled = True
+        self._building = True
+        self._pending = []
+        state = self._new_state()
+        try:
+            batch = []
+            async for doc in collection.find({}, projection).batch_size(batch_size):
+                batch.append(doc)
+                if len(batch) >= BUILD_SLICE:
+                    state.add_many(batch)
+                    batch = []
+                    await asyncio.sleep(0)
+            if batch:
+                state.add_many(batch)
+            for _ in state.finish():
+                await asyncio.sleep(0)
+        finally:
+            self._building = False
+
+        # Aplicar las escrituras que ocurrieron mientras se construía
+        for action, value in self._pending:
+            if action == "upsert":
+                state.remove(value["_id"])
+                state.add(value)
+            else:
+                state.remove(value)
+        self._pending = []
+
+        self._state = state
+        self._projection = projection
+        logger.info(f"✓ {self.description} construido con {len(state.documents)} documentos")
+
+    def start_refresh(self, collection, projection: dict, interval_seconds: int):
+        """Reconstruye el índice periódicamente en segundo plano"""
+        if interval_seconds <= 0 or self._refresh_task:
+            return
+
+        async def refresh():
+            while True:
+                await asyncio.sleep(interval_seconds)
+                try:
+                    await self.build(collection, projection)
+                except Exception as e:
+                    logger.error(f"✗ Error al reconstruir {self.description.lower()}: {e}")
+
+        self._refresh_task = asyncio.create_task(refresh())
+
+    async def stop(self):
+        """Detiene la reconstrucción periódica"""
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def upsert(self, document: dict):
+        """Agrega o reemplaza un documento en el índice"""
+        if not self.enabled:
+            return
+        if self._projection is not None:
+            # La proyección pública no incluye _id, que identifica la entrada
+            document = {
+                "_id": document["_id"],
+                **{key: document[key] for key in self._projection if key in document},
+            }
+        if self._building:
+            self._pending.append(("upsert", document))
+        self._state.remove(document["_id"])
+        self._state.add(document)
+
+    def upsert_many(self, documents: Iterable[dict]):
+        """Agrega varios documentos al índice"""
+        for document in documents:
+            self.upsert(document)
+
+    def remove(self, doc_id: ObjectId):
+        """Quita un documento del índice"""
+        if not self.enabled:
+            return
+        if self._building:
+            self._pending.append(("remove", doc_id))
+        self._state.remove(doc_id)
+
+
+class SearchIndex(MemoryIndex):
+    """Índice de búsqueda del catálogo con ranking BM25"""
+
+    description = "Índice de búsqueda"
+
+    def _new_state(self) -> _IndexState:
+        return _IndexState()
+
+    def search(self, text: str) -> List[Tuple[float, ObjectId]]:
+        """
+        Retorna (puntaje, _id) de los documentos que contienen todas las
+        palabras de la consulta (por prefijo o con un error de tipeo),
+        ordenados por puntaje y _id descendentes.
+        """
+        state = self._state
+        words = tokenize(text)
+        if not words or not state.documents:
+            return []
+
+        total = len(state.documents)
+        average_length = state.total_length / total if total else 1.0
+        scores: Optional[Dict[ObjectId, float]] = None
+
+        for word in words:
+            word_scores: Dict[ObjectId, float] = {}
+            for term, factor in state.expand(word).items():
+                posting = state.postings[term]
+                df = len(posting)
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                for doc_id, frequency in posting.items():
+                    if scores is not None and doc_id not in scores:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * state.doc_length[doc_id] / average_length)
+                    value = factor * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    # Cada palabra aporta su mejor coincidencia
+                    if value > word_scores.get(doc_id, 0.0):
+                        word_scores[doc_id] = value
+
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {doc_id: scores[doc_id] + value for doc_id, value in word_scores.items()}
+            if not scores:
+                return []
+
+        return sorted(
+            ((round(score, 6), doc_id) for doc_id, score in scores.items()),
+            reverse=True
+        )
+
+    def get(self, doc_id: ObjectId) -> Optional[dict]:
+        """Retorna la copia indexada de un documento"""
+        document = self._state.documents.get(doc_id)
+        return dict(document) if document else None
+
+    def facets(
+        self,
+        doc_ids: Iterable[ObjectId],
+        fields: Iterable[str] = FACET_FIELDS
+    ) -> Dict[str, Dict[str, int]]:
+        """Cuenta los valores de cada campo de faceta en un conjunto de documentos"""
+        counts = {field: Counter() for field in fields}
+        for doc_id in doc_ids:
+            document = self._state.documents.get(doc_id)
+            if not document:
+                continue
+            for field, counter in counts.items():
+                value = document.get(field)
+                if value is not None:
+                    # Los enums recién creados aún no pasan por BSON
+                    counter[str(getattr(value, "value", value))] += 1
+        return {field: dict(counter.most_common()) for field, counter in counts.items()}
+
+
+# Instancia global del índice
+search_index = SearchIndex()
@@ -0,0 +1,109 @@
+"""
+Serialización rápida de respuestas JSON con orjson
+
+Los datos leídos de MongoDB ya son confiables, por lo que los listados
+pueden pasar de BSON a JSON sin construir ni validar un modelo Pydantic
+por fila. Los modelos de respuesta se mantienen en los endpoints para la
+documentación OpenAPI.
+
+Los servicios configurados en RAW_BSON_SERVICES leen sus listados como
+RawBSONDocument (ver BaseService.read_collection): el driver no decodifica
+el lote y la página se decodifica de una vez, en C, al serializarla.
+"""
+from typing import Any, Iterable, List, Optional, Type
+
+import bson
+import orjson
+from bson import Decimal128, ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    """Tipos BSON que orjson no conoce"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, RawBSONDocument):
+        return bson.decode(value.raw)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+# Lecturas sin decodificar: los documentos quedan como bytes BSON
+RAW_BSON_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def decode_raw(documents: Iterable[Any]) -> List[Any]:
+    """
+    Decodifica a dict los RawBSONDocument de una página con una sola
+    llamada al decodificador C (los demás valores no cambian)
+    """
+    documents = list(documents)
+    if documents and all(isinstance(document, RawBSONDocument) for document in documents):
+        return bson.decode_all(b"".join(document.raw for document in documents))
+    return [
+        bson.decode(document.raw) if isinstance(document, RawBSONDocument) else document
+        for document in documents
+    ]
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa a JSON (bytes) aceptando ObjectId y fechas"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class BSONResponse(ORJSONResponse):
+    """Respuesta JSON con orjson que acepta tipos BSON"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowSerializer:
+    """
+    Convierte documentos de MongoDB en filas con los campos de un modelo
+    de respuesta (usando sus alias, p. ej. `_id`) y sus valores por
+    defecto, sin validar.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.fields = [
+            (field.alias or name, None if field.is_required() else field.get_default(call_default_factory=True))
+            for name, field in model.model_fields.items()
+        ]
+        self.defaults = dict(self.fields)
+
+    def row(self, document: dict, **values: Any) -> dict:
+        """Fila de un documento; `values` reemplaza campos calculados"""
+        return {
+            key: values[key] if key in values else document.get(key, default)
+            for key, default in self.fields
+        }
+
+    def rows(self, documents: Iterable[dict]) -> List[dict]:
+        """
+        Filas de varios documentos. Si un documento solo trae campos del
+        modelo (lo normal al leer con su proyección) la fila se arma
+        combinando dicts, sin recorrer los campos uno a uno.
+        """
+        keys = self.defaults.keys()
+        rows = []
+        for document in decode_raw(documents):
+            if document.keys() <= keys:
+                rows.append({**self.defaults, **document})
+            else:
+                rows.append(self.row(document))
+        return rows
+
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> BSONResponse:
+    """
+    Respuesta JSON directa. Al retornar una respuesta propia FastAPI no
+    aplica las cabeceras del parámetro `response`, así que se copian aquí.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return BSONResponse(content, status_code=status_code, headers=headers)
@@ -9,6 +9,7 @@ from minio import Minio
 from minio.error import S3Error
 
 from app.core.config import settings
+from app.core.metrics import observe_storage
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +40,11 @@ class StorageManager:
             )
             
             # Crear bucket si no existe
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name)
+            with observe_storage("bucket_exists"):
+                exists = self.client.bucket_exists(self.bucket_name)
+            if not exists:
+                with observe_storage("make_bucket"):
+                    self.client.make_bucket(self.bucket_name)
                 logger.info(f"✓ Bucket '{self.bucket_name}' creado en MinIO")
             
             self._initialized = True
@@ -77,20 +81,22 @@ class StorageManager:
             file_data.seek(0)  # Volver al inicio
             
             # Subir archivo
-            self.client.put_object(
-                self.bucket_name,
-                object_name,
-                file_data,
-                file_size,
-                content_type=content_type
-            )
+            with observe_storage("put_object"):
+                self.client.put_object(
+                    self.bucket_name,
+                    object_name,
+                    file_data,
+                    file_size,
+                    content_type=content_type
+                )
             
             # Generar URL pública (temporal)
-            url = self.client.presigned_get_object(
-                self.bucket_name,
-                object_name,
-                expires=timedelta(days=365)  # URL válida por 1 año
-            )
+            with observe_storage("presigned_get_object"):
+                url = self.client.presigned_get_object(
+                    self.bucket_name,
+                    object_name,
+                    expires=timedelta(days=365)  # URL válida por 1 año
+                )
             
             logger.info(f"✓ Archivo subido: {object_name}")
             return url
@@ -123,7 +129,8 @@ class StorageManager:
             return False
         
         try:
-            self.client.remove_object(self.bucket_name, object_name)
+            with observe_storage("remove_object"):
+                self.client.remove_object(self.bucket_name, object_name)
             logger.info(f"✓ Archivo eliminado: {object_name}")
             return True
         except S3Error as e:
@@ -146,11 +153,12 @@ class StorageManager:
             return None
         
         try:
-            url = self.client.presigned_get_object(
-                self.bucket_name,
-                object_name,
-                expires=expires
-            )
+            with observe_storage("presigned_get_object"):
+                url = self.client.presigned_get_object(
+                    self.bucket_name,
+                    object_name,
+                    expires=expires
+                )
             return url
         except S3Error as e:
             logger.error(f"✗ Error al generar URL: {e}")
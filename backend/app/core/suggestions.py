@@ -0,0 +1,143 @@
+"""
+Sugerencias de autocompletado para títulos y autores
+
+Mantiene en memoria arreglos ordenados de textos normalizados y responde
+por prefijo con búsqueda binaria (bisect), sin consultar MongoDB.
+"""
+import bisect
+import heapq
+from typing import Dict, Iterator, List, Tuple
+
+from bson import ObjectId
+
+from app.core.search import normalize_text
+from app.core.search_index import MemoryIndex
+
+# Campos que se sugieren
+SUGGEST_FIELDS = ("titulo", "autor")
+# Palabras de cada texto desde las que también se puede empezar a escribir
+MAX_WORD_STARTS = 8
+# Entradas revisadas como máximo por consulta
+MAX_SCAN = 200
+# Entradas mezcladas entre cada cesión del event loop al construir
+MERGE_SLICE = 20000
+
+# (texto normalizado desde una palabra, largo del texto, campo, texto original, _id)
+Entry = Tuple[str, int, str, str, ObjectId]
+
+
+class _SuggestionState:
+    """Arreglos ordenados de sugerencias"""
+
+    def __init__(self):
+        self.documents: Dict[ObjectId, List[Tuple[int, Entry]]] = {}
+        # Coincidencias desde el inicio del texto, que tienen prioridad
+        self.starts: List[Entry] = []
+        # Coincidencias desde una palabra intermedia ("sol" -> "Cien años de soledad")
+        self.inner: List[Entry] = []
+        # Inicio de cada tramo ordenado de la carga inicial, por arreglo
+        self._runs: Tuple[List[int], List[int]] = ([], [])
+
+    def _lists(self):
+        return (self.starts, self.inner)
+
+    def add(self, document: dict, bulk: bool = False):
+        """
+        Agrega las entradas de un documento. Con `bulk` (carga inicial) van
+        al final de los arreglos y `add_many` las ordena por lote.
+        """
+        doc_id = document["_id"]
+        entries = []
+        for field in SUGGEST_FIELDS:
+            text = document.get(field)
+            words = normalize_text(text or "").split()
+            for position in range(min(len(words), MAX_WORD_STARTS)):
+                entry = (" ".join(words[position:]), len(text), field, text, doc_id)
+                target = 0 if position == 0 else 1
+                if bulk:
+                    self._lists()[target].append(entry)
+                else:
+                    bisect.insort(self._lists()[target], entry)
+                entries.append((target, entry))
+        self.documents[doc_id] = entries
+
+    def add_many(self, documents: List[dict]):
+        """Carga inicial: cada lote queda como un tramo ordenado al final de los arreglos"""
+        starts = [len(entries) for entries in self._lists()]
+        for document in documents:
+            self.add(document, bulk=True)
+        for entries, runs, start in zip(self._lists(), self._runs, starts):
+            entries[start:] = sorted(entries[start:])
+            runs.append(start)
+
+    def finish(self) -> Iterator[None]:
+        """
+        Mezcla los tramos de la carga inicial. Un solo sort() de todo el
+        arreglo bloquearía el loop; la mezcla cede cada MERGE_SLICE entradas.
+        """
+        merged_lists = []
+        for entries, runs in zip(self._lists(), self._runs):
+            bounds = runs + [len(entries)]
+            merged: List[Entry] = []
+            for entry in heapq.merge(*(entries[start:end] for start, end in zip(bounds, bounds[1:]))):
+                merged.append(entry)
+                if len(merged) % MERGE_SLICE == 0:
+                    yield
+            merged_lists.append(merged)
+        self.starts, self.inner = merged_lists
+        self._runs = ([], [])
+
+    def remove(self, doc_id: ObjectId):
+        for target, entry in self.documents.pop(doc_id, []):
+            entries = self._lists()[target]
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                entries.pop(position)
+
+    def suggest(self, prefix: str, limit: int) -> List[dict]:
+        results = []
+        seen = set()
+        for entries in self._lists():
+            candidates = []
+            position = bisect.bisect_left(entries, (prefix,))
+            end = min(position + MAX_SCAN, len(entries))
+            while position < end and entries[position][0].startswith(prefix):
+                candidates.append(entries[position])
+                position += 1
+
+            # Primero los textos más cortos (más cercanos a lo escrito)
+            candidates.sort(key=lambda entry: (entry[1], entry[3]))
+            for _, _, field, text, doc_id in candidates:
+                key = (field, text)
+                if key in seen:
+                    continue
+                seen.add(key)
+                results.append({
+                    "texto": text,
+                    "campo": field,
+                    # Un autor puede tener varios documentos
+                    "document_id": str(doc_id) if field == "titulo" else None
+                })
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+class SuggestionIndex(MemoryIndex):
+    """Índice de autocompletado por prefijo"""
+
+    description = "Índice de sugerencias"
+
+    def _new_state(self) -> _SuggestionState:
+        return _SuggestionState()
+
+    def suggest(self, text: str, limit: int = 10) -> List[dict]:
+        """Retorna hasta `limit` títulos o autores que empiezan con el texto"""
+        prefix = normalize_text(text)
+        if not prefix:
+            return []
+        return self._state.suggest(prefix, limit)
+
+
+# Instancia global del índice de sugerencias
+suggestion_index = SuggestionIndex()
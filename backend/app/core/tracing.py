@@ -0,0 +1,196 @@
+"""
+Trazas distribuidas (OpenTelemetry)
+
+Una petición queda como una sola traza desde la API hasta el worker de
+notificaciones:
+
+- Un middleware abre un span por petición HTTP (continúa la traza si el
+  cliente envía la cabecera traceparent)
+- Los comandos de MongoDB, las operaciones de MinIO y los envíos a Kafka
+  son spans hijos del span en curso
+- El contexto viaja en las cabeceras de los mensajes de Kafka; el
+  consumidor lo extrae y el procesamiento y el envío del email cuelgan de
+  la misma traza
+
+Los spans se exportan por OTLP/HTTP a un collector (Jaeger, Tempo o el
+OpenTelemetry Collector) en OTLP_ENDPOINT. Con TRACING_ENABLED=false, o
+sin los paquetes de OpenTelemetry instalados, todas las funciones son
+no-ops.
+"""
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.core.config import settings
+from app.core.query_tracker import command_collection
+
+logger = logging.getLogger(__name__)
+
+# Tracer activo; None mientras las trazas están desactivadas
+_tracer = None
+_provider = None
+
+
+def setup_tracing(service_name: str) -> bool:
+    """
+    Configura la exportación de spans para este proceso. Retorna True si
+    las trazas quedaron activas.
+    """
+    global _tracer, _provider
+    if not settings.TRACING_ENABLED or _tracer is not None:
+        return _tracer is not None
+
+    try:
+        # Dependencias opcionales
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        logger.warning("⚠ Paquetes de OpenTelemetry no instalados, trazas desactivadas")
+        return False
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name, "service.version": settings.VERSION}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTLP_ENDPOINT)))
+    trace.set_tracer_provider(_provider)
+    _tracer = trace.get_tracer("bec")
+    logger.info(f"✓ Trazas activas ({service_name} -> {settings.OTLP_ENDPOINT})")
+    return True
+
+
+def shutdown_tracing():
+    """Exporta los spans pendientes y detiene el exportador"""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+
+def _span_kind(kind: str):
+    from opentelemetry.trace import SpanKind
+    return getattr(SpanKind, kind.upper())
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", attributes: Optional[dict] = None, context=None):
+    """
+    Span hijo del span en curso (o de `context`, extraído de cabeceras).
+    Las excepciones quedan registradas en el span y marcan el error.
+    """
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(
+        name, context=context, kind=_span_kind(kind), attributes=attributes
+    ) as current:
+        yield current
+
+
+def inject_headers() -> List[Tuple[str, bytes]]:
+    """Contexto de la traza en curso como cabeceras de un mensaje de Kafka"""
+    if _tracer is None:
+        return []
+    from opentelemetry import propagate
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return [(key, value.encode()) for key, value in carrier.items()]
+
+
+def extract_context(headers):
+    """Contexto de la traza a partir de cabeceras de Kafka (o None)"""
+    if _tracer is None or not headers:
+        return None
+    from opentelemetry import propagate
+    carrier = {
+        key: value.decode("latin-1") if isinstance(value, bytes) else value
+        for key, value in headers
+    }
+    return propagate.extract(carrier)
+
+
+class TracingMiddleware:
+    """Middleware ASGI: un span SERVER por petición, nombrado con la ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = [(key.decode("latin-1"), value) for key, value in scope["headers"]]
+        attributes = {"http.method": scope["method"], "http.target": scope["path"]}
+
+        with span(f"{scope['method']} {scope['path']}", "server", attributes, extract_context(headers)) as current:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    current.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        from opentelemetry.trace import Status, StatusCode
+                        current.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # La ruta se conoce después del enrutamiento; evita un nombre por URL
+                route = scope.get("route")
+                if route is not None:
+                    current.update_name(f"{scope['method']} {route.path_format}")
+                    current.set_attribute("http.route", route.path_format)
+
+
+class MongoTracingListener(monitoring.CommandListener):
+    """
+    Span CLIENT por comando de MongoDB. Motor copia el contexto al hilo
+    donde ejecuta PyMongo, así que el span cuelga del span en curso; los
+    comandos fuera de una traza (tareas periódicas) no se registran.
+    """
+
+    def __init__(self):
+        # request_id del protocolo -> span en curso
+        self._spans: Dict[int, object] = {}
+
+    def started(self, event):
+        if _tracer is None:
+            return
+        from opentelemetry import trace
+        if not trace.get_current_span().is_recording():
+            return
+        name = event.command_name
+        collection = command_collection(name, event.command)
+        self._spans[event.request_id] = _tracer.start_span(
+            f"mongodb {name} {collection}".rstrip(),
+            kind=_span_kind("client"),
+            attributes={
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": name,
+                "db.mongodb.collection": collection,
+                "net.peer.name": str(event.connection_id[0]),
+            },
+        )
+
+    def succeeded(self, event):
+        current = self._spans.pop(event.request_id, None)
+        if current is not None:
+            current.end()
+
+    def failed(self, event):
+        current = self._spans.pop(event.request_id, None)
+        if current is not None:
+            from opentelemetry.trace import Status, StatusCode
+            current.set_status(Status(StatusCode.ERROR, str(event.failure.get("errmsg", ""))))
+            current.end()
+
+
+mongo_tracing = MongoTracingListener()
@@ -1,22 +1,34 @@
 """
 Aplicación principal FastAPI para el Sistema de Préstamo BEC
 """
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 
 from app.core.config import settings
-from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.log_config import setup_logging
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
 from app.core.kafka_producer import kafka_producer
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.mongo_metrics import mongo_metrics
+from app.core.query_tracker import REQUEST_ID_HEADER, QueryBudgetMiddleware
+from app.core.rate_limit import LoadSheddingMiddleware
 from app.core.storage import storage_manager
+from app.core.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.serialization import BSONResponse
+from app.core.search_index import search_index
+from app.core.suggestions import suggestion_index
+from app.services.fine_service import payment_reconciler
+from app.services.payment_service import mercadopago_client
+from app.services.document_service import DOCUMENT_PUBLIC_FIELDS, DOCUMENT_SUGGEST_FIELDS
+from app.api.dependencies import get_administrativo_user
 from app.api.v1.router import api_router
 
 # Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging("bec-api")
 logger = logging.getLogger(__name__)
 
 
@@ -26,9 +38,19 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Iniciando Sistema de Préstamo BEC...")
     
+    setup_tracing("bec-api")
+    loop_monitor.start()
     await connect_to_mongo()
+    documents = get_database().documents
+    if settings.SUGGEST_INDEX_ENABLED:
+        await suggestion_index.build(documents, DOCUMENT_SUGGEST_FIELDS)
+        suggestion_index.start_refresh(documents, DOCUMENT_SUGGEST_FIELDS, settings.SEARCH_INDEX_REFRESH_SECONDS)
+    if settings.SEARCH_INDEX_ENABLED:
+        await search_index.build(documents, DOCUMENT_PUBLIC_FIELDS)
+        search_index.start_refresh(documents, DOCUMENT_PUBLIC_FIELDS, settings.SEARCH_INDEX_REFRESH_SECONDS)
     await kafka_producer.start()
     storage_manager.initialize()
+    payment_reconciler.start(get_database())
     
     logger.info("✨ Sistema iniciado correctamente")
     
@@ -37,8 +59,14 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("🛑 Deteniendo sistema...")
     
+    await payment_reconciler.stop()
+    await search_index.stop()
+    await suggestion_index.stop()
     await close_mongo_connection()
     await kafka_producer.stop()
+    await mercadopago_client.close()
+    await loop_monitor.stop()
+    shutdown_tracing()
     
     logger.info("👋 Sistema detenido correctamente")
 
@@ -47,9 +75,14 @@ app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="API Backend para el Sistema de Préstamo de la Biblioteca de Estación Central",
+    default_response_class=BSONResponse,
     lifespan=lifespan
 )
 
+# 503 inmediato en rutas no críticas cuando el worker está sobrecargado
+# (dentro de CORS para que el navegador pueda leer la respuesta)
+app.add_middleware(LoadSheddingMiddleware)
+
 # Configuración CORS
 app.add_middleware(
     CORSMiddleware,
@@ -57,8 +90,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", REQUEST_ID_HEADER],
 )
 
+# ID de petición y log de peticiones sobre el presupuesto de consultas
+app.add_middleware(QueryBudgetMiddleware)
+
+# Latencia por ruta y peticiones en curso (GET /metrics)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Span por petición; los comandos de MongoDB, MinIO y Kafka cuelgan de él
+app.add_middleware(TracingMiddleware)
+
 # Incluir routers
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
@@ -77,3 +121,21 @@ async def root():
 async def health_check():
     """Endpoint de health check"""
     return {"status": "ok"}
+
+
+@app.get("/health/mongo", tags=["Health"])
+async def mongo_pool_metrics(current_user: dict = Depends(get_administrativo_user)):
+    """
+    Métricas del pool de MongoDB de este worker: espera para obtener una
+    conexión, conexiones en uso y latencia por comando.
+    Requiere rol de administrativo.
+    """
+    return mongo_metrics.snapshot()
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["Health"], include_in_schema=False)
+    async def metrics():
+        """Métricas en formato Prometheus"""
+        body, content_type = render_metrics()
+        return Response(body, headers={"Content-Type": content_type})
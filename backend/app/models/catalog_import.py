@@ -0,0 +1,26 @@
+"""
+Modelos de importación masiva del catálogo
+"""
+from typing import List
+from pydantic import BaseModel
+from enum import Enum
+
+
+class ImportFormat(str, Enum):
+    """Formatos de archivo aceptados"""
+    CSV = "csv"
+    JSONL = "jsonl"
+
+
+class ImportRowError(BaseModel):
+    """Error de una fila del archivo importado"""
+    fila: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    """Resumen de una importación masiva"""
+    total: int = 0
+    insertados: int = 0
+    total_errores: int = 0
+    errores: List[ImportRowError] = []  # Se reportan solo los primeros errores
@@ -2,7 +2,7 @@
 Modelos de documento bibliográfico
 """
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from bson import ObjectId
 from enum import Enum
@@ -102,3 +102,24 @@ class DocumentResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+
+
+class DocumentSuggestion(BaseModel):
+    """Sugerencia de autocompletado (título o autor)"""
+    texto: str
+    campo: str  # titulo o autor
+    document_id: Optional[str] = None  # Solo para títulos
+
+
+class FacetCount(BaseModel):
+    """Cantidad de documentos con un valor de faceta"""
+    valor: str
+    cantidad: int
+
+
+class DocumentFacets(BaseModel):
+    """Conteos por faceta para los filtros del catálogo"""
+    total: int
+    categoria: List[FacetCount] = []
+    tipo: List[FacetCount] = []
+    ano_edicion: List[FacetCount] = []
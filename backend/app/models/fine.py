@@ -0,0 +1,46 @@
+"""
+Modelos de multas (fines) y su pago
+"""
+from datetime import datetime
+from typing import Optional, List
+from pydantic import BaseModel, Field
+from enum import Enum
+
+
+class FineStatus(str, Enum):
+    """Estados de la multa"""
+    PENDIENTE = "pendiente"
+    PAGADA = "pagada"
+
+
+class FineResponse(BaseModel):
+    """Esquema de respuesta de multa"""
+    id: str = Field(..., alias="_id")
+    user_id: str
+    loan_id: str
+    dias_atraso: int
+    monto: int = Field(..., description="Monto en CLP")
+    estado: FineStatus
+    fecha_creacion: datetime
+    fecha_pago: Optional[datetime] = None
+    payment_id: Optional[str] = None
+
+    class Config:
+        populate_by_name = True
+
+
+class FinePaymentResponse(BaseModel):
+    """Preferencia de pago de las multas pendientes del usuario"""
+    preferenceId: str
+    init_point: str
+    sandbox_init_point: Optional[str] = None
+    monto: int
+    multas: List[str]
+
+
+class NotificationStatus(str, Enum):
+    """Estados de una notificación de pago en la cola de procesamiento"""
+    PENDIENTE = "pendiente"
+    PROCESANDO = "procesando"
+    PROCESADA = "procesada"
+    ERROR = "error"
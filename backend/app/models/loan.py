@@ -2,7 +2,7 @@
 Modelos de préstamo (loan)
 """
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from pydantic import BaseModel, Field
 from bson import ObjectId
 from enum import Enum
@@ -94,3 +94,30 @@ class LoanReturn(BaseModel):
     """Esquema para devolver un préstamo"""
     loan_id: str
 
+
+
+class LoanBulkCreate(BaseModel):
+    """Esquema para registrar varios préstamos de un mismo usuario"""
+    user_id: str = Field(..., description="ID del usuario que realiza el préstamo")
+    tipo_prestamo: LoanType
+    item_ids: List[str] = Field(..., min_length=1, max_length=50, description="IDs de los ejemplares")
+
+
+class LoanBulkReturn(BaseModel):
+    """Esquema para devolver varios préstamos"""
+    loan_ids: List[str] = Field(..., min_length=1, max_length=50)
+
+
+class LoanBulkItemResult(BaseModel):
+    """Resultado de una operación masiva para un ejemplar o préstamo"""
+    id: str  # item_id (préstamos) o loan_id (devoluciones)
+    success: bool
+    loan: Optional[LoanResponse] = None
+    error: Optional[str] = None
+
+
+class LoanBulkResponse(BaseModel):
+    """Esquema de respuesta de operaciones masivas de préstamos"""
+    total: int
+    exitosos: int
+    resultados: List[LoanBulkItemResult]
@@ -0,0 +1,81 @@
+"""
+Base de los servicios: lecturas compartidas entre peticiones concurrentes
+"""
+import copy
+from typing import Any, List, Optional
+
+from bson import json_util
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+from app.core.cache import SingleFlight
+from app.core.config import settings
+from app.core.serialization import RAW_BSON_OPTIONS
+
+# Lecturas en curso del worker, compartidas por todas las instancias de servicio
+_reads = SingleFlight()
+
+
+def _read_key(collection: AsyncIOMotorCollection, operation: str, *args: Any) -> tuple:
+    """Clave de una lectura: colección, preferencia de lectura, operación y argumentos en orden"""
+    return (collection.full_name, collection.read_preference.mode, operation, json_util.dumps(args))
+
+
+class BaseService:
+    """
+    Servicio base. Las lecturas `shared_*` se agrupan cuando llegan
+    idénticas (misma colección, filtro y proyección) mientras otra igual
+    está en curso: se ejecuta una sola consulta y todas reciben una copia
+    del resultado, por lo que pueden modificarlo sin afectar a las demás.
+
+    Las subclases declaran `name`; si aparece en RAW_BSON_SERVICES sus
+    listados se leen con `read_collection` sin decodificar.
+    """
+
+    name = ""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.raw_bson = self.name in settings.RAW_BSON_SERVICES
+
+    def read_collection(self, collection: AsyncIOMotorCollection) -> AsyncIOMotorCollection:
+        """
+        Colección para listados que pasan los documentos casi sin cambios a
+        la respuesta: con RawBSONDocument si el servicio lo tiene activado.
+        Los documentos obtenidos son de solo lectura.
+        """
+        if self.raw_bson:
+            return collection.with_options(codec_options=RAW_BSON_OPTIONS)
+        return collection
+
+    async def shared_find_one(
+        self,
+        collection: AsyncIOMotorCollection,
+        query: dict,
+        projection: Optional[dict] = None
+    ) -> Optional[dict]:
+        """find_one agrupado con otras lecturas idénticas en curso"""
+        result = await _reads.do(
+            _read_key(collection, "find_one", query, projection),
+            lambda: collection.find_one(query, projection)
+        )
+        return copy.deepcopy(result)
+
+    async def shared_count(self, collection: AsyncIOMotorCollection, query: dict) -> int:
+        """count_documents agrupado con otros conteos idénticos en curso"""
+        return await _reads.do(
+            _read_key(collection, "count", query),
+            lambda: collection.count_documents(query)
+        )
+
+    async def shared_aggregate(
+        self,
+        collection: AsyncIOMotorCollection,
+        pipeline: List[dict],
+        length: Optional[int] = None
+    ) -> List[dict]:
+        """aggregate agrupado con otras agregaciones idénticas en curso"""
+        result = await _reads.do(
+            _read_key(collection, "aggregate", pipeline, length),
+            lambda: collection.aggregate(pipeline).to_list(length=length)
+        )
+        return copy.deepcopy(result)
@@ -4,18 +4,15 @@ Procesos batch para tareas programadas
 import asyncio
 import logging
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.core.config import settings
+from app.core.database import create_mongo_client, service_database
 from app.core.kafka_producer import kafka_producer
+from app.core.log_config import setup_logging
+from app.core.tracing import setup_tracing, shutdown_tracing, span
 from app.services.loan_service import LoanService
 from app.services.reservation_service import ReservationService
-from app.services.user_service import UserService
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -24,12 +21,19 @@ class BatchJobsRunner:
     
     def __init__(self):
         self.client = None
-        self.db = None
+        self.loans_db = None
+        self.reservations_db = None
+        self.read_db = None
     
     async def connect_db(self):
         """Conecta a la base de datos"""
-        self.client = AsyncIOMotorClient(settings.MONGODB_URL)
-        self.db = self.client[settings.MONGODB_DB_NAME]
+        self.client = create_mongo_client()
+        db = self.client[settings.MONGODB_DB_NAME]
+        # Préstamos y reservas leen lo que acaban de escribir: siempre del primario
+        self.loans_db = service_database(db, "loans")
+        self.reservations_db = service_database(db, "reservations")
+        # Lecturas de solo consulta según MONGODB_SERVICE_READ_PREFERENCES["batch_jobs"]
+        self.read_db = service_database(db, "batch_jobs")
         logger.info("✓ Conectado a MongoDB")
     
     async def close_db(self):
@@ -42,50 +46,48 @@ class BatchJobsRunner:
         """Verifica préstamos vencidos y envía notificaciones"""
         logger.info("📋 Verificando préstamos vencidos...")
         
-        loan_service = LoanService(self.db)
-        user_service = UserService(self.db)
+        loan_service = LoanService(self.loans_db)
+        # Usuarios y documentos de los avisos: se pueden leer de un secundario
+        reference_service = LoanService(self.read_db)
         
         # Marcar préstamos como vencidos
         updated_count = await loan_service.mark_loans_as_overdue()
         logger.info(f"✓ {updated_count} préstamos marcados como vencidos")
         
-        # Obtener préstamos vencidos
-        overdue_loans = await loan_service.get_overdue_loans()
-        
-        # Enviar notificaciones
-        for loan in overdue_loans:
-            user = await user_service.get_user_by_id(loan["user_id"])
-            if not user:
-                continue
-            
-            # Calcular días de atraso
-            days_overdue = (datetime.utcnow() - loan["fecha_devolucion_pactada"]).days
-            
-            # Obtener información del documento (simplificado)
-            document = await self.db.documents.find_one(
-                {"_id": await self.db.items.find_one({"_id": loan["item_id"]}).get("document_id")}
-            )
-            
-            loan_details = {
-                "document_title": document.get("titulo", "N/A") if document else "N/A",
-                "due_date": loan["fecha_devolucion_pactada"].strftime("%d/%m/%Y"),
-                "days_overdue": days_overdue
-            }
+        # Recorrer préstamos vencidos por lotes: solo el lote actual está en
+        # memoria y sus usuarios y documentos se buscan con una consulta por lote
+        now = datetime.utcnow()
+        sent = 0
+        async for loans in loan_service.iter_overdue_loans():
+            references = await reference_service.resolve_references(loans)
             
-            # Enviar notificación
-            await kafka_producer.send_overdue_reminder(
-                user_email=user["email"],
-                user_name=f"{user['nombres']} {user['apellidos']}",
-                loan_details=loan_details
-            )
+            for loan in loans:
+                user = references.users.get(loan.user_id)
+                if not user:
+                    continue
+                
+                document = references.documents.get(loan.item_id)
+                loan_details = {
+                    "document_title": document.titulo if document else "N/A",
+                    "due_date": loan.fecha_devolucion_pactada.strftime("%d/%m/%Y"),
+                    "days_overdue": (now - loan.fecha_devolucion_pactada).days
+                }
+                
+                # Enviar notificación
+                await kafka_producer.send_overdue_reminder(
+                    user_email=user.email,
+                    user_name=f"{user.nombres} {user.apellidos}",
+                    loan_details=loan_details
+                )
+                sent += 1
         
-        logger.info(f"✓ {len(overdue_loans)} notificaciones de préstamos vencidos enviadas")
+        logger.info(f"✓ {sent} notificaciones de préstamos vencidos enviadas")
     
     async def expire_old_reservations(self):
         """Expira reservas antiguas"""
         logger.info("📋 Expirando reservas antiguas...")
         
-        reservation_service = ReservationService(self.db)
+        reservation_service = ReservationService(self.reservations_db)
         expired_count = await reservation_service.expire_old_reservations()
         
         logger.info(f"✓ {expired_count} reservas expiradas")
@@ -98,8 +100,11 @@ class BatchJobsRunner:
         await kafka_producer.start()
         
         try:
-            await self.check_overdue_loans()
-            await self.expire_old_reservations()
+            # Un span por trabajo: sus consultas y avisos a Kafka quedan en la misma traza
+            with span("batch check_overdue_loans"):
+                await self.check_overdue_loans()
+            with span("batch expire_old_reservations"):
+                await self.expire_old_reservations()
             logger.info("✨ Trabajos batch completados exitosamente")
         except Exception as e:
             logger.error(f"✗ Error en trabajos batch: {e}")
@@ -110,8 +115,13 @@ class BatchJobsRunner:
 
 async def run_batch_jobs():
     """Función principal para ejecutar los trabajos batch"""
+    setup_logging("bec-batch-jobs")
+    setup_tracing("bec-batch-jobs")
     runner = BatchJobsRunner()
-    await runner.run_daily_jobs()
+    try:
+        await runner.run_daily_jobs()
+    finally:
+        shutdown_tracing()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+"""
+Servicio de importación masiva del catálogo (documentos y ejemplares)
+"""
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from app.core.http_cache import bump_version
+from app.core.projections import fields
+from app.core.search import search_fields
+from app.models.catalog_import import ImportFormat, ImportReport, ImportRowError
+from app.models.document import DocumentCreate
+from app.models.item import ItemCreate
+from app.services.document_service import documents_written
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+DUPLICATE_KEY_ERROR = 11000
+
+# (número de línea, fila parseada, error de parseo)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+async def iter_stream_lines(stream, block_size: int = 64 * 1024) -> AsyncIterator[str]:
+    """
+    Lee líneas de texto UTF-8 desde un stream asíncrono (por ejemplo UploadFile)
+    sin cargar el archivo completo en memoria.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    while True:
+        block = await stream.read(block_size)
+        if not block:
+            break
+        buffer += decoder.decode(block)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_text_lines(lines: Iterable[str]) -> AsyncIterator[str]:
+    """Adapta un iterable de líneas (por ejemplo un archivo abierto) a iterador asíncrono"""
+    for line in lines:
+        yield line.rstrip("\r\n")
+
+
+async def iter_records(lines: AsyncIterator[str], formato: ImportFormat) -> AsyncIterator[Record]:
+    """
+    Convierte líneas CSV (con encabezado) o JSON Lines en filas.
+
+    Raises:
+        ValueError: si el CSV no tiene encabezado
+    """
+    if formato == ImportFormat.JSONL:
+        line_number = 0
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, None, f"JSON inválido: {e.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Cada línea debe ser un objeto JSON"
+                continue
+            yield line_number, row, None
+        return
+
+    header = None
+    pending: List[str] = []
+    start = line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not pending:
+            start = line_number
+        pending.append(line)
+        # Un campo entre comillas puede abarcar varias líneas
+        if sum(part.count('"') for part in pending) % 2:
+            continue
+        values = next(csv.reader(part + "\n" for part in pending), [])
+        pending = []
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Se esperaban {len(header)} columnas y se encontraron {len(values)}"
+            continue
+        # Las celdas vacías se omiten para que apliquen los valores por defecto
+        row = {key: value.strip() for key, value in zip(header, values) if value.strip()}
+        yield start, row, None
+
+    if pending:
+        yield start, None, "Comillas sin cerrar al final del archivo"
+    if header is None:
+        raise ValueError("El archivo CSV no tiene encabezado")
+
+
+def _validation_message(error: ValidationError) -> str:
+    """Resume un error de validación de Pydantic en una línea"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+class CatalogImportService:
+    """Servicio para importar documentos y ejemplares en lotes"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.db = db
+        self.documents_collection = db.documents
+        self.items_collection = db.items
+        self.chunk_size = chunk_size
+
+    async def import_documents(self, records: AsyncIterator[Record]) -> ImportReport:
+        """
+        Importa documentos. La unicidad de id_fisico la garantiza el índice
+        único, por lo que no se hacen consultas previas por fila.
+        """
+        return await self._run(records, self._flush_documents)
+
+    async def import_items(self, records: AsyncIterator[Record]) -> ImportReport:
+        """
+        Importa ejemplares. Cada fila indica `document_id` o el `id_fisico`
+        del documento, que se resuelve con una consulta por lote.
+        """
+        return await self._run(records, self._flush_items)
+
+    async def _run(
+        self,
+        records: AsyncIterator[Record],
+        flush: Callable[[List[Tuple[int, dict]], ImportReport], object]
+    ) -> ImportReport:
+        """Agrupa las filas en lotes y los procesa a medida que llegan"""
+        report = ImportReport()
+        chunk: List[Tuple[int, dict]] = []
+
+        async for line, row, error in records:
+            report.total += 1
+            if error:
+                self._add_error(report, line, error)
+                continue
+            chunk.append((line, row))
+            if len(chunk) >= self.chunk_size:
+                await flush(chunk, report)
+                chunk = []
+
+        if chunk:
+            await flush(chunk, report)
+        return report
+
+    async def _flush_documents(self, chunk: List[Tuple[int, dict]], report: ImportReport):
+        """Valida e inserta un lote de documentos"""
+        valid = []
+        for line, row in chunk:
+            try:
+                document = DocumentCreate(**row).model_dump()
+                document.update(search_fields(document))
+                valid.append((line, document))
+            except ValidationError as e:
+                self._add_error(report, line, _validation_message(e))
+
+        inserted = await self._insert(
+            self.documents_collection,
+            valid,
+            report,
+            lambda doc: f"Ya existe un documento con el id_fisico: {doc['id_fisico']}"
+        )
+        if inserted:
+            documents_written(inserted)
+            await bump_version(self.db, "documents")
+
+    async def _flush_items(self, chunk: List[Tuple[int, dict]], report: ImportReport):
+        """Resuelve documentos, valida e inserta un lote de ejemplares"""
+        # Resolver los id_fisico del lote con una sola consulta
+        physical_ids = {
+            row["id_fisico"] for _, row in chunk
+            if not row.get("document_id") and row.get("id_fisico")
+        }
+        documents_by_physical_id = {}
+        if physical_ids:
+            cursor = self.documents_collection.find(
+                {"id_fisico": {"$in": list(physical_ids)}}, fields("id_fisico")
+            )
+            async for doc in cursor:
+                documents_by_physical_id[doc["id_fisico"]] = str(doc["_id"])
+
+        valid = []
+        for line, row in chunk:
+            row = dict(row)
+            id_fisico = row.pop("id_fisico", None)
+            if not row.get("document_id"):
+                if not id_fisico:
+                    self._add_error(report, line, "Debe indicar document_id o id_fisico")
+                    continue
+                if id_fisico not in documents_by_physical_id:
+                    self._add_error(report, line, f"No existe un documento con el id_fisico: {id_fisico}")
+                    continue
+                row["document_id"] = documents_by_physical_id[id_fisico]
+            elif not ObjectId.is_valid(row["document_id"]):
+                self._add_error(report, line, f"document_id inválido: {row['document_id']}")
+                continue
+
+            try:
+                valid.append((line, ItemCreate(**row).model_dump()))
+            except ValidationError as e:
+                self._add_error(report, line, _validation_message(e))
+
+        if await self._insert(self.items_collection, valid, report):
+            await bump_version(self.db, "items")
+
+    async def _insert(
+        self,
+        collection,
+        valid: List[Tuple[int, dict]],
+        report: ImportReport,
+        duplicate_message: Optional[Callable[[dict], str]] = None
+    ) -> List[dict]:
+        """
+        Inserta un lote sin orden y asocia los errores de escritura a su fila.
+        Retorna los documentos insertados.
+        """
+        if not valid:
+            return []
+
+        documents = [doc for _, doc in valid]
+        try:
+            result = await collection.insert_many(documents, ordered=False)
+            report.insertados += len(result.inserted_ids)
+            return documents
+        except BulkWriteError as e:
+            report.insertados += e.details.get("nInserted", 0)
+            failed = set()
+            for err in e.details.get("writeErrors", []):
+                failed.add(err["index"])
+                line, doc = valid[err["index"]]
+                if err.get("code") == DUPLICATE_KEY_ERROR and duplicate_message:
+                    message = duplicate_message(doc)
+                else:
+                    message = err.get("errmsg", "Error de escritura")
+                self._add_error(report, line, message)
+            return [doc for index, doc in enumerate(documents) if index not in failed]
+
+    def _add_error(self, report: ImportReport, line: int, message: str):
+        """Registra un error de fila, guardando el detalle solo de los primeros"""
+        report.total_errores += 1
+        if len(report.errores) < MAX_REPORTED_ERRORS:
+            report.errores.append(ImportRowError(fila=line, error=message))
@@ -1,42 +1,111 @@
 """
 Servicio de gestión de documentos
 """
-from typing import Optional, List
+from typing import Dict, Optional, List, NamedTuple
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
 
-from app.models.document import DocumentCreate, DocumentUpdate
+from app.models.document import DocumentCreate, DocumentUpdate, DocumentResponse
 from app.models.item import ItemStatus
+from app.core.cache import MISS, QueryCache, ResponseCache, cache_key
+from app.core.config import settings
+from app.core.http_cache import bump_version, get_versions
+from app.core.pagination import decode_cursor, keyset_filter, paginate
+from app.core.projections import fields, projection_for
+from app.core.serialization import RowSerializer
+from app.core.search import (
+    SEARCH_FIELDS, SEARCH_TOKENS_FIELD, normalize_text, normalized_field, prefix_regex,
+    search_fields, tokenize, word_prefix_regex
+)
+from app.core.search_index import FACET_FIELDS, search_index
+from app.core.suggestions import SUGGEST_FIELDS, suggestion_index
+from app.services.base import BaseService
 
+# Proyecciones por caso de uso
+DOCUMENT_PUBLIC_FIELDS = projection_for(DocumentResponse, exclude={"items_disponibles"})
+DOCUMENT_SUMMARY_FIELDS = fields("titulo", "id_fisico")
+DOCUMENT_SUGGEST_FIELDS = fields(*SUGGEST_FIELDS)
+# Serialización directa de los listados
+DOCUMENT_ROWS = RowSerializer(DocumentResponse)
 
-class DocumentService:
+
+class DocumentTitleRow(NamedTuple):
+    """Título de un documento, buscado por _id o por ID físico"""
+    id: ObjectId
+    id_fisico: str
+    titulo: str
+
+
+# Campo calculado con la relevancia de cada resultado de `search`
+RELEVANCE_FIELD = "relevancia"
+
+
+# Conteos por faceta, invalidados en cada escritura de documentos
+facet_cache = QueryCache(settings.FACET_CACHE_SECONDS)
+# Páginas del listado, por parámetros normalizados y versión de documents/items
+documents_cache = ResponseCache(settings.CATALOG_CACHE_SECONDS, settings.CACHE_REDIS_URL)
+
+
+def document_sort_field(search: Optional[str]) -> str:
+    """Campo por el que se ordena (y pagina) el listado de documentos"""
+    return RELEVANCE_FIELD if search and tokenize(search) else "_id"
+
+
+def documents_written(documents: List[dict]):
+    """Actualiza índices y cachés después de crear o modificar documentos"""
+    search_index.upsert_many(documents)
+    suggestion_index.upsert_many(documents)
+    facet_cache.invalidate()
+
+
+def document_removed(document_id: ObjectId):
+    """Actualiza índices y cachés después de eliminar un documento"""
+    search_index.remove(document_id)
+    suggestion_index.remove(document_id)
+    facet_cache.invalidate()
+
+
+class DocumentService(BaseService):
     """Servicio para operaciones CRUD de documentos"""
     
     def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(db)
         self.collection = db.documents
         self.items_collection = db.items
     
     async def create_document(self, document: DocumentCreate) -> dict:
         """Crea un nuevo documento"""
-        # Verificar que el id_fisico sea único
-        existing = await self.collection.find_one({"id_fisico": document.id_fisico})
-        if existing:
-            raise ValueError(f"Ya existe un documento con el id_fisico: {document.id_fisico}")
-
         document_dict = document.model_dump()
-        result = await self.collection.insert_one(document_dict)
+        document_dict.update(search_fields(document_dict))
+        # La unicidad de id_fisico la garantiza el índice único
+        try:
+            result = await self.collection.insert_one(document_dict)
+        except DuplicateKeyError:
+            raise ValueError(f"Ya existe un documento con el id_fisico: {document.id_fisico}")
         document_dict["_id"] = result.inserted_id
+        documents_written([document_dict])
+        await bump_version(self.db, "documents")
         return document_dict
     
-    async def get_document_by_id(self, document_id: str) -> Optional[dict]:
+    async def get_document_by_id(
+        self,
+        document_id: str,
+        projection: Optional[dict] = DOCUMENT_PUBLIC_FIELDS
+    ) -> Optional[dict]:
         """Obtiene un documento por su ID"""
         if not ObjectId.is_valid(document_id):
             return None
-        return await self.collection.find_one({"_id": ObjectId(document_id)})
+        return await self.shared_find_one(self.collection, {"_id": ObjectId(document_id)}, projection)
 
-    async def get_document_by_physical_id(self, id_fisico: str) -> Optional[dict]:
+    async def get_document_by_physical_id(
+        self,
+        id_fisico: str,
+        projection: Optional[dict] = DOCUMENT_PUBLIC_FIELDS
+    ) -> Optional[dict]:
         """Obtiene un documento por su ID físico"""
-        return await self.collection.find_one({"id_fisico": id_fisico})
+        return await self.shared_find_one(self.collection, {"id_fisico": id_fisico}, projection)
     
     async def get_documents(
         self,
@@ -45,32 +114,259 @@ class DocumentService:
         titulo: Optional[str] = None,
         autor: Optional[str] = None,
         categoria: Optional[str] = None,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        versions: Optional[Dict[str, int]] = None
     ) -> List[dict]:
-        """Obtiene una lista de documentos con filtros"""
-        query = {}
-        
-        if search:
-            # Búsqueda por texto completo
-            query["$text"] = {"$search": search}
+        """
+        Obtiene una lista de documentos con filtros.
+
+        Los filtros y `search` ignoran mayúsculas y tildes, y cada palabra
+        busca por prefijo ("garcia" encuentra "García", "sol" encuentra
+        "Soledad"). Los resultados de `search` se ordenan por relevancia.
+
+        Los resultados se guardan en caché con la versión de las colecciones
+        documents e items, por lo que cualquier escritura los invalida.
+        `versions` son esas versiones si ya se leyeron (GET condicional).
+        """
+        if not documents_cache.enabled:
+            return await self._find_documents(skip, limit, titulo, autor, categoria, search, cursor)
+
+        if versions is None:
+            versions = await get_versions(self.db, "documents", "items")
+        key = cache_key(
+            "documents",
+            sorted(versions.items()),
+            None if cursor else skip,
+            limit,
+            *(tokenize(value) if value else [] for value in (titulo, autor, categoria, search)),
+            cursor
+        )
+        return await documents_cache.get_or_set(
+            key,
+            lambda: self._find_documents(skip, limit, titulo, autor, categoria, search, cursor)
+        )
+
+    async def _find_documents(
+        self,
+        skip: int,
+        limit: int,
+        titulo: Optional[str],
+        autor: Optional[str],
+        categoria: Optional[str],
+        search: Optional[str],
+        cursor: Optional[str]
+    ) -> List[dict]:
+        """Consulta la página de documentos (sin caché)"""
+        search_words = tokenize(search) if search else []
+
+        if search_words and search_index.ready:
+            # Índice en memoria: BM25 con tolerancia a errores de tipeo
+            documents = self._indexed_documents(search, skip, limit, cursor)
+        elif search_words:
+            query = self._build_query(search_words=search_words)
+            documents = await self._ranked_documents(query, search_words, skip, limit, cursor)
         else:
-            # Búsqueda por filtros específicos
-            if titulo:
-                query["titulo"] = {"$regex": titulo, "$options": "i"}
-            if autor:
-                query["autor"] = {"$regex": autor, "$options": "i"}
-            if categoria:
-                query["categoria"] = {"$regex": categoria, "$options": "i"}
-        
-        cursor = self.collection.find(query).skip(skip).limit(limit)
-        documents = await cursor.to_list(length=limit)
+            query = self._build_query(titulo, autor, categoria)
+            documents = await paginate(
+                self.collection, query, skip=skip, limit=limit, cursor=cursor,
+                projection=DOCUMENT_PUBLIC_FIELDS
+            ).to_list(length=limit)
         
         # Agregar información de disponibilidad
         for doc in documents:
             doc["items_disponibles"] = await self._count_available_items(str(doc["_id"]))
         
         return documents
+
+    async def get_facets(
+        self,
+        titulo: Optional[str] = None,
+        autor: Optional[str] = None,
+        categoria: Optional[str] = None,
+        search: Optional[str] = None
+    ) -> dict:
+        """
+        Cuenta documentos por categoría, tipo y año de edición para los
+        mismos filtros del listado. Si el índice en memoria está activo,
+        las búsquedas se cuentan desde él; en otro caso se usa una
+        agregación $facet cuyo resultado queda en caché hasta la próxima
+        escritura de documentos.
+        """
+        search_words = tokenize(search) if search else []
+
+        if search_words and search_index.ready:
+            doc_ids = [doc_id for _, doc_id in search_index.search(search)]
+            counts = search_index.facets(doc_ids, FACET_FIELDS)
+            return {
+                "total": len(doc_ids),
+                **{
+                    field: [{"valor": value, "cantidad": count} for value, count in values.items()]
+                    for field, values in counts.items()
+                }
+            }
+
+        if search_words:
+            query = self._build_query(search_words=search_words)
+            key = ("search", tuple(search_words))
+        else:
+            query = self._build_query(titulo, autor, categoria)
+            key = tuple(" ".join(tokenize(value)) if value else "" for value in (titulo, autor, categoria))
+
+        cached = facet_cache.get(key)
+        if cached is not MISS:
+            return cached
+
+        generation = facet_cache.generation
+        facet_stages = {
+            field: [
+                {"$group": {"_id": f"${field}", "cantidad": {"$sum": 1}}},
+                {"$sort": {"cantidad": -1, "_id": 1}}
+            ]
+            for field in FACET_FIELDS
+        }
+        facet_stages["total"] = [{"$count": "total"}]
+        pipeline = [{"$match": query}, {"$facet": facet_stages}]
+        result = (await self.collection.aggregate(pipeline).to_list(length=1))[0]
+
+        facets = {
+            "total": result["total"][0]["total"] if result["total"] else 0,
+            **{
+                field: [
+                    {"valor": str(getattr(group["_id"], "value", group["_id"])), "cantidad": group["cantidad"]}
+                    for group in result[field] if group["_id"] is not None
+                ]
+                for field in FACET_FIELDS
+            }
+        }
+        facet_cache.set(key, facets, generation)
+        return facets
+
+    def _build_query(
+        self,
+        titulo: Optional[str] = None,
+        autor: Optional[str] = None,
+        categoria: Optional[str] = None,
+        search_words: Optional[List[str]] = None
+    ) -> dict:
+        """Construye el filtro de MongoDB sobre los campos normalizados"""
+        if search_words:
+            # Todas las palabras deben empezar alguna palabra del documento
+            return {"$and": [
+                {SEARCH_TOKENS_FIELD: prefix_regex(word)} for word in search_words
+            ]}
+
+        # Búsqueda por filtros específicos
+        clauses = []
+        for field, value in (("titulo", titulo), ("autor", autor), ("categoria", categoria)):
+            for word in tokenize(value) if value else []:
+                # El prefijo anclado usa el índice; el segundo filtro
+                # verifica que la palabra esté en el campo pedido
+                clauses.append({SEARCH_TOKENS_FIELD: prefix_regex(word)})
+                clauses.append({normalized_field(field): {"$regex": word_prefix_regex(word)}})
+        return {"$and": clauses} if clauses else {}
+
+    def _indexed_documents(
+        self,
+        search: str,
+        skip: int,
+        limit: int,
+        cursor: Optional[str]
+    ) -> List[dict]:
+        """Responde una búsqueda desde el índice en memoria, sin consultar MongoDB"""
+        ranked = search_index.search(search)
+        if cursor:
+            # Los resultados vienen en orden descendente de (relevancia, _id)
+            last = tuple(decode_cursor(cursor, RELEVANCE_FIELD))
+            ranked = [entry for entry in ranked if entry < last]
+            skip = 0
+
+        documents = []
+        for score, doc_id in ranked[skip:skip + limit]:
+            document = search_index.get(doc_id)
+            if document:
+                document[RELEVANCE_FIELD] = score
+                documents.append(document)
+        return documents
+
+    async def _ranked_documents(
+        self,
+        query: dict,
+        words: List[str],
+        skip: int,
+        limit: int,
+        cursor: Optional[str]
+    ) -> List[dict]:
+        """
+        Ordena los resultados por relevancia: cada palabra suma el peso del
+        campo donde aparece (título > autor > categoría), el doble si
+        coincide con la palabra completa.
+        """
+        terms = []
+        for word in words:
+            for field, weight in SEARCH_FIELDS.items():
+                source = f"${normalized_field(field)}"
+                terms.append({"$switch": {
+                    "branches": [
+                        {
+                            "case": {"$regexMatch": {
+                                "input": source, "regex": f"{word_prefix_regex(word)}( |$)"
+                            }},
+                            "then": weight * 2
+                        },
+                        {
+                            "case": {"$regexMatch": {"input": source, "regex": word_prefix_regex(word)}},
+                            "then": weight
+                        }
+                    ],
+                    "default": 0
+                }})
+
+        pipeline = [
+            {"$match": query},
+            {"$project": {**DOCUMENT_PUBLIC_FIELDS, RELEVANCE_FIELD: {"$add": terms}}},
+        ]
+        if cursor:
+            pipeline.append({"$match": keyset_filter(cursor, RELEVANCE_FIELD, DESCENDING)})
+            skip = 0
+        pipeline.append({"$sort": {RELEVANCE_FIELD: DESCENDING, "_id": DESCENDING}})
+        if skip:
+            pipeline.append({"$skip": skip})
+        pipeline.append({"$limit": limit})
+
+        return await self.collection.aggregate(pipeline).to_list(length=limit)
     
+    async def suggest(self, text: str, limit: int = 10) -> List[dict]:
+        """
+        Sugiere títulos y autores que empiezan con el texto (o con alguna de
+        sus palabras). Se responde desde memoria; mientras el índice no esté
+        listo se usa un prefijo anclado sobre los campos normalizados.
+        """
+        if suggestion_index.ready:
+            return suggestion_index.suggest(text, limit)
+
+        prefix = normalize_text(text)
+        if not prefix:
+            return []
+
+        suggestions = []
+        seen = set()
+        for field in SUGGEST_FIELDS:
+            cursor = self.collection.find(
+                {normalized_field(field): prefix_regex(prefix)},
+                fields(field)
+            ).sort(normalized_field(field), 1).limit(limit)
+            async for doc in cursor:
+                if (field, doc[field]) in seen:
+                    continue
+                seen.add((field, doc[field]))
+                suggestions.append({
+                    "texto": doc[field],
+                    "campo": field,
+                    "document_id": str(doc["_id"]) if field == "titulo" else None
+                })
+        return suggestions[:limit]
+
     async def update_document(
         self,
         document_id: str,
@@ -85,20 +381,25 @@ class DocumentService:
         if not update_data:
             return await self.get_document_by_id(document_id)
 
-        # Si se está actualizando id_fisico, verificar que sea único
-        if "id_fisico" in update_data:
-            existing = await self.collection.find_one({
-                "id_fisico": update_data["id_fisico"],
-                "_id": {"$ne": ObjectId(document_id)}
-            })
-            if existing:
-                raise ValueError(f"Ya existe un documento con el id_fisico: {update_data['id_fisico']}")
-
-        result = await self.collection.find_one_and_update(
-            {"_id": ObjectId(document_id)},
-            {"$set": update_data},
-            return_document=True
-        )
+        # Si se actualiza id_fisico, el índice único rechaza duplicados
+        try:
+            result = await self.collection.find_one_and_update(
+                {"_id": ObjectId(document_id)},
+                {"$set": update_data},
+                projection=DOCUMENT_PUBLIC_FIELDS,
+                return_document=True
+            )
+        except DuplicateKeyError:
+            raise ValueError(f"Ya existe un documento con el id_fisico: {update_data['id_fisico']}")
+
+        # Recalcular los campos de búsqueda si cambió alguno de sus campos
+        if result and update_data.keys() & SEARCH_FIELDS.keys():
+            await self.collection.update_one(
+                {"_id": result["_id"]}, {"$set": search_fields(result)}
+            )
+        if result:
+            documents_written([result])
+            await bump_version(self.db, "documents")
         return result
     
     async def delete_document(self, document_id: str) -> bool:
@@ -114,11 +415,14 @@ class DocumentService:
             return False  # No se puede eliminar si tiene ejemplares
         
         result = await self.collection.delete_one({"_id": ObjectId(document_id)})
+        if result.deleted_count > 0:
+            document_removed(ObjectId(document_id))
+            await bump_version(self.db, "documents")
         return result.deleted_count > 0
     
     async def _count_available_items(self, document_id: str) -> int:
         """Cuenta los ejemplares disponibles de un documento"""
-        return await self.items_collection.count_documents({
+        return await self.shared_count(self.items_collection, {
             "document_id": document_id,
             "estado": ItemStatus.DISPONIBLE
         })
@@ -0,0 +1,410 @@
+"""
+Servicio de multas por atraso y conciliación de sus pagos
+
+- Cada devolución atrasada genera una multa (FINE_PER_DAY_CLP por día) en
+  la colección `fines`, junto a la sanción del usuario.
+- El usuario paga sus multas pendientes con una preferencia de Mercado
+  Pago; `fine_payments` guarda qué multas cubre cada preferencia (su
+  external_reference).
+- El webhook solo encola la notificación en `payment_notifications` (una
+  por pago, así los reintentos del proveedor no se duplican) y responde.
+- PaymentReconciler procesa la cola por lotes: consulta el estado de los
+  pagos, marca las multas pagadas y levanta la sanción de los usuarios
+  sin multas pendientes. Verificar una sanción sigue siendo una lectura
+  de `users`, sin llamar al proveedor.
+- Una consulta fallida se reintenta con espera exponencial
+  (`proximo_intento`); tras PAYMENT_NOTIFICATION_MAX_ATTEMPTS queda en
+  ERROR. Un barrido periódico busca por external_reference los pagos de
+  las preferencias recientes con multas pendientes, así un pago cuya
+  notificación se perdió o falló igual se aplica.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.pagination import paginate
+from app.core.projections import fields, projection_for
+from app.core.serialization import RowSerializer
+from app.models.fine import FineResponse, FineStatus, NotificationStatus
+from app.services.payment_service import PaymentService, mercadopago_client
+
+logger = logging.getLogger(__name__)
+
+FINE_PUBLIC_FIELDS = projection_for(FineResponse)
+FINE_ROWS = RowSerializer(FineResponse)
+
+
+class FineService:
+    """Servicio para multas, sus pagos y la cola de notificaciones"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.fines
+        self.payments_collection = db.fine_payments
+        self.notifications_collection = db.payment_notifications
+        self.users_collection = db.users
+
+    async def create_fines(self, late_loans: List[Tuple[dict, int]], fecha: datetime) -> int:
+        """
+        Registra una multa por cada (préstamo, días de atraso). El índice
+        único por loan_id evita multar dos veces el mismo préstamo.
+        """
+        fines = [
+            {
+                "user_id": loan["user_id"],
+                "loan_id": str(loan["_id"]),
+                "dias_atraso": dias_atraso,
+                "monto": dias_atraso * settings.FINE_PER_DAY_CLP,
+                "estado": FineStatus.PENDIENTE,
+                "fecha_creacion": fecha,
+            }
+            for loan, dias_atraso in late_loans
+            if dias_atraso > 0 and settings.FINE_PER_DAY_CLP > 0
+        ]
+        if not fines:
+            return 0
+        try:
+            result = await self.collection.insert_many(fines, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            return e.details.get("nInserted", 0)
+
+    async def get_fines(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        user_id: Optional[str] = None,
+        estado: Optional[FineStatus] = None,
+        cursor: Optional[str] = None
+    ) -> List[dict]:
+        """Obtiene una lista de multas"""
+        query = {}
+        if user_id:
+            query["user_id"] = user_id
+        if estado:
+            query["estado"] = estado
+
+        return await paginate(
+            self.collection, query, skip=skip, limit=limit, cursor=cursor,
+            projection=FINE_PUBLIC_FIELDS
+        ).to_list(length=limit)
+
+    async def create_checkout(self, user: dict, idempotency_key: Optional[str] = None) -> dict:
+        """
+        Crea la preferencia de pago de las multas pendientes del usuario.
+        Con la misma clave de idempotencia se reutiliza la referencia, y
+        Mercado Pago retorna la misma preferencia.
+        """
+        user_id = str(user["_id"])
+        fines = await self.collection.find(
+            {"user_id": user_id, "estado": FineStatus.PENDIENTE},
+            fields("monto", "dias_atraso", "loan_id")
+        ).to_list(length=None)
+        if not fines:
+            raise ValueError("No hay multas pendientes")
+
+        if idempotency_key:
+            reference = str(uuid.uuid5(uuid.NAMESPACE_URL, f"multas:{user_id}:{idempotency_key}"))
+        else:
+            reference = str(uuid.uuid4())
+        monto = sum(fine["monto"] for fine in fines)
+        items = [
+            {
+                "id": str(fine["_id"]),
+                "title": f"Multa por {fine['dias_atraso']} días de atraso",
+                "quantity": 1,
+                "unit_price": fine["monto"],
+                "currency_id": "CLP",
+            }
+            for fine in fines
+        ]
+        preference = await PaymentService.create_preference(
+            items, user["email"], idempotency_key=reference,
+            external_reference=reference,
+            notification_url=settings.MERCADOPAGO_WEBHOOK_URL or None
+        )
+
+        # Si la clave se repite, se conserva el registro del primer intento
+        await self.payments_collection.update_one(
+            {"_id": reference},
+            {"$setOnInsert": {
+                "user_id": user_id,
+                "multas": [fine["_id"] for fine in fines],
+                "monto": monto,
+                "preference_id": preference["id"],
+                "fecha_creacion": datetime.utcnow(),
+            }},
+            upsert=True
+        )
+        checkout = await self.payments_collection.find_one({"_id": reference})
+        return {
+            "preferenceId": preference["id"],
+            "init_point": preference["init_point"],
+            "sandbox_init_point": preference.get("sandbox_init_point"),
+            "monto": checkout["monto"],
+            "multas": [str(fine_id) for fine_id in checkout["multas"]],
+        }
+
+    async def enqueue_notification(self, payment_id: str):
+        """
+        Encola la notificación de un pago. Una notificación repetida (o un
+        cambio de estado del mismo pago) vuelve a dejarla pendiente.
+        """
+        now = datetime.utcnow()
+        await self.notifications_collection.update_one(
+            {"_id": payment_id},
+            {
+                "$set": {
+                    "estado": NotificationStatus.PENDIENTE, "actualizada": now,
+                    "intentos": 0, "proximo_intento": now,
+                },
+                "$setOnInsert": {"recibida": now},
+            },
+            upsert=True
+        )
+
+    async def claim_notifications(self, limit: int) -> Tuple[ObjectId, Dict[str, int]]:
+        """
+        Reserva hasta `limit` notificaciones pendientes cuyo próximo intento
+        ya venció (o abandonadas por un proceso que no terminó). Retorna la
+        reserva y los intentos previos de cada pago.
+        """
+        now = datetime.utcnow()
+        claim = ObjectId()
+        abandoned = now - timedelta(seconds=settings.PAYMENT_CLAIM_TIMEOUT_SECONDS)
+        claimable = {"$or": [
+            {"estado": NotificationStatus.PENDIENTE, "proximo_intento": {"$not": {"$gt": now}}},
+            {"estado": NotificationStatus.PROCESANDO, "reclamada": {"$lt": abandoned}},
+        ]}
+        candidates = await self.notifications_collection.find(
+            claimable, fields()
+        ).sort("proximo_intento", 1).limit(limit).to_list(length=limit)
+        if not candidates:
+            return claim, {}
+
+        await self.notifications_collection.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in candidates]}, **claimable},
+            {"$set": {"estado": NotificationStatus.PROCESANDO, "reclamo": claim, "reclamada": now}}
+        )
+        claimed = await self.notifications_collection.find(
+            {"reclamo": claim}, fields("intentos")
+        ).to_list(length=limit)
+        return claim, {doc["_id"]: doc.get("intentos", 0) for doc in claimed}
+
+    async def process_notifications(self, limit: int) -> int:
+        """Procesa un lote de la cola. Retorna cuántas notificaciones tomó"""
+        claim, attempts = await self.claim_notifications(limit)
+        if not attempts:
+            return 0
+        payment_ids = list(attempts)
+
+        # El cliente limita las llamadas simultáneas a MERCADOPAGO_MAX_CONCURRENCY
+        results = await asyncio.gather(
+            *(mercadopago_client.get_payment(payment_id) for payment_id in payment_ids),
+            return_exceptions=True
+        )
+        approved, failed = [], []
+        for payment_id, result in zip(payment_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠ No se pudo consultar el pago {payment_id}: {result}")
+                failed.append(payment_id)
+            elif result.get("status") == "approved" and result.get("external_reference"):
+                approved.append(result)
+
+        await self.apply_payments(approved)
+
+        # Solo se cierran las que siguen reservadas: si llegó otra notificación
+        # del mismo pago mientras tanto, quedó pendiente y se procesa de nuevo
+        now = datetime.utcnow()
+        done = [payment_id for payment_id in payment_ids if payment_id not in failed]
+        if done:
+            await self.notifications_collection.update_many(
+                {"_id": {"$in": done}, "reclamo": claim, "estado": NotificationStatus.PROCESANDO},
+                {"$set": {"estado": NotificationStatus.PROCESADA, "procesada": now}}
+            )
+        if failed:
+            await self.notifications_collection.bulk_write([
+                UpdateOne(
+                    {"_id": payment_id, "reclamo": claim, "estado": NotificationStatus.PROCESANDO},
+                    {"$set": self._retry_update(attempts[payment_id] + 1, now), "$inc": {"intentos": 1}}
+                )
+                for payment_id in failed
+            ], ordered=False)
+        return len(payment_ids)
+
+    @staticmethod
+    def _retry_update(intentos: int, now: datetime) -> dict:
+        """Estado tras `intentos` fallos: reintento con espera exponencial o ERROR"""
+        if intentos >= settings.PAYMENT_NOTIFICATION_MAX_ATTEMPTS:
+            return {"estado": NotificationStatus.ERROR}
+        delay = min(
+            settings.PAYMENT_RETRY_BACKOFF_SECONDS * 2 ** (intentos - 1),
+            settings.PAYMENT_RETRY_MAX_BACKOFF_SECONDS
+        )
+        return {
+            "estado": NotificationStatus.PENDIENTE,
+            "proximo_intento": now + timedelta(seconds=delay),
+        }
+
+    async def reconcile_checkouts(self) -> int:
+        """
+        Busca por external_reference los pagos aprobados de las preferencias
+        recientes que aún cubren multas pendientes y los aplica. Cubre las
+        notificaciones perdidas o que agotaron sus intentos. Retorna cuántas
+        preferencias quedaron pagadas.
+        """
+        since = datetime.utcnow() - timedelta(days=settings.PAYMENT_SWEEP_MAX_AGE_DAYS)
+        checkouts = await self.payments_collection.find(
+            {"fecha_creacion": {"$gte": since}}, fields("multas")
+        ).to_list(length=None)
+        if not checkouts:
+            return 0
+
+        pending = set(await self.collection.distinct("_id", {
+            "_id": {"$in": [fine_id for checkout in checkouts for fine_id in checkout["multas"]]},
+            "estado": FineStatus.PENDIENTE,
+        }))
+        references = [
+            checkout["_id"] for checkout in checkouts
+            if any(fine_id in pending for fine_id in checkout["multas"])
+        ]
+        if not references:
+            return 0
+
+        results = await asyncio.gather(
+            *(mercadopago_client.search_payments(reference) for reference in references),
+            return_exceptions=True
+        )
+        approved = []
+        for reference, result in zip(references, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠ No se pudieron buscar los pagos de {reference}: {result}")
+                continue
+            approved.extend(
+                payment for payment in result
+                if payment.get("status") == "approved" and payment.get("external_reference") == reference
+            )
+
+        paid = await self.apply_payments(approved)
+        if paid:
+            logger.info(f"✓ Barrido de pagos: multas pagadas de {len(paid)} usuarios sin notificación")
+        return len({payment["external_reference"] for payment in approved})
+
+    async def apply_payments(self, payments: List[dict]) -> Set[str]:
+        """
+        Marca como pagadas las multas cubiertas por pagos aprobados y
+        levanta las sanciones. Retorna los usuarios con multas pagadas.
+        """
+        if not payments:
+            return set()
+
+        references = [payment["external_reference"] for payment in payments]
+        checkouts = {
+            checkout["_id"]: checkout
+            for checkout in await self.payments_collection.find(
+                {"_id": {"$in": references}}, fields("user_id", "multas", "monto")
+            ).to_list(length=None)
+        }
+
+        now = datetime.utcnow()
+        operations = []
+        users: Set[str] = set()
+        for payment in payments:
+            checkout = checkouts.get(payment["external_reference"])
+            if checkout is None:
+                continue
+            if payment.get("transaction_amount", 0) < checkout["monto"]:
+                logger.warning(
+                    f"⚠ Pago {payment['id']} por {payment.get('transaction_amount')} menor al "
+                    f"monto de las multas ({checkout['monto']}); no se aplica"
+                )
+                continue
+            operations.append(UpdateMany(
+                {"_id": {"$in": checkout["multas"]}, "estado": FineStatus.PENDIENTE},
+                {"$set": {"estado": FineStatus.PAGADA, "fecha_pago": now, "payment_id": str(payment["id"])}}
+            ))
+            users.add(checkout["user_id"])
+
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+            lifted = await self.lift_sanctions(users)
+            logger.info(f"✓ Multas pagadas de {len(users)} usuarios; {lifted} sanciones levantadas")
+        return users
+
+    async def lift_sanctions(self, user_ids: Set[str]) -> int:
+        """Levanta la sanción de los usuarios que ya no tienen multas pendientes"""
+        pending = set(await self.collection.distinct(
+            "user_id", {"user_id": {"$in": list(user_ids)}, "estado": FineStatus.PENDIENTE}
+        ))
+        cleared = [ObjectId(user_id) for user_id in user_ids - pending if ObjectId.is_valid(user_id)]
+        if not cleared:
+            return 0
+        result = await self.users_collection.update_many(
+            {"_id": {"$in": cleared}, "sancion_hasta": {"$exists": True}},
+            {"$unset": {"sancion_hasta": ""}}
+        )
+        return result.modified_count
+
+
+class PaymentReconciler:
+    """
+    Procesa en segundo plano la cola de notificaciones de pago y, cada
+    `sweep_interval_seconds`, barre las preferencias con multas pendientes
+    """
+
+    def __init__(self, interval_seconds: float, batch_size: int, sweep_interval_seconds: float = 0):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, db: AsyncIOMotorDatabase):
+        """Inicia el procesamiento periódico"""
+        if self.interval_seconds <= 0 or self._task:
+            return
+        self._task = asyncio.create_task(self._run(FineService(db)))
+
+    async def _run(self, fine_service: FineService):
+        next_sweep = time.monotonic()
+        while True:
+            if self.sweep_interval_seconds > 0 and time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + self.sweep_interval_seconds
+                try:
+                    await fine_service.reconcile_checkouts()
+                except Exception as e:
+                    logger.error(f"✗ Error en el barrido de pagos: {e}")
+            try:
+                taken = await fine_service.process_notifications(self.batch_size)
+            except Exception as e:
+                logger.error(f"✗ Error al conciliar pagos: {e}")
+                taken = 0
+            # Con un lote completo probablemente quedan más: se sigue sin esperar
+            if taken < self.batch_size:
+                await asyncio.sleep(self.interval_seconds)
+
+    async def stop(self):
+        """Detiene el procesamiento"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Instancia global
+payment_reconciler = PaymentReconciler(
+    settings.PAYMENT_RECONCILE_INTERVAL_SECONDS,
+    settings.PAYMENT_RECONCILE_BATCH_SIZE,
+    settings.PAYMENT_SWEEP_INTERVAL_SECONDS
+)
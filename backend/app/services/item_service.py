@@ -1,17 +1,37 @@
 """
 Servicio de gestión de ejemplares (items)
 """
-from typing import Optional, List
+from typing import Optional, List, NamedTuple
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.models.item import ItemCreate, ItemUpdate, ItemStatus
+from app.models.item import ItemCreate, ItemUpdate, ItemStatus, ItemResponse
+from app.core.http_cache import bump_version
+from app.core.pagination import paginate
+from app.core.projections import fields, projection_for
+from app.core.serialization import RowSerializer
+from app.services.base import BaseService
 
+# Proyecciones por caso de uso
+ITEM_PUBLIC_FIELDS = projection_for(ItemResponse)
+ITEM_DOCUMENT_FIELDS = fields("document_id")
+# Serialización directa de los listados
+ITEM_ROWS = RowSerializer(ItemResponse)
 
-class ItemService:
+
+class ItemDocumentRow(NamedTuple):
+    """Documento de un ejemplar (mismos campos que ITEM_DOCUMENT_FIELDS)"""
+    id: ObjectId
+    document_id: str
+
+
+class ItemService(BaseService):
     """Servicio para operaciones CRUD de ejemplares"""
     
+    name = "items"
+    
     def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(db)
         self.collection = db.items
     
     async def create_item(self, item: ItemCreate) -> dict:
@@ -19,20 +39,26 @@ class ItemService:
         item_dict = item.model_dump()
         result = await self.collection.insert_one(item_dict)
         item_dict["_id"] = result.inserted_id
+        await bump_version(self.db, "items")
         return item_dict
     
-    async def get_item_by_id(self, item_id: str) -> Optional[dict]:
+    async def get_item_by_id(
+        self,
+        item_id: str,
+        projection: Optional[dict] = ITEM_PUBLIC_FIELDS
+    ) -> Optional[dict]:
         """Obtiene un ejemplar por su ID"""
         if not ObjectId.is_valid(item_id):
             return None
-        return await self.collection.find_one({"_id": ObjectId(item_id)})
+        return await self.shared_find_one(self.collection, {"_id": ObjectId(item_id)}, projection)
     
     async def get_items(
         self,
         skip: int = 0,
         limit: int = 100,
         document_id: Optional[str] = None,
-        estado: Optional[ItemStatus] = None
+        estado: Optional[ItemStatus] = None,
+        cursor: Optional[str] = None
     ) -> List[dict]:
         """Obtiene una lista de ejemplares"""
         query = {}
@@ -41,8 +67,10 @@ class ItemService:
         if estado:
             query["estado"] = estado
         
-        cursor = self.collection.find(query).skip(skip).limit(limit)
-        return await cursor.to_list(length=limit)
+        return await paginate(
+            self.read_collection(self.collection), query, skip=skip, limit=limit, cursor=cursor,
+            projection=ITEM_PUBLIC_FIELDS
+        ).to_list(length=limit)
     
     async def update_item(self, item_id: str, item_update: ItemUpdate) -> Optional[dict]:
         """Actualiza un ejemplar"""
@@ -57,8 +85,11 @@ class ItemService:
         result = await self.collection.find_one_and_update(
             {"_id": ObjectId(item_id)},
             {"$set": update_data},
+            projection=ITEM_PUBLIC_FIELDS,
             return_document=True
         )
+        if result:
+            await bump_version(self.db, "items")
         return result
     
     async def delete_item(self, item_id: str) -> bool:
@@ -67,6 +98,8 @@ class ItemService:
             return False
         
         result = await self.collection.delete_one({"_id": ObjectId(item_id)})
+        if result.deleted_count > 0:
+            await bump_version(self.db, "items")
         return result.deleted_count > 0
     
     async def update_item_status(self, item_id: str, status: ItemStatus) -> Optional[dict]:
@@ -77,8 +110,11 @@ class ItemService:
         result = await self.collection.find_one_and_update(
             {"_id": ObjectId(item_id)},
             {"$set": {"estado": status}},
+            projection=ITEM_PUBLIC_FIELDS,
             return_document=True
         )
+        if result:
+            await bump_version(self.db, "items")
         return result
     
     async def get_available_item_for_document(self, document_id: str) -> Optional[dict]:
@@ -86,5 +122,5 @@ class ItemService:
         return await self.collection.find_one({
             "document_id": document_id,
             "estado": ItemStatus.DISPONIBLE
-        })
+        }, ITEM_PUBLIC_FIELDS)
 
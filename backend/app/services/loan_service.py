@@ -2,76 +2,242 @@
 Servicio de gestión de préstamos
 """
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List, Dict, NamedTuple
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
-from app.models.loan import LoanCreate, LoanType, LoanStatus
+from app.models.loan import LoanCreate, LoanBulkCreate, LoanType, LoanStatus, LoanResponse
 from app.models.item import ItemStatus
 from app.core.config import settings
+from app.core.http_cache import bump_version
+from app.core.pagination import paginate
+from app.core.projections import fields, projection_for
+from app.core.rows import DEFAULT_CHUNK_SIZE, iter_row_chunks, object_ids, row_projection, rows_by_field
+from app.core.serialization import RowSerializer
+from app.services.document_service import DocumentTitleRow
+from app.services.fine_service import FineService
+from app.services.item_service import ItemDocumentRow
+from app.services.user_service import UserContactRow
+
+# Proyecciones por caso de uso
+LOAN_PUBLIC_FIELDS = projection_for(
+    LoanResponse, exclude={"document_titulo", "document_id_fisico"}
+)
+# Serialización directa de los listados
+LOAN_ROWS = RowSerializer(LoanResponse)
+
+
+# Filas compactas para recorridos batch y exportaciones
+class OverdueLoanRow(NamedTuple):
+    id: ObjectId
+    user_id: str
+    item_id: str
+    fecha_devolucion_pactada: datetime
+
+
+class LoanExportRow(NamedTuple):
+    id: ObjectId
+    user_id: str
+    item_id: str
+    tipo_prestamo: str
+    fecha_prestamo: datetime
+    fecha_devolucion_pactada: datetime
+    fecha_devolucion_real: Optional[datetime]
+    estado: str
+
+
+class LoanReferences(NamedTuple):
+    """Usuarios (por user_id) y documentos (por item_id) de un lote de préstamos"""
+    users: Dict[str, UserContactRow]
+    documents: Dict[str, DocumentTitleRow]
 
 
 class LoanService:
     """Servicio para operaciones de préstamos"""
     
     def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
         self.collection = db.loans
         self.items_collection = db.items
         self.users_collection = db.users
     
     async def create_loan(self, loan: LoanCreate) -> Optional[dict]:
-        """Crea un nuevo préstamo"""
-        # Verificar que el item esté disponible
-        item = await self.items_collection.find_one({
-            "_id": ObjectId(loan.item_id),
-            "estado": ItemStatus.DISPONIBLE
-        })
-        if not item:
+        """
+        Crea un nuevo préstamo.
+
+        El ejemplar se reclama con una actualización condicional, por lo que
+        dos préstamos simultáneos del mismo ejemplar no pueden prosperar.
+        Si la inserción del préstamo falla, el ejemplar se libera
+        (compensación), ya que MongoDB standalone no soporta transacciones.
+        """
+        if not ObjectId.is_valid(loan.item_id) or not ObjectId.is_valid(loan.user_id):
             return None
         
         # Verificar que el usuario no esté sancionado
-        user = await self.users_collection.find_one({"_id": ObjectId(loan.user_id)})
-        if user and user.get("sancion_hasta"):
-            if user["sancion_hasta"] > datetime.utcnow():
-                return None  # Usuario sancionado
+        if await self._is_user_sanctioned(loan.user_id):
+            return None
+        
+        loan_dict = self._build_loan(loan, datetime.utcnow())
+        
+        # Reclamar el ejemplar de forma atómica (disponible -> prestado)
+        item = await self.items_collection.find_one_and_update(
+            {"_id": ObjectId(loan.item_id), "estado": ItemStatus.DISPONIBLE},
+            {"$set": {"estado": ItemStatus.PRESTADO, "prestamo_id": loan_dict["_id"]}},
+            projection=fields()
+        )
+        if not item:
+            return None  # No existe o ya fue prestado
+        await bump_version(self.db, "items")
+        
+        # Crear el préstamo, liberando el ejemplar si falla
+        try:
+            await self.collection.insert_one(loan_dict)
+        except PyMongoError:
+            await self._release_items([loan_dict])
+            raise
+        
+        return loan_dict
+    
+    async def create_loans_bulk(self, bulk: LoanBulkCreate) -> Optional[List[dict]]:
+        """
+        Registra varios préstamos para un mismo usuario.
+
+        Valida al usuario una sola vez, reclama todos los ejemplares con un
+        bulk_write y crea los préstamos con un insert_many. Retorna None si
+        el usuario está sancionado; en otro caso, un resultado por ejemplar
+        con las llaves id, loan y error.
+        """
+        if not ObjectId.is_valid(bulk.user_id):
+            return None
+        if await self._is_user_sanctioned(bulk.user_id):
+            return None
         
-        # Calcular fecha de devolución
         fecha_prestamo = datetime.utcnow()
+        results: Dict[str, Optional[dict]] = {}
+        pending: Dict[str, dict] = {}  # item_id -> préstamo por crear
+        
+        for item_id in dict.fromkeys(bulk.item_ids):
+            if not ObjectId.is_valid(item_id):
+                results[item_id] = {"id": item_id, "loan": None, "error": "ID de ejemplar inválido"}
+                continue
+            item_id = str(ObjectId(item_id))
+            results[item_id] = None  # Reserva la posición para respetar el orden recibido
+            pending[item_id] = self._build_loan(
+                LoanCreate(item_id=item_id, user_id=bulk.user_id, tipo_prestamo=bulk.tipo_prestamo),
+                fecha_prestamo
+            )
+        
+        claimed = await self._claim_items(list(pending.values())) if pending else set()
+        to_insert = [loan for item_id, loan in pending.items() if item_id in claimed]
+        
+        # Crear los préstamos; los que fallen liberan su ejemplar
+        failed = set()
+        if to_insert:
+            try:
+                await self.collection.insert_many(to_insert, ordered=False)
+            except BulkWriteError as e:
+                failed_loans = [to_insert[err["index"]] for err in e.details.get("writeErrors", [])]
+                failed = {loan["item_id"] for loan in failed_loans}
+                await self._release_items(failed_loans)
+            except PyMongoError:
+                await self._release_items(to_insert)
+                raise
+        
+        for item_id, loan in pending.items():
+            if item_id not in claimed:
+                results[item_id] = {"id": item_id, "loan": None, "error": "Ejemplar no disponible"}
+            elif item_id in failed:
+                results[item_id] = {"id": item_id, "loan": None, "error": "Error al registrar el préstamo"}
+            else:
+                results[item_id] = {"id": item_id, "loan": loan, "error": None}
+        
+        return list(results.values())
+    
+    async def _is_user_sanctioned(self, user_id: str) -> bool:
+        """Verifica si el usuario tiene una sanción vigente"""
+        user = await self.users_collection.find_one(
+            {"_id": ObjectId(user_id)}, fields("sancion_hasta")
+        )
+        if user and user.get("sancion_hasta"):
+            return user["sancion_hasta"] > datetime.utcnow()
+        return False
+    
+    def _build_loan(self, loan: LoanCreate, fecha_prestamo: datetime) -> dict:
+        """Construye el documento de préstamo con su fecha de devolución"""
         if loan.tipo_prestamo == LoanType.DOMICILIO:
             fecha_devolucion = fecha_prestamo + timedelta(days=settings.LOAN_DAYS_HOME)
         else:  # SALA
             fecha_devolucion = fecha_prestamo + timedelta(hours=settings.LOAN_HOURS_ROOM)
         
         loan_dict = loan.model_dump()
+        loan_dict["_id"] = ObjectId()  # Se genera antes para asociarlo al ejemplar reclamado
         loan_dict["fecha_prestamo"] = fecha_prestamo
         loan_dict["fecha_devolucion_pactada"] = fecha_devolucion
         loan_dict["fecha_devolucion_real"] = None
         loan_dict["estado"] = LoanStatus.ACTIVO
+        return loan_dict
+    
+    async def _claim_items(self, loans: List[dict]) -> set:
+        """
+        Reclama los ejemplares de los préstamos indicados en un solo bulk_write.
+        Retorna los item_id que quedaron asociados a estos préstamos.
+        """
+        operations = [
+            UpdateOne(
+                {"_id": ObjectId(loan["item_id"]), "estado": ItemStatus.DISPONIBLE},
+                {"$set": {"estado": ItemStatus.PRESTADO, "prestamo_id": loan["_id"]}}
+            )
+            for loan in loans
+        ]
+        result = await self.items_collection.bulk_write(operations, ordered=False)
+        if result.modified_count:
+            await bump_version(self.db, "items")
+        if result.modified_count == len(operations):
+            return {loan["item_id"] for loan in loans}
         
-        # Crear el préstamo
-        result = await self.collection.insert_one(loan_dict)
-        loan_dict["_id"] = result.inserted_id
-        
-        # Actualizar estado del item
-        await self.items_collection.update_one(
-            {"_id": ObjectId(loan.item_id)},
-            {"$set": {"estado": ItemStatus.PRESTADO}}
+        # Algunos no estaban disponibles: identificar los reclamados por este lote
+        claimed = await self.items_collection.find(
+            {
+                "_id": {"$in": [ObjectId(loan["item_id"]) for loan in loans]},
+                "prestamo_id": {"$in": [loan["_id"] for loan in loans]}
+            },
+            fields()
+        ).to_list(length=None)
+        return {str(item["_id"]) for item in claimed}
+    
+    async def _release_items(self, loans: List[dict]) -> None:
+        """Devuelve a disponible ejemplares reclamados cuyo préstamo no se creó"""
+        await self.items_collection.update_many(
+            {
+                "_id": {"$in": [ObjectId(loan["item_id"]) for loan in loans]},
+                "prestamo_id": {"$in": [loan["_id"] for loan in loans]}
+            },
+            {
+                "$set": {"estado": ItemStatus.DISPONIBLE},
+                "$unset": {"prestamo_id": ""}
+            }
         )
-        
-        return loan_dict
+        await bump_version(self.db, "items")
     
-    async def get_loan_by_id(self, loan_id: str) -> Optional[dict]:
+    async def get_loan_by_id(
+        self,
+        loan_id: str,
+        projection: Optional[dict] = LOAN_PUBLIC_FIELDS
+    ) -> Optional[dict]:
         """Obtiene un préstamo por su ID"""
         if not ObjectId.is_valid(loan_id):
             return None
-        return await self.collection.find_one({"_id": ObjectId(loan_id)})
+        return await self.collection.find_one({"_id": ObjectId(loan_id)}, projection)
     
     async def get_loans(
         self,
         skip: int = 0,
         limit: int = 100,
         user_id: Optional[str] = None,
-        estado: Optional[LoanStatus] = None
+        estado: Optional[LoanStatus] = None,
+        cursor: Optional[str] = None
     ) -> List[dict]:
         """Obtiene una lista de préstamos"""
         query = {}
@@ -80,8 +246,10 @@ class LoanService:
         if estado:
             query["estado"] = estado
         
-        cursor = self.collection.find(query).skip(skip).limit(limit)
-        return await cursor.to_list(length=limit)
+        return await paginate(
+            self.collection, query, skip=skip, limit=limit, cursor=cursor,
+            projection=LOAN_PUBLIC_FIELDS
+        ).to_list(length=limit)
     
     async def return_loan(self, loan_id: str) -> Optional[dict]:
         """Procesa la devolución de un préstamo"""
@@ -112,28 +280,212 @@ class LoanService:
                 {"_id": ObjectId(loan["user_id"])},
                 {"$set": {"sancion_hasta": fecha_fin_sancion}}
             )
+            # Multa asociada (pagarla levanta la sanción)
+            await FineService(self.db).create_fines([(loan, dias_atraso)], fecha_devolucion)
         
         result = await self.collection.find_one_and_update(
             {"_id": ObjectId(loan_id)},
             {"$set": update_data},
+            projection=LOAN_PUBLIC_FIELDS,
             return_document=True
         )
         
         # Actualizar estado del item
         await self.items_collection.update_one(
             {"_id": ObjectId(loan["item_id"])},
-            {"$set": {"estado": ItemStatus.DISPONIBLE}}
+            {
+                "$set": {"estado": ItemStatus.DISPONIBLE},
+                "$unset": {"prestamo_id": ""}
+            }
         )
+        await bump_version(self.db, "items")
         
         return result
     
-    async def get_overdue_loans(self) -> List[dict]:
-        """Obtiene préstamos vencidos"""
-        cursor = self.collection.find({
-            "estado": LoanStatus.ACTIVO,
+    async def return_loans_bulk(self, loan_ids: List[str]) -> List[dict]:
+        """
+        Procesa la devolución de varios préstamos.
+
+        Lee los préstamos con una sola consulta, los marca como devueltos con
+        un bulk_write, libera los ejemplares con un update_many y aplica una
+        sola sanción por usuario. Retorna un resultado por préstamo con las
+        llaves id, loan y error.
+        """
+        fecha_devolucion = datetime.utcnow()
+        # Marca de este lote: distingue sus préstamos de los de una devolución concurrente
+        lote = ObjectId()
+        results: Dict[str, Optional[dict]] = {}
+        
+        requested = []
+        for loan_id in dict.fromkeys(loan_ids):
+            if not ObjectId.is_valid(loan_id):
+                results[loan_id] = {"id": loan_id, "loan": None, "error": "ID de préstamo inválido"}
+                continue
+            loan_id = str(ObjectId(loan_id))
+            results[loan_id] = None  # Reserva la posición para respetar el orden recibido
+            requested.append(loan_id)
+        
+        loans = []
+        if requested:
+            loans = await self.collection.find(
+                {
+                    "_id": {"$in": [ObjectId(loan_id) for loan_id in requested]},
+                    "estado": LoanStatus.ACTIVO
+                },
+                LOAN_PUBLIC_FIELDS
+            ).to_list(length=None)
+        
+        if loans:
+            update_data = {
+                "fecha_devolucion_real": fecha_devolucion,
+                "estado": LoanStatus.DEVUELTO
+            }
+            result = await self.collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": loan["_id"], "estado": LoanStatus.ACTIVO},
+                        {"$set": {**update_data, "lote_devolucion": lote}}
+                    )
+                    for loan in loans
+                ],
+                ordered=False
+            )
+            if result.modified_count < len(loans):
+                # Una devolución concurrente ganó algunos préstamos: conservar los de este lote
+                returned = await self.collection.find(
+                    {
+                        "_id": {"$in": [loan["_id"] for loan in loans]},
+                        "lote_devolucion": lote
+                    },
+                    fields()
+                ).to_list(length=None)
+                returned_ids = {item["_id"] for item in returned}
+                loans = [loan for loan in loans if loan["_id"] in returned_ids]
+            
+            for loan in loans:
+                loan.update(update_data)
+        
+        if loans:
+            # Liberar los ejemplares
+            await self.items_collection.update_many(
+                {"_id": {"$in": [ObjectId(loan["item_id"]) for loan in loans if ObjectId.is_valid(loan["item_id"])]}},
+                {
+                    "$set": {"estado": ItemStatus.DISPONIBLE},
+                    "$unset": {"prestamo_id": ""}
+                }
+            )
+            await bump_version(self.db, "items")
+            
+            # Calcular la sanción más larga por usuario y una multa por préstamo atrasado
+            sanctions: Dict[str, datetime] = {}
+            late_loans = []
+            for loan in loans:
+                if fecha_devolucion > loan["fecha_devolucion_pactada"]:
+                    dias_atraso = (fecha_devolucion - loan["fecha_devolucion_pactada"]).days
+                    fin = fecha_devolucion + timedelta(days=dias_atraso * settings.SANCTION_MULTIPLIER)
+                    sanctions[loan["user_id"]] = max(sanctions.get(loan["user_id"], fin), fin)
+                    late_loans.append((loan, dias_atraso))
+            
+            operations = [
+                UpdateOne({"_id": ObjectId(user_id)}, {"$max": {"sancion_hasta": fin}})
+                for user_id, fin in sanctions.items()
+                if ObjectId.is_valid(user_id)
+            ]
+            if operations:
+                await self.users_collection.bulk_write(operations, ordered=False)
+            await FineService(self.db).create_fines(late_loans, fecha_devolucion)
+        
+        returned_by_id = {str(loan["_id"]): loan for loan in loans}
+        for loan_id in requested:
+            loan = returned_by_id.get(loan_id)
+            if loan:
+                results[loan_id] = {"id": loan_id, "loan": loan, "error": None}
+            else:
+                results[loan_id] = {
+                    "id": loan_id,
+                    "loan": None,
+                    "error": "Préstamo no encontrado o no activo"
+                }
+        
+        return list(results.values())
+    
+    @staticmethod
+    def _overdue_query() -> dict:
+        """
+        Préstamos vencidos: activos con la fecha pactada cumplida y los ya
+        marcados como vencidos por el proceso batch
+        """
+        return {
+            "estado": {"$in": [LoanStatus.ACTIVO, LoanStatus.VENCIDO]},
             "fecha_devolucion_pactada": {"$lt": datetime.utcnow()}
-        })
+        }
+
+    async def get_overdue_loans(
+        self,
+        projection: Optional[dict] = LOAN_PUBLIC_FIELDS
+    ) -> List[dict]:
+        """Obtiene préstamos vencidos"""
+        cursor = self.collection.find(self._overdue_query(), projection)
         return await cursor.to_list(length=None)
+
+    async def iter_overdue_loans(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[List[OverdueLoanRow]]:
+        """
+        Recorre los préstamos vencidos en lotes de filas compactas, sin
+        cargar el resultado completo en memoria
+        """
+        cursor = self.collection.find(self._overdue_query(), row_projection(OverdueLoanRow))
+        async for chunk in iter_row_chunks(cursor, OverdueLoanRow, chunk_size):
+            yield chunk
+
+    async def iter_loans_for_export(
+        self,
+        query: dict,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[List[LoanExportRow]]:
+        """Recorre préstamos en lotes de filas para exportarlos"""
+        cursor = self.collection.find(query, row_projection(LoanExportRow)).sort("_id", 1)
+        async for chunk in iter_row_chunks(cursor, LoanExportRow, chunk_size):
+            yield chunk
+    
+    async def resolve_references(self, loans: List[tuple]) -> LoanReferences:
+        """
+        Usuarios y documentos de un lote de préstamos, con una consulta $in
+        por colección en lugar de varias por préstamo
+        """
+        users = await rows_by_field(
+            self.users_collection, "_id", object_ids(loan.user_id for loan in loans), UserContactRow
+        )
+        items = await rows_by_field(
+            self.items_collection, "_id", object_ids(loan.item_id for loan in loans), ItemDocumentRow
+        )
+
+        # El document_id puede ser un ObjectId o un ID físico (string)
+        document_ids = {item.document_id for item in items.values() if item.document_id}
+        by_id = await rows_by_field(
+            self.db.documents, "_id", object_ids(document_ids), DocumentTitleRow
+        )
+        by_physical_id = await rows_by_field(
+            self.db.documents, "id_fisico",
+            [value for value in document_ids if not ObjectId.is_valid(value)],
+            DocumentTitleRow
+        )
+
+        documents = {}
+        for item_id, item in items.items():
+            if ObjectId.is_valid(item.document_id):
+                document = by_id.get(ObjectId(item.document_id))
+            else:
+                document = by_physical_id.get(item.document_id)
+            if document:
+                documents[str(item_id)] = document
+
+        return LoanReferences(
+            users={str(user_id): user for user_id, user in users.items()},
+            documents=documents
+        )
     
     async def mark_loans_as_overdue(self) -> int:
         """Marca préstamos activos como vencidos si pasó su fecha"""
@@ -8,7 +8,10 @@ import logging
 from aiokafka import AIOKafkaConsumer
 from aiokafka.errors import KafkaError
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from app.core.log_config import setup_logging
+from app.core.tracing import extract_context, setup_tracing, shutdown_tracing, span
 
 # Configuración
 KAFKA_BOOTSTRAP_SERVERS = "localhost:9092"
@@ -16,10 +19,6 @@ KAFKA_EMAIL_TOPIC = "email-notifications"
 EMAIL_API_ENABLED = False  # Cambiar a True cuando tengas credenciales
 EMAIL_API_KEY = ""  # Tu API key de SendGrid/Mailgun
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -63,22 +62,20 @@ class EmailService:
     
     async def send_email_console(self, recipient: str, subject: str, body: str):
         """Simula el envío de email mostrándolo en consola (para desarrollo)"""
-        logger.info("=" * 80)
-        logger.info("📧 EMAIL SIMULADO")
-        logger.info("=" * 80)
-        logger.info(f"Para: {recipient}")
-        logger.info(f"Asunto: {subject}")
-        logger.info("-" * 80)
-        logger.info(body)
-        logger.info("=" * 80)
+        # Un solo registro (no una línea de log por línea del email)
+        logger.info(
+            f"📧 EMAIL SIMULADO\nPara: {recipient}\nAsunto: {subject}\n{'-' * 80}\n{body}"
+        )
         return True
     
     async def send_email(self, recipient: str, subject: str, body: str) -> bool:
         """Envía email (real o simulado según configuración)"""
         if EMAIL_API_ENABLED and self.api_key:
-            return await self.send_email_sendgrid(recipient, subject, body)
+            with span("email send", "client", {"email.provider": "sendgrid"}):
+                return await self.send_email_sendgrid(recipient, subject, body)
         else:
-            return await self.send_email_console(recipient, subject, body)
+            with span("email send", attributes={"email.provider": "console"}):
+                return await self.send_email_console(recipient, subject, body)
     
     async def close(self):
         """Cierra el cliente HTTP"""
@@ -127,12 +124,20 @@ class NotificationConsumer:
         """Consume mensajes del tópico"""
         try:
             async for message in self.consumer:
-                await self.process_message(message.value)
+                await self.process_message(message.value, message.headers)
         except asyncio.CancelledError:
             logger.info("Consumidor cancelado")
     
-    async def process_message(self, event: Dict[str, Any]):
-        """Procesa un mensaje de notificación"""
+    async def process_message(self, event: Dict[str, Any], headers: Optional[list] = None):
+        """
+        Procesa un mensaje de notificación. Si las cabeceras traen el
+        contexto de una traza, el procesamiento continúa esa traza.
+        """
+        attributes = {"messaging.system": "kafka", "messaging.source": KAFKA_EMAIL_TOPIC}
+        with span(f"kafka process {KAFKA_EMAIL_TOPIC}", "consumer", attributes, extract_context(headers)):
+            await self._process_message(event)
+
+    async def _process_message(self, event: Dict[str, Any]):
         try:
             recipient = event.get("recipient")
             subject = event.get("subject")
@@ -168,7 +173,9 @@ class NotificationConsumer:
 
 async def main():
     """Función principal del worker"""
+    setup_logging("bec-notification-worker")
     logger.info("🚀 Iniciando Worker de Notificaciones...")
+    setup_tracing("bec-notification-worker")
     
     consumer = NotificationConsumer()
     
@@ -177,6 +184,8 @@ async def main():
     except KeyboardInterrupt:
         logger.info("Deteniendo worker...")
         await consumer.stop()
+    finally:
+        shutdown_tracing()
 
 
 if __name__ == "__main__":
@@ -1,37 +1,157 @@
-import mercadopago
+"""
+Servicio de pagos con Mercado Pago
+
+El cliente usa una única sesión HTTP asíncrona por proceso (conexiones
+reutilizadas) y limita las llamadas simultáneas al proveedor. Toda
+creación lleva una clave de idempotencia (X-Idempotency-Key), así que los
+reintentos ante errores de red o 5xx no duplican preferencias ni pagos.
+
+MERCADOPAGO_API_URL permite apuntar a un servidor local de pruebas
+(scripts/mercadopago_stub.py).
+"""
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
 from app.core.config import settings
-import sys
-import json
 
-# Inicializar SDK con el access token configurado
-def get_sdk():
-    return mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
+logger = logging.getLogger(__name__)
+
+# Respuestas del proveedor que se reintentan (con la misma clave de idempotencia)
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class PaymentProviderError(Exception):
+    """Mercado Pago rechazó la operación o no respondió"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MercadoPagoClient:
+    """Cliente asíncrono de la API de Mercado Pago"""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(settings.MERCADOPAGO_MAX_CONCURRENCY)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Sesión HTTP compartida, creada en el primer uso"""
+        if not settings.MERCADOPAGO_ACCESS_TOKEN:
+            raise ValueError("MERCADOPAGO_ACCESS_TOKEN no está configurado")
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=settings.MERCADOPAGO_API_URL,
+                headers={"Authorization": f"Bearer {settings.MERCADOPAGO_ACCESS_TOKEN}"},
+                timeout=settings.MERCADOPAGO_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.MERCADOPAGO_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.MERCADOPAGO_MAX_CONCURRENCY,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        """Cierra la sesión HTTP"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        json: Optional[dict] = None,
+        params: Optional[dict] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Llamada a la API con reintentos. Las escrituras sin clave reciben
+        una nueva, que se repite en cada reintento.
+        """
+        client = self._get_client()
+        headers = {}
+        if method != "GET":
+            headers["X-Idempotency-Key"] = idempotency_key or uuid.uuid4().hex
+
+        attempts = settings.MERCADOPAGO_MAX_RETRIES + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self._semaphore:
+                    response = await client.request(method, path, json=json, params=params, headers=headers)
+            except httpx.TransportError as e:
+                if attempt == attempts:
+                    raise PaymentProviderError(f"Mercado Pago no responde: {e}")
+                logger.warning(f"⚠ Error de red con Mercado Pago ({e}), reintento {attempt}/{attempts - 1}")
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in _RETRY_STATUS or attempt == attempts:
+                    raise PaymentProviderError(
+                        f"Mercado Pago respondió {response.status_code}: {_error_message(response)}",
+                        response.status_code
+                    )
+                logger.warning(
+                    f"⚠ Mercado Pago respondió {response.status_code}, reintento {attempt}/{attempts - 1}"
+                )
+            await asyncio.sleep(settings.MERCADOPAGO_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+    async def create_preference(self, data: dict, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Crea una preferencia de pago (checkout)"""
+        return await self.request("POST", "/checkout/preferences", json=data, idempotency_key=idempotency_key)
+
+    async def get_payment(self, payment_id: str) -> Dict[str, Any]:
+        """Obtiene un pago por su ID"""
+        return await self.request("GET", f"/v1/payments/{payment_id}")
+
+    async def search_payments(self, external_reference: str) -> List[Dict[str, Any]]:
+        """Pagos asociados a una external_reference"""
+        data = await self.request(
+            "GET", "/v1/payments/search", params={"external_reference": external_reference}
+        )
+        return data.get("results", [])
+
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        return response.json().get("message", response.text)
+    except ValueError:
+        return response.text
+
+
+# Instancia global
+mercadopago_client = MercadoPagoClient()
+
 
 class PaymentService:
     @staticmethod
-    def create_preference(items: list, payer_email: str, back_urls: dict = None):
+    async def create_preference(
+        items: list,
+        payer_email: str,
+        back_urls: dict = None,
+        idempotency_key: Optional[str] = None,
+        external_reference: Optional[str] = None,
+        notification_url: Optional[str] = None
+    ):
         """
-        Crea una preferencia de pago en Mercado Pago
+        Crea una preferencia de pago en Mercado Pago. `external_reference`
+        identifica lo que se paga al conciliar; `notification_url` es el
+        webhook que recibe los cambios de estado del pago.
         """
-        token = settings.MERCADOPAGO_ACCESS_TOKEN
-        
-        if not token:
-             raise Exception("MERCADOPAGO_ACCESS_TOKEN no está configurado")
-             
-        sdk = get_sdk()
-        
         # URLs por defecto si no se proporcionan
         # IMPORTANTE: Mercado Pago requiere back_urls válidas si auto_return='approved'
         if not back_urls:
-            base_url = "http://localhost:3000"
+            base_url = settings.MERCADOPAGO_BACK_URL_BASE
             back_urls = {
                 "success": f"{base_url}/payment/success",
                 "failure": f"{base_url}/payment/failure",
                 "pending": f"{base_url}/payment/pending"
             }
 
-        print(f"DEBUG: Configurando preference con back_urls: {back_urls}", file=sys.stderr)
-
         preference_data = {
             "items": items,
             "payer": {
@@ -42,15 +162,9 @@ class PaymentService:
             # Excluir pagos en efectivo si se desea solo online, opcional
             # "payment_methods": { ... }
         }
+        if external_reference:
+            preference_data["external_reference"] = external_reference
+        if notification_url:
+            preference_data["notification_url"] = notification_url
 
-        preference_response = sdk.preference().create(preference_data)
-        
-        if preference_response["status"] == 201:
-            return preference_response["response"]
-        else:
-            # IMPRIMIR RESPUESTA COMPLETA PARA DEBUG
-            print("RESPUESTA COMPLETA DE MERCADO PAGO:", file=sys.stderr)
-            print(json.dumps(preference_response, indent=2), file=sys.stderr)
-            
-            # Manejar error adecuadamente
-            raise Exception(f"Error creando preferencia: {preference_response.get('message', 'Unknown error')}")
+        return await mercadopago_client.create_preference(preference_data, idempotency_key)
@@ -6,7 +6,17 @@ from typing import Optional, List
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.models.reservation import ReservationCreate, ReservationStatus
+from app.models.reservation import ReservationCreate, ReservationStatus, ReservationResponse
+from app.core.pagination import paginate
+from app.core.projections import fields, projection_for
+from app.core.serialization import RowSerializer
+
+# Proyecciones por caso de uso
+RESERVATION_PUBLIC_FIELDS = projection_for(
+    ReservationResponse, exclude={"document_titulo", "document_id_fisico"}
+)
+# Serialización directa de los listados
+RESERVATION_ROWS = RowSerializer(ReservationResponse)
 
 
 class ReservationService:
@@ -21,14 +31,14 @@ class ReservationService:
         """Crea una nueva reserva"""
         # Verificar que el documento existe
         document = await self.documents_collection.find_one(
-            {"_id": ObjectId(reservation.document_id)}
+            {"_id": ObjectId(reservation.document_id)}, fields()
         )
         if not document:
             return None
         
         # Verificar que el usuario existe
         user = await self.users_collection.find_one(
-            {"_id": ObjectId(reservation.user_id)}
+            {"_id": ObjectId(reservation.user_id)}, fields()
         )
         if not user:
             return None
@@ -38,7 +48,7 @@ class ReservationService:
             "document_id": reservation.document_id,
             "user_id": reservation.user_id,
             "estado": ReservationStatus.ACTIVA
-        })
+        }, fields())
         if existing:
             return None  # Ya tiene una reserva activa
         
@@ -50,11 +60,15 @@ class ReservationService:
         reservation_dict["_id"] = result.inserted_id
         return reservation_dict
     
-    async def get_reservation_by_id(self, reservation_id: str) -> Optional[dict]:
+    async def get_reservation_by_id(
+        self,
+        reservation_id: str,
+        projection: Optional[dict] = RESERVATION_PUBLIC_FIELDS
+    ) -> Optional[dict]:
         """Obtiene una reserva por su ID"""
         if not ObjectId.is_valid(reservation_id):
             return None
-        return await self.collection.find_one({"_id": ObjectId(reservation_id)})
+        return await self.collection.find_one({"_id": ObjectId(reservation_id)}, projection)
     
     async def get_reservations(
         self,
@@ -62,7 +76,8 @@ class ReservationService:
         limit: int = 100,
         user_id: Optional[str] = None,
         document_id: Optional[str] = None,
-        estado: Optional[ReservationStatus] = None
+        estado: Optional[ReservationStatus] = None,
+        cursor: Optional[str] = None
     ) -> List[dict]:
         """Obtiene una lista de reservas"""
         query = {}
@@ -73,8 +88,10 @@ class ReservationService:
         if estado:
             query["estado"] = estado
         
-        cursor = self.collection.find(query).skip(skip).limit(limit)
-        return await cursor.to_list(length=limit)
+        return await paginate(
+            self.collection, query, skip=skip, limit=limit, cursor=cursor,
+            projection=RESERVATION_PUBLIC_FIELDS
+        ).to_list(length=limit)
     
     async def cancel_reservation(self, reservation_id: str) -> Optional[dict]:
         """Cancela una reserva"""
@@ -84,6 +101,7 @@ class ReservationService:
         result = await self.collection.find_one_and_update(
             {"_id": ObjectId(reservation_id)},
             {"$set": {"estado": ReservationStatus.EXPIRADA}},
+            projection=RESERVATION_PUBLIC_FIELDS,
             return_document=True
         )
         return result
@@ -96,6 +114,7 @@ class ReservationService:
         result = await self.collection.find_one_and_update(
             {"_id": ObjectId(reservation_id)},
             {"$set": {"estado": ReservationStatus.COMPLETADA}},
+            projection=RESERVATION_PUBLIC_FIELDS,
             return_document=True
         )
         return result
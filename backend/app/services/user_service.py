@@ -2,18 +2,43 @@
 Servicio de gestión de usuarios
 """
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, NamedTuple
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.models.user import UserCreate, UserUpdate, UserInDB, UserRole
+from app.models.user import UserCreate, UserUpdate, UserInDB, UserRole, UserResponse
 from app.core.security import get_password_hash, verify_password
+from app.core.pagination import paginate
+from app.core.projections import fields, projection_for
+from app.core.serialization import RowSerializer
+from app.services.base import BaseService
 
+# Proyecciones por caso de uso
+USER_PUBLIC_FIELDS = projection_for(UserResponse)  # Perfil completo sin contraseña
+USER_SESSION_FIELDS = fields("rol", "activo", "email", "nombres", "apellidos")
+USER_CREDENTIALS_FIELDS = fields("email", "password", "activo")
+USER_CONTACT_FIELDS = fields("email", "nombres", "apellidos")
+USER_SANCTION_FIELDS = fields("sancion_hasta")
+EXISTS_FIELDS = fields()  # Solo _id, para verificar existencia
+# Serialización directa de los listados
+USER_ROWS = RowSerializer(UserResponse)
 
-class UserService:
+
+class UserContactRow(NamedTuple):
+    """Datos de contacto (mismos campos que USER_CONTACT_FIELDS)"""
+    id: ObjectId
+    email: str
+    nombres: str
+    apellidos: str
+
+
+class UserService(BaseService):
     """Servicio para operaciones CRUD de usuarios"""
     
+    name = "users"
+    
     def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(db)
         self.collection = db.users
     
     async def create_user(self, user: UserCreate) -> dict:
@@ -27,33 +52,48 @@ class UserService:
         user_dict["_id"] = result.inserted_id
         return user_dict
     
-    async def get_user_by_id(self, user_id: str) -> Optional[dict]:
+    async def get_user_by_id(
+        self,
+        user_id: str,
+        projection: Optional[dict] = USER_PUBLIC_FIELDS
+    ) -> Optional[dict]:
         """Obtiene un usuario por su ID"""
         if not ObjectId.is_valid(user_id):
             return None
-        return await self.collection.find_one({"_id": ObjectId(user_id)})
+        return await self.collection.find_one({"_id": ObjectId(user_id)}, projection)
     
-    async def get_user_by_email(self, email: str) -> Optional[dict]:
+    async def get_user_by_email(
+        self,
+        email: str,
+        projection: Optional[dict] = USER_PUBLIC_FIELDS
+    ) -> Optional[dict]:
         """Obtiene un usuario por su email"""
-        return await self.collection.find_one({"email": email})
+        return await self.collection.find_one({"email": email}, projection)
     
-    async def get_user_by_rut(self, rut: str) -> Optional[dict]:
+    async def get_user_by_rut(
+        self,
+        rut: str,
+        projection: Optional[dict] = USER_PUBLIC_FIELDS
+    ) -> Optional[dict]:
         """Obtiene un usuario por su RUT"""
-        return await self.collection.find_one({"rut": rut})
+        return await self.collection.find_one({"rut": rut}, projection)
     
     async def get_users(
         self,
         skip: int = 0,
         limit: int = 100,
-        rol: Optional[UserRole] = None
+        rol: Optional[UserRole] = None,
+        cursor: Optional[str] = None
     ) -> List[dict]:
         """Obtiene una lista de usuarios"""
         query = {}
         if rol:
             query["rol"] = rol
         
-        cursor = self.collection.find(query).skip(skip).limit(limit)
-        return await cursor.to_list(length=limit)
+        return await paginate(
+            self.read_collection(self.collection), query, skip=skip, limit=limit, cursor=cursor,
+            projection=USER_PUBLIC_FIELDS
+        ).to_list(length=limit)
     
     async def update_user(self, user_id: str, user_update: UserUpdate) -> Optional[dict]:
         """Actualiza un usuario"""
@@ -72,6 +112,7 @@ class UserService:
         result = await self.collection.find_one_and_update(
             {"_id": ObjectId(user_id)},
             {"$set": update_data},
+            projection=USER_PUBLIC_FIELDS,
             return_document=True
         )
         return result
@@ -92,13 +133,14 @@ class UserService:
         result = await self.collection.find_one_and_update(
             {"_id": ObjectId(user_id)},
             {"$set": {"activo": True}},
+            projection=USER_PUBLIC_FIELDS,
             return_document=True
         )
         return result
     
     async def authenticate_user(self, email: str, password: str) -> Optional[dict]:
         """Autentica a un usuario"""
-        user = await self.get_user_by_email(email)
+        user = await self.get_user_by_email(email, USER_CREDENTIALS_FIELDS)
         if not user:
             return None
         if not verify_password(password, user["password"]):
@@ -107,7 +149,7 @@ class UserService:
     
     async def is_user_sanctioned(self, user_id: str) -> bool:
         """Verifica si un usuario está sancionado"""
-        user = await self.get_user_by_id(user_id)
+        user = await self.get_user_by_id(user_id, USER_SANCTION_FIELDS)
         if not user:
             return False
         
@@ -0,0 +1,118 @@
+"""
+Benchmark de decodificación BSON de los listados
+
+Mide, para una página grande (10.000 documentos por defecto), el costo de
+pasar del lote BSON que entrega MongoDB a la respuesta JSON:
+
+- decodificación del lote por el driver: dict vs RawBSONDocument
+- camino completo (decodificar + armar filas + orjson) con dicts y con
+  RawBSONDocument (RAW_BSON_SERVICES), frente al armado de filas campo a campo
+
+No requiere MongoDB: codifica documentos generados con los mismos campos
+que devuelve la proyección de cada listado.
+
+Uso:
+    python scripts/benchmark_decoding.py
+    python scripts/benchmark_decoding.py --rows 10000 --repeat 5
+"""
+import argparse
+import json
+import sys
+import os
+import timeit
+from datetime import datetime
+from typing import List
+
+import bson
+from bson import ObjectId
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.serialization import RAW_BSON_OPTIONS, dumps
+from app.services.item_service import ITEM_ROWS
+from app.services.user_service import USER_ROWS
+
+
+def make_items(rows: int) -> List[dict]:
+    """Ejemplares con los campos de ITEM_PUBLIC_FIELDS"""
+    return [
+        {
+            "_id": ObjectId(),
+            "document_id": str(ObjectId()),
+            "ubicacion": f"Estante {i % 40}, nivel {i % 5}",
+            "estado": "disponible",
+        }
+        for i in range(rows)
+    ]
+
+
+def make_users(rows: int) -> List[dict]:
+    """Usuarios con los campos de USER_PUBLIC_FIELDS"""
+    now = datetime.utcnow().replace(microsecond=0)
+    return [
+        {
+            "_id": ObjectId(),
+            "rut": f"{10000000 + i}-{i % 10}",
+            "nombres": "Juan Andrés",
+            "apellidos": "Pérez González",
+            "direccion": f"Av. Siempre Viva {i}, Santiago",
+            "telefono": "+56912345678",
+            "email": f"usuario{i}@example.com",
+            "rol": "lector",
+            "activo": True,
+            "fecha_creacion": now,
+        }
+        for i in range(rows)
+    ]
+
+
+def batch(documents: List[dict]) -> bytes:
+    """Lote BSON como el que recibe el driver"""
+    return b"".join(bson.encode(document) for document in documents)
+
+
+def timed(function, repeat: int) -> float:
+    return min(timeit.repeat(function, number=repeat, repeat=3)) / repeat
+
+
+def run(name: str, serializer, documents: List[dict], repeat: int):
+    data = batch(documents)
+
+    def field_by_field():
+        return dumps([serializer.row(document) for document in bson.decode_all(data)])
+
+    def dict_path():
+        return dumps(serializer.rows(bson.decode_all(data)))
+
+    def raw_path():
+        return dumps(serializer.rows(bson.decode_all(data, RAW_BSON_OPTIONS)))
+
+    expected = json.loads(field_by_field())
+    if json.loads(dict_path()) != expected or json.loads(raw_path()) != expected:
+        raise SystemExit(f"✗ {name}: las respuestas no coinciden")
+
+    print(f"{name} ({len(documents)} documentos, {len(data) // len(documents)} bytes c/u)")
+    results = [
+        ("decodificar lote a dict", lambda: bson.decode_all(data)),
+        ("decodificar lote raw", lambda: bson.decode_all(data, RAW_BSON_OPTIONS)),
+        ("dict + filas campo a campo + orjson", field_by_field),
+        ("dict + filas combinadas + orjson", dict_path),
+        ("raw + filas combinadas + orjson", raw_path),
+    ]
+    for label, function in results:
+        print(f"  {label:<38} {timed(function, repeat) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de decodificación BSON")
+    parser.add_argument("--rows", type=int, default=10000, help="Documentos por página")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    run("ejemplares", ITEM_ROWS, make_items(args.rows), args.repeat)
+    run("usuarios", USER_ROWS, make_users(args.rows), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark de serialización de los listados
+
+Compara, para una página de resultados, el camino anterior (construir un
+modelo Pydantic por fila, validarlo de nuevo con response_model y
+serializar con json) con la serialización directa con orjson.
+No requiere MongoDB: usa documentos generados con los mismos tipos BSON.
+
+Uso:
+    python scripts/benchmark_serialization.py
+    python scripts/benchmark_serialization.py --rows 100 --repeat 200
+"""
+import argparse
+import asyncio
+import json
+import sys
+import os
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core.serialization import json_response
+from app.models.document import DocumentResponse
+from app.models.loan import LoanResponse
+from app.services.document_service import DOCUMENT_ROWS
+from app.services.loan_service import LOAN_ROWS
+
+
+def make_documents(rows: int) -> List[dict]:
+    """Documentos como los retorna get_documents"""
+    return [
+        {
+            "_id": ObjectId(),
+            "id_fisico": f"LIB-{i:05d}",
+            "titulo": f"Título del documento número {i}",
+            "autor": "Gabriel García Márquez",
+            "editorial": "Editorial Sudamericana",
+            "edicion": "Primera",
+            "ano_edicion": 1967,
+            "tipo": "libro",
+            "categoria": "Novela",
+            "items_disponibles": i % 3,
+        }
+        for i in range(rows)
+    ]
+
+
+def make_loans(rows: int) -> List[dict]:
+    """Préstamos como los retorna get_loans, ya enriquecidos"""
+    now = datetime.utcnow().replace(microsecond=0)
+    return [
+        {
+            "_id": ObjectId(),
+            "item_id": str(ObjectId()),
+            "user_id": str(ObjectId()),
+            "tipo_prestamo": "domicilio",
+            "fecha_prestamo": now,
+            "fecha_devolucion_pactada": now + timedelta(days=7),
+            "fecha_devolucion_real": None,
+            "estado": "activo",
+            "document_titulo": f"Título {i}",
+            "document_id_fisico": f"LIB-{i:05d}",
+        }
+        for i in range(rows)
+    ]
+
+
+def pydantic_path(model, documents: List[dict], loop) -> bytes:
+    """Camino anterior: modelo por fila + response_model + json estándar"""
+    built = [model(**{**doc, "_id": str(doc["_id"])}) for doc in documents]
+    field = create_response_field(name="response", type_=List[model])
+    content = loop.run_until_complete(
+        serialize_response(field=field, response_content=built, is_coroutine=True)
+    )
+    return JSONResponse(content).body
+
+
+def direct_path(serializer, documents: List[dict]) -> bytes:
+    """Camino nuevo: filas sin validar + orjson"""
+    return json_response(serializer.rows(documents)).body
+
+
+def run(name: str, model, serializer, documents: List[dict], repeat: int, loop):
+    old = pydantic_path(model, documents, loop)
+    new = direct_path(serializer, documents)
+    if json.loads(old) != json.loads(new):
+        raise SystemExit(f"✗ {name}: las respuestas no coinciden")
+
+    old_time = min(timeit.repeat(lambda: pydantic_path(model, documents, loop), number=repeat, repeat=3)) / repeat
+    new_time = min(timeit.repeat(lambda: direct_path(serializer, documents), number=repeat, repeat=3)) / repeat
+    print(
+        f"{name:<12} {len(documents):>5} filas   "
+        f"pydantic+json: {old_time * 1000:7.3f} ms   "
+        f"orjson directo: {new_time * 1000:7.3f} ms   "
+        f"({old_time / new_time:4.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de listados")
+    parser.add_argument("--rows", type=int, default=100, help="Filas por página")
+    parser.add_argument("--repeat", type=int, default=200, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    try:
+        run("documentos", DocumentResponse, DOCUMENT_ROWS, make_documents(args.rows), args.repeat, loop)
+        run("préstamos", LoanResponse, LOAN_ROWS, make_loans(args.rows), args.repeat, loop)
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Script para importar documentos o ejemplares de forma masiva
+
+Uso:
+    python scripts/import_catalog.py documentos catalogo.csv
+    python scripts/import_catalog.py ejemplares ejemplares.jsonl --chunk-size 2000
+"""
+import argparse
+import asyncio
+import sys
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.catalog_import import ImportFormat
+from app.services.catalog_import_service import (
+    CatalogImportService, DEFAULT_CHUNK_SIZE, iter_records, iter_text_lines
+)
+
+
+def parse_args():
+    """Lee los argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Importación masiva del catálogo BEC")
+    parser.add_argument("tipo", choices=["documentos", "ejemplares"], help="Qué se importa")
+    parser.add_argument("archivo", help="Ruta del archivo CSV o JSON Lines")
+    parser.add_argument(
+        "--formato",
+        choices=[f.value for f in ImportFormat],
+        help="Formato del archivo (por defecto según la extensión)"
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Filas por lote")
+    return parser.parse_args()
+
+
+async def import_catalog(args):
+    """Importa el archivo indicado y muestra el reporte"""
+    if args.formato:
+        formato = ImportFormat(args.formato)
+    elif args.archivo.lower().endswith((".jsonl", ".ndjson")):
+        formato = ImportFormat.JSONL
+    else:
+        formato = ImportFormat.CSV
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    import_service = CatalogImportService(db, chunk_size=args.chunk_size)
+
+    print(f"📥 Importando {args.tipo} desde {args.archivo} ({formato.value})...")
+
+    try:
+        with open(args.archivo, encoding="utf-8-sig", newline="") as f:
+            records = iter_records(iter_text_lines(f), formato)
+            if args.tipo == "documentos":
+                report = await import_service.import_documents(records)
+            else:
+                report = await import_service.import_items(records)
+    finally:
+        client.close()
+
+    print(f"✅ {report.insertados} de {report.total} filas importadas")
+    if report.total_errores:
+        print(f"⚠ {report.total_errores} filas con errores:")
+        for error in report.errores:
+            print(f"   Fila {error.fila}: {error.error}")
+        if report.total_errores > len(report.errores):
+            print(f"   ... y {report.total_errores - len(report.errores)} más")
+
+    return report
+
+
+if __name__ == "__main__":
+    result = asyncio.run(import_catalog(parse_args()))
+    sys.exit(1 if result.total_errores else 0)
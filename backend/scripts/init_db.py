@@ -12,6 +12,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.config import settings
 from app.core.security import get_password_hash
+from app.core.search import search_fields
+from app.core.http_cache import bump_version
 
 
 async def init_database():
@@ -137,6 +139,8 @@ async def init_database():
             "categoria": "Épica"
         }
     ]
+    for document in documents:
+        document.update(search_fields(document))
     
     result = await db.documents.insert_many(documents)
     document_ids = result.inserted_ids
@@ -157,6 +161,9 @@ async def init_database():
     result = await db.items.insert_many(items)
     print(f"✅ {len(result.inserted_ids)} ejemplares creados")
     
+    # Invalidar los ETag emitidos antes de reinicializar
+    await bump_version(db, "documents", "items")
+    
     print("\n" + "="*50)
     print("✨ Base de datos inicializada correctamente!")
     print("="*50)
@@ -0,0 +1,131 @@
+"""
+Servidor local que imita la API de Mercado Pago para desarrollo y pruebas
+
+Implementa lo que usa el backend: creación de preferencias (con
+X-Idempotency-Key) y consulta de pagos. Puede agregar latencia y fallos
+aleatorios (503) para probar los reintentos y la idempotencia del cliente.
+
+Uso:
+    python scripts/mercadopago_stub.py --port 8001
+    python scripts/mercadopago_stub.py --port 8001 --latency-ms 200 --fail-rate 0.2
+
+y en el .env del backend:
+    MERCADOPAGO_API_URL=http://localhost:8001
+    MERCADOPAGO_ACCESS_TOKEN=TEST-local
+
+Para simular que un usuario paga una preferencia (si la preferencia tiene
+notification_url, se envía la notificación al webhook):
+    curl -X POST "http://localhost:8001/stub/payments?preference_id=<id>&status=approved"
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Mercado Pago (stub)")
+
+options = argparse.Namespace(latency_ms=0, fail_rate=0.0)
+preferences: Dict[str, dict] = {}
+payments: Dict[str, dict] = {}
+# X-Idempotency-Key -> respuesta ya entregada
+idempotent_responses: Dict[str, dict] = {}
+
+
+@app.middleware("http")
+async def simulate_network(request: Request, call_next):
+    if not request.url.path.startswith("/stub"):
+        if options.latency_ms:
+            await asyncio.sleep(options.latency_ms / 1000)
+        if random.random() < options.fail_rate:
+            return JSONResponse({"message": "Servicio no disponible (simulado)"}, status_code=503)
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse({"message": "unauthorized"}, status_code=401)
+    return await call_next(request)
+
+
+@app.post("/checkout/preferences", status_code=201)
+async def create_preference(data: dict, x_idempotency_key: Optional[str] = Header(None)):
+    if x_idempotency_key and x_idempotency_key in idempotent_responses:
+        return idempotent_responses[x_idempotency_key]
+    if not data.get("items"):
+        raise HTTPException(status_code=400, detail="items requeridos")
+
+    preference_id = f"stub-{uuid.uuid4().hex[:12]}"
+    preference = {
+        **data,
+        "id": preference_id,
+        "date_created": datetime.utcnow().isoformat(),
+        "init_point": f"http://localhost:8001/checkout?pref_id={preference_id}",
+        "sandbox_init_point": f"http://localhost:8001/checkout?pref_id={preference_id}&sandbox=1",
+    }
+    preferences[preference_id] = preference
+    if x_idempotency_key:
+        idempotent_responses[x_idempotency_key] = preference
+    return preference
+
+
+@app.get("/v1/payments/search")
+async def search_payments(external_reference: str):
+    results = [p for p in payments.values() if p["external_reference"] == external_reference]
+    return {"paging": {"total": len(results)}, "results": results}
+
+
+@app.get("/v1/payments/{payment_id}")
+async def get_payment(payment_id: str):
+    if payment_id not in payments:
+        raise HTTPException(status_code=404, detail="payment not found")
+    return payments[payment_id]
+
+
+@app.post("/stub/payments", status_code=201)
+async def simulate_payment(
+    preference_id: Optional[str] = None,
+    external_reference: Optional[str] = None,
+    status: str = "approved",
+    amount: Optional[float] = None
+):
+    """Registra un pago como si el usuario hubiera completado el checkout"""
+    preference = preferences.get(preference_id, {})
+    if preference_id and not preference:
+        raise HTTPException(status_code=404, detail="preference not found")
+    if amount is None:
+        amount = sum(item["unit_price"] * item.get("quantity", 1) for item in preference.get("items", []))
+
+    payment_id = str(random.randint(10**9, 10**10))
+    payments[payment_id] = {
+        "id": int(payment_id),
+        "status": status,
+        "external_reference": external_reference or preference.get("external_reference"),
+        "transaction_amount": amount,
+        "date_created": datetime.utcnow().isoformat(),
+    }
+    if preference.get("notification_url"):
+        async with httpx.AsyncClient() as client:
+            await client.post(
+                preference["notification_url"],
+                json={"type": "payment", "action": "payment.created", "data": {"id": payment_id}}
+            )
+    return payments[payment_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de Mercado Pago")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=int, default=0, help="Latencia agregada a cada respuesta")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fracción de respuestas 503")
+    args = parser.parse_args()
+    options.latency_ms = args.latency_ms
+    options.fail_rate = args.fail_rate
+
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
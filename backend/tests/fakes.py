@@ -0,0 +1,27 @@
+class FakeCursor:
+    """Cursor asíncrono sobre una lista, como el de Motor"""
+
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """Colección que solo implementa find()"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection):
+        return FakeCursor(self.documents)
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import ResponseCache, SingleFlight
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def scenario():
+        single_flight = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "resultado"
+
+        leader = asyncio.create_task(single_flight.do("clave", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(single_flight.do("clave", compute))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await waiter == "resultado"
+        assert calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_compute_cancelled_when_no_one_waits():
+    async def scenario():
+        single_flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def compute():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.create_task(single_flight.do("clave", compute))
+        await started.wait()
+        caller.cancel()
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert not single_flight._inflight
+
+    asyncio.run(scenario())
+
+
+def test_response_cache_returns_independent_copies():
+    async def scenario():
+        cache = ResponseCache(ttl_seconds=60)
+
+        async def compute():
+            await asyncio.sleep(0)
+            return [{"titulo": "Rayuela"}]
+
+        first, second = await asyncio.gather(
+            cache.get_or_set("clave", compute), cache.get_or_set("clave", compute)
+        )
+        first[0]["titulo"] = "modificado"
+        assert second == [{"titulo": "Rayuela"}]
+
+        cached = await cache.get_or_set("clave", compute)
+        cached.append({"titulo": "otro"})
+        assert await cache.get_or_set("clave", compute) == [{"titulo": "Rayuela"}]
+
+    asyncio.run(scenario())
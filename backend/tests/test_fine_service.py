@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.models.fine import FineStatus, NotificationStatus
+from app.services.fine_service import FineService
+from app.services.payment_service import PaymentProviderError, mercadopago_client
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["biblioteca_test"]
+
+
+async def _sanctioned_user(db, monto=1500):
+    """Usuario sancionado con una multa pendiente y su preferencia de pago"""
+    user_id = ObjectId()
+    await db.users.insert_one({"_id": user_id, "sancion_hasta": datetime.utcnow() + timedelta(days=3)})
+    fine = await db.fines.insert_one({
+        "user_id": str(user_id), "loan_id": str(ObjectId()), "dias_atraso": 3,
+        "monto": monto, "estado": FineStatus.PENDIENTE, "fecha_creacion": datetime.utcnow(),
+    })
+    reference = str(ObjectId())
+    await db.fine_payments.insert_one({
+        "_id": reference, "user_id": str(user_id), "multas": [fine.inserted_id],
+        "monto": monto, "preference_id": "pref", "fecha_creacion": datetime.utcnow(),
+    })
+    return user_id, fine.inserted_id, reference
+
+
+def _payment(reference, amount, status="approved"):
+    return {"id": 123, "status": status, "external_reference": reference, "transaction_amount": amount}
+
+
+def test_apply_payment_marks_fines_and_lifts_sanction(db):
+    async def scenario():
+        service = FineService(db)
+        user_id, fine_id, reference = await _sanctioned_user(db)
+
+        assert await service.apply_payments([_payment(reference, 1500)]) == {str(user_id)}
+
+        fine = await db.fines.find_one({"_id": fine_id})
+        assert fine["estado"] == FineStatus.PAGADA
+        assert fine["payment_id"] == "123"
+        assert "sancion_hasta" not in await db.users.find_one({"_id": user_id})
+
+    asyncio.run(scenario())
+
+
+def test_underpaid_payment_is_not_applied(db):
+    async def scenario():
+        service = FineService(db)
+        user_id, fine_id, reference = await _sanctioned_user(db)
+
+        assert await service.apply_payments([_payment(reference, 1499)]) == set()
+
+        assert (await db.fines.find_one({"_id": fine_id}))["estado"] == FineStatus.PENDIENTE
+        assert "sancion_hasta" in await db.users.find_one({"_id": user_id})
+
+    asyncio.run(scenario())
+
+
+def test_sanction_kept_while_other_fines_are_pending(db):
+    async def scenario():
+        service = FineService(db)
+        user_id, _, reference = await _sanctioned_user(db)
+        await db.fines.insert_one({
+            "user_id": str(user_id), "loan_id": str(ObjectId()), "dias_atraso": 1,
+            "monto": 500, "estado": FineStatus.PENDIENTE, "fecha_creacion": datetime.utcnow(),
+        })
+
+        await service.apply_payments([_payment(reference, 1500)])
+
+        assert "sancion_hasta" in await db.users.find_one({"_id": user_id})
+
+    asyncio.run(scenario())
+
+
+def test_claim_skips_notifications_waiting_for_retry(db):
+    async def scenario():
+        service = FineService(db)
+        await service.enqueue_notification("listo")
+        await service.enqueue_notification("en-espera")
+        await db.payment_notifications.update_one(
+            {"_id": "en-espera"}, {"$set": {"proximo_intento": datetime.utcnow() + timedelta(minutes=1)}}
+        )
+
+        _, attempts = await service.claim_notifications(10)
+        assert attempts == {"listo": 0}
+
+        _, attempts = await service.claim_notifications(10)
+        assert attempts == {}
+
+    asyncio.run(scenario())
+
+
+def test_failed_lookup_backs_off_then_errors(db, monkeypatch):
+    async def failing_get_payment(payment_id):
+        raise PaymentProviderError("Mercado Pago no responde")
+
+    monkeypatch.setattr(mercadopago_client, "get_payment", failing_get_payment)
+    monkeypatch.setattr(settings, "PAYMENT_NOTIFICATION_MAX_ATTEMPTS", 3)
+
+    async def scenario():
+        service = FineService(db)
+        await service.enqueue_notification("pago")
+
+        delays = []
+        for _ in range(2):
+            before = datetime.utcnow()
+            assert await service.process_notifications(10) == 1
+            notification = await db.payment_notifications.find_one({"_id": "pago"})
+            assert notification["estado"] == NotificationStatus.PENDIENTE
+            delays.append((notification["proximo_intento"] - before).total_seconds())
+            # Mientras no vence la espera no se vuelve a tomar
+            assert await service.process_notifications(10) == 0
+            await db.payment_notifications.update_one(
+                {"_id": "pago"}, {"$set": {"proximo_intento": datetime.utcnow()}}
+            )
+
+        assert delays[1] == pytest.approx(2 * delays[0], abs=1)
+        assert await service.process_notifications(10) == 1
+        notification = await db.payment_notifications.find_one({"_id": "pago"})
+        assert notification["estado"] == NotificationStatus.ERROR
+        assert notification["intentos"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_processed_notification_applies_payment(db, monkeypatch):
+    async def scenario():
+        service = FineService(db)
+        user_id, fine_id, reference = await _sanctioned_user(db)
+
+        async def get_payment(payment_id):
+            return _payment(reference, 1500)
+
+        monkeypatch.setattr(mercadopago_client, "get_payment", get_payment)
+        await service.enqueue_notification("123")
+
+        assert await service.process_notifications(10) == 1
+
+        notification = await db.payment_notifications.find_one({"_id": "123"})
+        assert notification["estado"] == NotificationStatus.PROCESADA
+        assert (await db.fines.find_one({"_id": fine_id}))["estado"] == FineStatus.PAGADA
+        assert "sancion_hasta" not in await db.users.find_one({"_id": user_id})
+
+    asyncio.run(scenario())
+
+
+def test_sweep_applies_payment_without_notification(db, monkeypatch):
+    async def scenario():
+        service = FineService(db)
+        user_id, fine_id, reference = await _sanctioned_user(db)
+        searched = []
+
+        async def search_payments(external_reference):
+            searched.append(external_reference)
+            return [_payment(reference, 1500, status="rejected"), _payment(reference, 1500)]
+
+        monkeypatch.setattr(mercadopago_client, "search_payments", search_payments)
+
+        assert await service.reconcile_checkouts() == 1
+        assert (await db.fines.find_one({"_id": fine_id}))["estado"] == FineStatus.PAGADA
+        assert "sancion_hasta" not in await db.users.find_one({"_id": user_id})
+
+        # Una preferencia ya pagada no se vuelve a consultar
+        assert await service.reconcile_checkouts() == 0
+        assert searched == [reference]
+
+    asyncio.run(scenario())
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core import rate_limit as rate_limit_module
+from app.core.rate_limit import RateLimiter, RateLimitRule, rate_limit
+from app.core.security import create_access_token
+
+RULE = RateLimitRule("prueba", per_minute=1, burst=2)
+
+
+def _request(ip, user_id=None):
+    headers = []
+    if user_id:
+        headers.append((b"authorization", f"Bearer {create_access_token({'user_id': user_id})}".encode()))
+    return Request({"type": "http", "headers": headers, "client": (ip, 1234)})
+
+
+def _allowed(dependency, request):
+    try:
+        asyncio.run(dependency(request))
+    except HTTPException as e:
+        assert e.status_code == 429
+        return False
+    return True
+
+
+@pytest.fixture
+def dependency(monkeypatch):
+    monkeypatch.setattr(rate_limit_module, "rate_limiter", RateLimiter(enabled=True))
+    return rate_limit(RULE)
+
+
+def test_new_accounts_share_the_ip_bucket(dependency):
+    assert _allowed(dependency, _request("10.0.0.1", "cuenta-1"))
+    assert _allowed(dependency, _request("10.0.0.1", "cuenta-2"))
+    assert not _allowed(dependency, _request("10.0.0.1", "cuenta-3"))
+    assert not _allowed(dependency, _request("10.0.0.1"))
+
+
+def test_user_bucket_applies_across_ips(dependency):
+    assert _allowed(dependency, _request("10.0.0.1", "cuenta"))
+    assert _allowed(dependency, _request("10.0.0.2", "cuenta"))
+    assert not _allowed(dependency, _request("10.0.0.3", "cuenta"))
+    assert _allowed(dependency, _request("10.0.0.3"))
@@ -0,0 +1,29 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.core.search_index import SearchIndex
+
+from tests.fakes import FakeCollection
+
+
+# Como DOCUMENT_PUBLIC_FIELDS: proyección de inclusión sin _id
+PROJECTION = {"titulo": 1, "autor": 1, "categoria": 1}
+
+
+def test_upsert_after_build_keeps_id():
+    existing = {"_id": ObjectId(), "titulo": "Rayuela", "autor": "Cortázar", "categoria": "Novela"}
+    index = SearchIndex()
+    asyncio.run(index.build(FakeCollection([existing]), PROJECTION))
+
+    created = {"_id": ObjectId(), "titulo": "Ficciones", "autor": "Borges", "categoria": "Cuento", "stock": 3}
+    index.upsert(created)
+
+    assert [doc_id for _, doc_id in index.search("ficciones")] == [created["_id"]]
+    assert index.get(created["_id"]) == {
+        "_id": created["_id"], "titulo": "Ficciones", "autor": "Borges", "categoria": "Cuento"
+    }
+
+    index.upsert({**created, "titulo": "El Aleph"})
+    assert index.search("ficciones") == []
+    assert [doc_id for _, doc_id in index.search("aleph")] == [created["_id"]]
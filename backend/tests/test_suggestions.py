@@ -0,0 +1,46 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.core.search_index import BUILD_SLICE
+from app.core.suggestions import SuggestionIndex, _SuggestionState
+
+from tests.fakes import FakeCollection
+
+PROJECTION = {"_id": 1, "titulo": 1, "autor": 1}
+
+
+def _documents(count):
+    return [
+        {"_id": ObjectId(), "titulo": f"Crónica número {i % 97} de la serie {i}", "autor": f"Autora {i % 13}"}
+        for i in range(count)
+    ]
+
+
+def test_build_matches_incremental_adds():
+    documents = _documents(BUILD_SLICE * 3 + 7)
+    index = SuggestionIndex()
+    asyncio.run(index.build(FakeCollection(documents), PROJECTION))
+
+    incremental = _SuggestionState()
+    for document in documents:
+        incremental.add(document)
+
+    assert index._state.starts == incremental.starts
+    assert index._state.inner == incremental.inner
+    assert index.suggest("cronica numero 5", limit=3) == incremental.suggest("cronica numero 5", 3)
+
+
+def test_write_during_build_is_applied():
+    documents = _documents(BUILD_SLICE * 2)
+    created = {"_id": ObjectId(), "titulo": "Zurita", "autor": "Raúl Zurita"}
+    index = SuggestionIndex()
+
+    async def scenario():
+        build = asyncio.create_task(index.build(FakeCollection(documents), PROJECTION))
+        await asyncio.sleep(0)
+        index.upsert(created)
+        await build
+
+    asyncio.run(scenario())
+    assert [s["texto"] for s in index.suggest("zur")] == ["Zurita", "Raúl Zurita"]